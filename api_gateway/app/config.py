@@ -13,6 +13,25 @@ class Settings(BaseSettings):
     # Настройки обработки ошибок
     timeout_seconds: int = 30
 
+    # Общий пул соединений к сервисам (создаётся в lifespan)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = True  # Если установлен пакет h2
+
+    # Загрузка работ (как max_file_size_mb в File Storing Service)
+    max_upload_size_mb: int = 10
+    max_import_size_mb: int = 500  # Архив для массового импорта (как в File Storing Service)
+
+    # Кэш отчётов в шлюзе: записи сбрасываются по завершении анализа, TTL — верхняя граница
+    report_cache_ttl_seconds: float = 30.0
+    report_cache_max_entries: int = 1024
+
+    # Извлечение текста из документов в пуле процессов
+    extraction_workers: int = 2
+    extraction_timeout_seconds: float = 30.0
+    extraction_memory_limit_mb: int = 1024  # RLIMIT_AS процесса-воркера (0 — без ограничения)
+
     class Config:
         env_file = ".env"
 
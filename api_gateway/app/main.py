@@ -1,17 +1,47 @@
 from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
-import hashlib
+import asyncio
+import json
+import os
 from fastapi.responses import HTMLResponse
-import io
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
+from typing import Optional
+from contextlib import asynccontextmanager
+
+from .config import settings
+from .services.http_pool import HTTPPoolMetrics, create_client
+from .services.events import FINAL_STATUSES, EventBroker, format_sse
+from .services.import_jobs import ImportJobs, run_import_job, spool_archive
+from .services.response_cache import CachedResponse, ResponseCache
+from .services.text_extraction import ExtractionPool
+from .services.upload_pipeline import UploadTooLargeError, forward_upload, spool_upload
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Один пул соединений на всё время работы шлюза
+    global http_client
+    http_client = create_client(http_metrics, timeout=settings.timeout_seconds,
+                                max_connections=settings.http_max_connections,
+                                max_keepalive_connections=settings.http_max_keepalive_connections,
+                                keepalive_expiry=settings.http_keepalive_expiry,
+                                http2=settings.http2)
+    app.state.http_client = http_client
+    app.state.extraction_pool = extraction_pool
+    extraction_pool.start()
+    yield
+    extraction_pool.shutdown()
+    await http_client.aclose()
+
 
 app = FastAPI(
     title="AntiPlagiat API Gateway",
     description="Единая точка входа для системы проверки на плагиат",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.get("/", response_class=HTMLResponse)
@@ -22,62 +52,6 @@ async def web_interface(request: Request):
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
-def extract_text_from_file(file_bytes, filename):
-    """Извлекает текст из разных форматов файлов"""
-    if not file_bytes:
-        return ""
-
-    if filename.endswith('.txt'):
-        try:
-            return file_bytes.decode('utf-8', errors='ignore')
-        except:
-            return ""
-    elif filename.endswith('.pdf'):
-        try:
-            # Пробуем PyPDF2
-            import PyPDF2
-            pdf_file = io.BytesIO(file_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            if text.strip():
-                return text
-
-            # Если PyPDF2 не сработал, пробуем pdfplumber
-            try:
-                import pdfplumber
-                with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-                    text = ""
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                    return text
-            except:
-                return ""
-
-        except Exception as e:
-            print(f"Ошибка чтения PDF {filename}: {e}")
-            return ""
-    elif filename.endswith(('.doc', '.docx')):
-        try:
-            import docx
-            doc = docx.Document(io.BytesIO(file_bytes))
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs if paragraph.text])
-            return text
-        except Exception as e:
-            print(f"Ошибка чтения DOCX {filename}: {e}")
-            return ""
-    else:
-        # Для неизвестных форматов пытаемся декодировать как текст
-        try:
-            return file_bytes.decode('utf-8', errors='ignore')
-        except:
-            return ""
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -88,6 +62,26 @@ app.add_middleware(
 
 FILE_SERVICE_URL = "http://file-storing:8001"
 ANALYSIS_SERVICE_URL = "http://file-analysis:8002"
+IMPORT_ANALYSIS_BATCH_SIZE = 20  # Работ в одном запросе /analyze/batch
+
+http_metrics = HTTPPoolMetrics()
+http_client: httpx.AsyncClient = None  # Создаётся в lifespan
+
+# Разбор PDF/DOCX не блокирует event loop шлюза
+extraction_pool = ExtractionPool(max_workers=settings.extraction_workers,
+                                 timeout=settings.extraction_timeout_seconds,
+                                 memory_limit_mb=settings.extraction_memory_limit_mb)
+
+# Отчёты, которые страницы report.html опрашивают каждые несколько секунд
+report_cache = ResponseCache(ttl=settings.report_cache_ttl_seconds,
+                             max_entries=settings.report_cache_max_entries)
+
+# События статуса анализа для открытых страниц отчёта (GET /works/{id}/events)
+event_broker = EventBroker()
+SSE_HEARTBEAT_SECONDS = 15.0  # Комментарий-пинг и перепроверка статуса при тишине
+
+# Задачи массового импорта (прогресс доступен по GET /import/{job_id})
+import_jobs = ImportJobs()
 
 
 
@@ -99,95 +93,201 @@ async def upload_work(
         assignment_id: str = Form(...)
 ):
     """Загружает работу студента"""
+    # Хэш, размер и копия во временном файле — за один проход по телу запроса
     try:
-        file_content = await file.read()
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        spooled = await spool_upload(file, max_size=settings.max_upload_size_mb * 1024 * 1024)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=400, detail=f"Размер файла превышает {settings.max_upload_size_mb} МБ")
 
+    try:
         # Извлекаем текст из файла
-        extracted_text = extract_text_from_file(file_content, file.filename)
+        extracted_text = await extraction_pool.extract(spooled.path, file.filename)
 
-        # Шаг 1: Загружаем в File Storing Service
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            files = {"file": (file.filename, file_content, file.content_type)}
-            data = {"student_name": student_name, "assignment_id": assignment_id}
+        # Шаг 1: Загружаем в File Storing Service вместе с хэшем и текстом
+        response = await forward_upload(http_client, f"{FILE_SERVICE_URL}/upload", spooled,
+                                        student_name, assignment_id, extracted_text)
 
-            response = await client.post(
-                f"{FILE_SERVICE_URL}/upload",
-                files=files,
-                data=data
-            )
+        if response.status_code != 200:
+            error_detail = response.json().get("detail", "Ошибка загрузки файла")
+            raise HTTPException(status_code=response.status_code, detail=error_detail)
 
-            if response.status_code != 200:
-                error_detail = response.json().get("detail", "Ошибка загрузки файла")
-                raise HTTPException(status_code=response.status_code, detail=error_detail)
+        work_data = response.json()
+        work_id = work_data.get("id")
 
-            work_data = response.json()
-            work_id = work_data.get("id")
+        if not work_id:
+            raise HTTPException(status_code=500, detail="Не получили work_id")
 
-            if not work_id:
-                raise HTTPException(status_code=500, detail="Не получили work_id")
+        # Шаг 2: Запускаем анализ в фоне, передавая извлеченный текст
+        background_tasks.add_task(
+            start_analysis,
+            work_id, student_name, assignment_id, file.filename, spooled.file_hash, extracted_text
+        )
 
-            # Шаг 2: Запускаем анализ в фоне, передавая извлеченный текст
-            background_tasks.add_task(
-                start_analysis,
-                work_id, student_name, assignment_id, file.filename, file_hash, extracted_text
-            )
-
-            return {
-                "message": "Файл загружен, анализ начат",
-                "work_id": work_id,
-                "status": "processing",
-                "file_type": file.filename.split('.')[-1] if '.' in file.filename else "unknown"
-            }
+        return {
+            "message": "Файл загружен, анализ начат",
+            "work_id": work_id,
+            "status": "processing",
+            "file_type": file.filename.split('.')[-1] if '.' in file.filename else "unknown"
+        }
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Сервис недоступен: {str(e)}")
+    finally:
+        os.remove(spooled.path)
 
 
 async def start_analysis(work_id, student_name, assignment_id, file_name, file_hash, extracted_text):
     """Запускает анализ в Analysis Service"""
+    event_broker.publish(f"work:{work_id}", {"status": "processing", "work_id": work_id})
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{ANALYSIS_SERVICE_URL}/analyze",
-                json={
-                    "work_id": work_id,
-                    "student_name": student_name,
-                    "assignment_id": assignment_id,
-                    "file_name": file_name,
-                    "file_hash": file_hash,
-                    "file_content": extracted_text  # Передаем извлеченный текст
-                }
-            )
-
-            if response.status_code != 200:
-                print(f"Ошибка анализа: {response.status_code} - {response.text}")
-            else:
-                print(f"✅ Анализ запущен для работы {work_id}")
+        response = await http_client.post(
+            f"{ANALYSIS_SERVICE_URL}/analyze",
+            json={
+                "work_id": work_id,
+                "student_name": student_name,
+                "assignment_id": assignment_id,
+                "file_name": file_name,
+                "file_hash": file_hash,
+                "file_content": extracted_text  # Передаем извлеченный текст
+            }
+        )
+
+        if response.status_code != 200:
+            print(f"Ошибка анализа: {response.status_code} - {response.text}")
+            await analysis_finished(work_id, assignment_id, f"Ошибка анализа ({response.status_code})")
+        else:
+            print(f"✅ Анализ запущен для работы {work_id}")
+            await analysis_finished(work_id, assignment_id)
     except Exception as e:
         print(f"❌ Ошибка запуска анализа: {e}")
+        await analysis_finished(work_id, assignment_id, str(e))
+
+
+async def analysis_finished(work_id: int, assignment_id: str, error: Optional[str] = None):
+    """Анализ завершён: сброс кэша отчётов и событие для открытых страниц отчёта"""
+    # Закэшированное «отчёт не найден» и сводка задания устарели
+    report_cache.invalidate(f"work:{work_id}", f"assignment:{assignment_id}")
+    topic = f"work:{work_id}"
+    if error is not None:
+        event_broker.publish(topic, {"status": "failed", "work_id": work_id, "detail": error})
+        return
+    event = {"status": "completed", "work_id": work_id}
+    # Отчёт запрашивается, только если его ждут; он же попадёт в кэш для остальных
+    if event_broker.has_subscribers(topic):
+        try:
+            entry = await report_entry(work_id)
+            if entry.status_code == 200:
+                event["report"] = json.loads(entry.body)
+        except HTTPException:
+            pass
+    event_broker.publish(topic, event)
 
 
-@app.get("/works/{work_id}/report")
-async def get_report(work_id: int):
-    """Получает отчет по работе"""
+@app.post("/import")
+async def import_works(
+        background_tasks: BackgroundTasks,
+        archive: UploadFile = File(...),
+        assignment_id: Optional[str] = Form(None)
+):
+    """
+    Массовая загрузка работ задания одним ZIP/tar архивом с манифестом
+    (manifest.csv: file, student_name[, assignment_id]). Возвращает id
+    задачи; импорт и пакетный анализ идут в фоне.
+    """
+    try:
+        archive_path = await spool_archive(archive, max_size=settings.max_import_size_mb * 1024 * 1024)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail=f"Размер архива превышает {settings.max_import_size_mb} МБ")
+    job = import_jobs.create(archive.filename, assignment_id)
+    background_tasks.add_task(
+        run_import_job, http_client, job, archive_path, FILE_SERVICE_URL, ANALYSIS_SERVICE_URL,
+        IMPORT_ANALYSIS_BATCH_SIZE, analysis_finished
+    )
+    return {"job_id": job["id"], "status": job["status"], "progress_url": f"/import/{job['id']}"}
+
+
+@app.get("/import/{job_id}")
+async def get_import_job(job_id: str):
+    """Прогресс задачи импорта: обработано записей, сохранено, проанализировано"""
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача импорта не найдена")
+    return job
+
+
+async def fetch_upstream(url: str, params: Optional[dict] = None):
+    """Тело, код и тип ответа сервиса — для записи в кэш"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(f"{ANALYSIS_SERVICE_URL}/works/{work_id}/report")
-            return response.json()
+        response = await http_client.get(url, params=params)
     except httpx.RequestError as e:
         raise HTTPException(503, f"Сервис недоступен: {str(e)}")
+    return response.content, response.status_code, response.headers.get("content-type", "application/json")
+
+
+async def report_entry(work_id: int, page: int = 1, page_size: int = 20) -> CachedResponse:
+    """Отчёт по работе через кэш шлюза"""
+    params = {"page": page, "page_size": page_size}
+    return await report_cache.fetch(
+        f"report:{work_id}:{page}:{page_size}", [f"work:{work_id}"],
+        lambda: fetch_upstream(f"{ANALYSIS_SERVICE_URL}/works/{work_id}/report", params)
+    )
+
+
+@app.get("/works/{work_id}/report")
+async def get_report(request: Request, work_id: int, page: int = 1, page_size: int = 20):
+    """Получает отчет по работе (совпадающие фрагменты — постранично)"""
+    return report_cache.respond(request, await report_entry(work_id, page, page_size))
+
+
+async def current_status(work_id: int) -> Optional[dict]:
+    """Готовый отчёт (completed) или последнее известное событие работы"""
+    try:
+        entry = await report_entry(work_id)
+    except HTTPException:
+        entry = None
+    if entry is not None and entry.status_code == 200:
+        return {"status": "completed", "work_id": work_id, "report": json.loads(entry.body)}
+    return event_broker.last(f"work:{work_id}")
+
+
+@app.get("/works/{work_id}/events")
+async def work_events(work_id: int):
+    """
+    Server-Sent Events по работе: processing, затем completed с отчётом
+    (первая страница фрагментов) или failed, после чего поток закрывается.
+    Заменяет опрос /works/{id}/report страницей отчёта.
+    """
+    async def stream():
+        # Подписка раньше проверки статуса — завершение между ними не потеряется
+        with event_broker.subscribe(f"work:{work_id}") as queue:
+            yield b"retry: 5000\n\n"
+            event = await current_status(work_id)
+            while True:
+                if event is not None:
+                    yield format_sse(event)
+                    if event["status"] in FINAL_STATUSES:
+                        return
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Анализ мог завершиться мимо этого шлюза — статус перепроверяется через кэш
+                    status = await current_status(work_id)
+                    event = status if status is not None and status["status"] in FINAL_STATUSES else None
+                    if event is None:
+                        yield b": keep-alive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.get("/assignment/{assignment_id}/reports")
-async def get_assignment_reports(assignment_id: str):
+async def get_assignment_reports(request: Request, assignment_id: str):
     """Получает все отчеты по заданию"""
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(f"{ANALYSIS_SERVICE_URL}/assignment/{assignment_id}/reports")
-            return response.json()
-    except httpx.RequestError as e:
-        raise HTTPException(503, f"Сервис недоступен: {str(e)}")
+    entry = await report_cache.fetch(
+        f"assignment:{assignment_id}", [f"assignment:{assignment_id}"],
+        lambda: fetch_upstream(f"{ANALYSIS_SERVICE_URL}/assignment/{assignment_id}/reports")
+    )
+    return report_cache.respond(request, entry)
 
 
 @app.get("/health")
@@ -195,6 +295,30 @@ async def health():
     return {"status": "healthy", "service": "api-gateway"}
 
 
+@app.get("/debug/events")
+async def events_stats():
+    """Подписчики и доставленные события статуса анализа"""
+    return event_broker.info()
+
+
+@app.get("/debug/cache")
+async def cache_stats():
+    """Попадания, промахи, 304 и сбросы кэша отчётов"""
+    return report_cache.info()
+
+
+@app.get("/debug/extraction")
+async def extraction_stats():
+    return {"stats": extraction_pool.stats, "workers": extraction_pool.max_workers,
+            "timeout_seconds": extraction_pool.timeout}
+
+
+@app.get("/debug/http")
+async def http_pool_stats():
+    """Соединения общего пула и задержки запросов по сервисам"""
+    return http_metrics.stats(http_client)
+
+
 @app.get("/works/{work_id}/view", response_class=HTMLResponse)
 async def view_work_report(request: Request, work_id: int):
     """Страница просмотра отчета через /works/{id}/view"""
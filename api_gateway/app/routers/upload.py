@@ -1,9 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-import hashlib
-import asyncio
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends
+import os
+import httpx
 
 from ..services.file_client import FileServiceClient
 from ..services.analysis_client import AnalysisServiceClient
+from ..services.http_pool import get_http_client
+from ..services.text_extraction import ExtractionPool, get_extraction_pool
+from ..services.upload_pipeline import UploadTooLargeError, spool_upload
 
 router = APIRouter()
 
@@ -13,56 +16,46 @@ async def upload_work(
         background_tasks: BackgroundTasks,
         file: UploadFile = File(...),
         student_name: str = Form(...),
-        assignment_id: str = Form(...)
+        assignment_id: str = Form(...),
+        http_client: httpx.AsyncClient = Depends(get_http_client),
+        extraction_pool: ExtractionPool = Depends(get_extraction_pool)
 ):
     """
     Загружает работу студента.
 
     Процесс:
-    1. Сохраняет файл в File Storing Service
-    2. Запускает анализ в фоновом режиме
+    1. За один проход считает хэш и размер, сохраняя файл во временный
+    2. Извлекает текст и сохраняет файл в File Storing Service
+    3. Запускает анализ в фоновом режиме
     """
-    # Проверяем размер файла (максимум 10MB)
-    file_content = await file.read()
-    if len(file_content) > 10 * 1024 * 1024:  # 10MB
+    # Проверяем размер файла (максимум 10MB) прямо при чтении
+    try:
+        spooled = await spool_upload(file, max_size=10 * 1024 * 1024)
+    except UploadTooLargeError:
         raise HTTPException(status_code=400, detail="File too large. Max size is 10MB")
 
-    # Шаг 1: Загружаем файл в File Storing Service
-    file_service = FileServiceClient()
     try:
-        # Возвращаем указатель на начало файла для повторного чтения
-        await file.seek(0)
-        work_data = await file_service.upload_file(file, student_name, assignment_id)
+        # Текст для анализа и облака слов
+        file_text = await extraction_pool.extract(spooled.path, file.filename)
+
+        # Шаг 1: Загружаем файл в File Storing Service
+        work_data = await FileServiceClient(http_client).upload_file(spooled, student_name, assignment_id,
+                                                                     file_text)
 
         if not work_data:
             raise HTTPException(status_code=500, detail="Failed to upload file")
 
         work_id = work_data["id"]
-        file_hash = work_data["file_hash"]
-
-        # Шаг 2: Запускаем анализ в фоновом режиме
-        analysis_service = AnalysisServiceClient()
-
-        # Читаем содержимое файла для анализа текста
-        await file.seek(0)
-        file_content_for_analysis = await file.read()
-
-        # Для текстовых файлов извлекаем текст для облака слов
-        file_text = None
-        if file.filename.endswith('.txt'):
-            try:
-                file_text = file_content_for_analysis.decode('utf-8', errors='ignore')
-            except:
-                pass
 
-        # Добавляем фоновую задачу для анализа
+        # Шаг 2: Добавляем фоновую задачу для анализа
         background_tasks.add_task(
             process_analysis,
+            http_client,
             work_id,
             student_name,
             assignment_id,
             file.filename,
-            file_hash,
+            spooled.file_hash,
             file_text
         )
 
@@ -70,19 +63,21 @@ async def upload_work(
             "message": "File uploaded successfully. Analysis started.",
             "work_id": work_id,
             "status": "processing",
-            "file_hash": file_hash
+            "file_hash": spooled.file_hash
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await file_service.close()
+        os.remove(spooled.path)
 
 
-async def process_analysis(work_id: int, student_name: str, assignment_id: str,
+async def process_analysis(http_client: httpx.AsyncClient, work_id: int, student_name: str, assignment_id: str,
                            file_name: str, file_hash: str, file_text: str = None):
     """Фоновая задача для запуска анализа"""
-    analysis_service = AnalysisServiceClient()
+    analysis_service = AnalysisServiceClient(http_client)
     try:
         await analysis_service.analyze_file(
             work_id=work_id,
@@ -95,18 +90,12 @@ async def process_analysis(work_id: int, student_name: str, assignment_id: str,
         print(f"Analysis started for work {work_id}")
     except Exception as e:
         print(f"Failed to start analysis for work {work_id}: {str(e)}")
-    finally:
-        await analysis_service.close()
 
 
 @router.get("/works/{work_id}")
-async def get_work_info(work_id: int):
+async def get_work_info(work_id: int, http_client: httpx.AsyncClient = Depends(get_http_client)):
     """Получает информацию о работе"""
-    file_service = FileServiceClient()
-    try:
-        work_data = await file_service.get_work(work_id)
-        if not work_data:
-            raise HTTPException(status_code=404, detail="Work not found")
-        return work_data
-    finally:
-        await file_service.close()
\ No newline at end of file
+    work_data = await FileServiceClient(http_client).get_work(work_id)
+    if not work_data:
+        raise HTTPException(status_code=404, detail="Work not found")
+    return work_data
\ No newline at end of file
@@ -4,9 +4,10 @@ from ..config import settings
 
 
 class AnalysisServiceClient:
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient):
+        # Общий клиент приложения — клиент сервиса его не закрывает
         self.base_url = settings.analysis_service_url
-        self.client = httpx.AsyncClient(timeout=settings.timeout_seconds)
+        self.client = client
 
     async def analyze_file(self, work_id: int, student_name: str, assignment_id: str,
                            file_name: str, file_hash: str, file_content: str = None):
@@ -66,7 +67,4 @@ class AnalysisServiceClient:
             raise HTTPException(
                 status_code=503,
                 detail=f"Analysis service unavailable: {str(e)}"
-            )
-
-    async def close(self):
-        await self.client.aclose()
\ No newline at end of file
+            )
\ No newline at end of file
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+# Итоговые статусы: после них поток событий работы закрывается
+FINAL_STATUSES = ("completed", "failed")
+
+
+def format_sse(event: dict) -> bytes:
+    """Событие в формате text/event-stream: имя — статус, данные — JSON"""
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['status']}\ndata: {data}\n\n".encode('utf-8')
+
+
+class EventBroker:
+    """
+    Публикация/подписка в памяти шлюза: события статуса анализа по
+    темам («work:5»). У каждого подписчика своя ограниченная очередь;
+    если клиент не успевает читать, старые события вытесняются новыми.
+    Последнее событие темы хранится (не больше max_topics тем), чтобы
+    подключившийся позже сразу получил текущий статус.
+    """
+
+    def __init__(self, queue_size: int = 16, max_topics: int = 10000):
+        self.queue_size = queue_size
+        self.max_topics = max_topics
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._last: "OrderedDict[str, dict]" = OrderedDict()
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    @contextmanager
+    def subscribe(self, topic: str) -> Iterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(topic)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._subscribers
+
+    def last(self, topic: str) -> Optional[dict]:
+        return self._last.get(topic)
+
+    def publish(self, topic: str, event: dict) -> int:
+        """Рассылает событие подписчикам темы; возвращает их число"""
+        self.stats["published"] += 1
+        self._last[topic] = event
+        self._last.move_to_end(topic)
+        while len(self._last) > self.max_topics:
+            self._last.popitem(last=False)
+
+        queues = self._subscribers.get(topic, ())
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.stats["dropped"] += 1
+            queue.put_nowait(event)
+            self.stats["delivered"] += 1
+        return len(queues)
+
+    def info(self) -> dict:
+        return {"stats": self.stats, "topics": len(self._subscribers),
+                "subscribers": sum(len(queues) for queues in self._subscribers.values())}
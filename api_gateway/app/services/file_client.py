@@ -1,33 +1,21 @@
 import httpx
-from fastapi import UploadFile, HTTPException
+from fastapi import HTTPException
 from ..config import settings
+from .upload_pipeline import SpooledUpload, forward_upload
 
 
 class FileServiceClient:
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient):
+        # Общий клиент приложения — клиент сервиса его не закрывает
         self.base_url = settings.file_service_url
-        self.client = httpx.AsyncClient(timeout=settings.timeout_seconds)
+        self.client = client
 
-    async def upload_file(self, file: UploadFile, student_name: str, assignment_id: str):
-        """Загружает файл в File Storing Service"""
+    async def upload_file(self, spooled: SpooledUpload, student_name: str, assignment_id: str,
+                          extracted_text: str = ""):
+        """Загружает файл в File Storing Service вместе с посчитанным хэшем и текстом"""
         try:
-            # Читаем содержимое файла
-            file_content = await file.read()
-
-            # Отправляем multipart/form-data запрос
-            files = {
-                "file": (file.filename, file_content, file.content_type)
-            }
-            data = {
-                "student_name": student_name,
-                "assignment_id": assignment_id
-            }
-
-            response = await self.client.post(
-                f"{self.base_url}/api/v1/upload",
-                files=files,
-                data=data
-            )
+            response = await forward_upload(self.client, f"{self.base_url}/api/v1/upload", spooled,
+                                            student_name, assignment_id, extracted_text)
 
             if response.status_code != 201:
                 raise HTTPException(
@@ -57,7 +45,4 @@ class FileServiceClient:
             raise HTTPException(
                 status_code=503,
                 detail=f"File service unavailable: {str(e)}"
-            )
-
-    async def close(self):
-        await self.client.aclose()
\ No newline at end of file
+            )
\ No newline at end of file
@@ -0,0 +1,126 @@
+import importlib.util
+import time
+from collections import deque
+from typing import Deque, Dict
+
+import httpx
+from fastapi import Request
+
+LATENCY_SAMPLES = 1024
+
+
+def http2_available() -> bool:
+    """HTTP/2 в httpx требует пакет h2 (httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class UpstreamStats:
+    """Счётчики запросов к одному сервису (host:port)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.statuses: Dict[str, int] = {}
+        self.http_versions: Dict[str, int] = {}
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def to_dict(self) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            # Запросы без ответа: ещё выполняются или завершились ошибкой соединения
+            "unanswered": self.requests - self.responses,
+            "statuses": self.statuses,
+            "http_versions": self.http_versions,
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3)
+        }
+
+
+class HTTPPoolMetrics:
+    """
+    Метрики общего пула соединений по сервисам. Собираются через
+    event hooks клиента: время до заголовков ответа, коды ответов,
+    версия протокола.
+    """
+
+    def __init__(self):
+        self.upstreams: Dict[str, UpstreamStats] = {}
+
+    def _upstream(self, url: httpx.URL) -> UpstreamStats:
+        key = f"{url.host}:{url.port or (443 if url.scheme == 'https' else 80)}"
+        stats = self.upstreams.get(key)
+        if stats is None:
+            stats = self.upstreams[key] = UpstreamStats()
+        return stats
+
+    async def on_request(self, request: httpx.Request) -> None:
+        request.extensions["pool_started_at"] = time.perf_counter()
+        self._upstream(request.url).requests += 1
+
+    async def on_response(self, response: httpx.Response) -> None:
+        request = response.request
+        stats = self._upstream(request.url)
+        stats.responses += 1
+        status = f"{response.status_code // 100}xx"
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.http_versions[response.http_version] = stats.http_versions.get(response.http_version, 0) + 1
+        started = request.extensions.get("pool_started_at")
+        if started is not None:
+            stats.latencies.append(time.perf_counter() - started)
+
+    def event_hooks(self) -> dict:
+        return {"request": [self.on_request], "response": [self.on_response]}
+
+    def stats(self, client: httpx.AsyncClient = None) -> dict:
+        result = {"upstreams": {name: stats.to_dict() for name, stats in self.upstreams.items()}}
+        if client is not None:
+            result["pool"] = pool_snapshot(client)
+        return result
+
+
+def pool_snapshot(client: httpx.AsyncClient) -> dict:
+    """Открытые и простаивающие соединения пула (внутренности httpcore, если доступны)"""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    return {
+        "connections": len(connections),
+        "idle": sum(1 for connection in connections if connection.is_idle()),
+        "http2": sum(1 for connection in connections
+                     if getattr(connection, "_connection", None).__class__.__name__ == "AsyncHTTP2Connection")
+    }
+
+
+def create_client(metrics: HTTPPoolMetrics, timeout: float = 30.0, max_connections: int = 100,
+                  max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0,
+                  http2: bool = True) -> httpx.AsyncClient:
+    """
+    Общий на всё приложение клиент: соединения к сервисам переиспользуются
+    между запросами (keep-alive), без TCP-рукопожатия на каждый вызов.
+    HTTP/2 включается, только если установлен h2; для http:// адресов
+    httpx всё равно использует HTTP/1.1, мультиплексирование работает по TLS.
+    """
+    use_http2 = http2 and http2_available()
+    if http2 and not use_http2:
+        print("⚠️ Пакет h2 не установлен — межсервисные запросы идут по HTTP/1.1")
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_keepalive_connections,
+                            keepalive_expiry=keepalive_expiry),
+        http2=use_http2,
+        event_hooks=metrics.event_hooks()
+    )
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Зависимость FastAPI: общий клиент, созданный в lifespan приложения"""
+    return request.app.state.http_client
@@ -0,0 +1,181 @@
+import json
+import os
+import tempfile
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from .multipart import MultipartFile, MultipartStream
+from .upload_pipeline import UploadTooLargeError
+
+CHUNK_SIZE = 1024 * 1024
+MAX_REPORTED_FAILURES = 100
+FINISHED_STATUSES = ("completed", "failed")
+
+
+async def spool_archive(upload: UploadFile, max_size: Optional[int] = None) -> str:
+    """
+    Сохраняет загружаемый архив во временный файл по частям. Больше
+    max_size байт не пишется: UploadTooLargeError, файл удаляется.
+    """
+    fd, path = tempfile.mkstemp(prefix="import-", suffix=".archive")
+    size = 0
+    try:
+        target = os.fdopen(fd, "wb")
+        try:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLargeError(f"Archive size exceeds {max_size} bytes")
+                await run_in_threadpool(target.write, chunk)
+        finally:
+            await run_in_threadpool(target.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+class ImportJobs:
+    """
+    Задачи массового импорта в памяти шлюза. Хранятся все активные
+    задачи и не больше max_finished завершённых (старые вытесняются).
+    """
+
+    def __init__(self, max_finished: int = 100):
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+
+    def create(self, file_name: str, assignment_id: Optional[str]) -> dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "file_name": file_name,
+            "assignment_id": assignment_id,
+            "total": None,
+            "processed": 0,
+            "stored": 0,
+            "duplicates": 0,
+            "skipped": 0,
+            "errors": 0,
+            "to_analyze": 0,
+            "analyzed": 0,
+            "analysis_failed": 0,
+            "work_ids": [],
+            "failures": [],
+            "detail": None,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None
+        }
+        self._jobs[job["id"]] = job
+        self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+def _record_failure(job: dict, file_name: str, reason: str) -> None:
+    if len(job["failures"]) < MAX_REPORTED_FAILURES:
+        job["failures"].append({"file": file_name, "reason": reason})
+
+
+def _apply_event(job: dict, event: dict) -> Optional[List[dict]]:
+    """Обновляет прогресс по событию импорта; для done возвращает работы"""
+    kind = event.get("event")
+    if kind == "started":
+        job["total"] = event["total"]
+    elif kind == "entry":
+        job["processed"] = event["index"]
+        status = event["status"]
+        if status == "stored":
+            job["stored"] += 1
+        elif status == "duplicate":
+            job["duplicates"] += 1
+        elif status == "skipped":
+            job["skipped"] += 1
+        else:
+            job["errors"] += 1
+            _record_failure(job, event["file"], event.get("reason", ""))
+    elif kind == "done":
+        return event["works"]
+    elif kind == "error":
+        raise RuntimeError(event.get("detail", "Ошибка импорта"))
+    return None
+
+
+async def run_import_job(client: httpx.AsyncClient, job: dict, archive_path: str, file_service_url: str,
+                         analysis_service_url: str, batch_size: int = 20,
+                         on_analyzed: Optional[Callable[[int, str, Optional[str]], Awaitable[None]]] = None
+                         ) -> None:
+    """
+    Фоновая задача: передаёт архив в File Storing Service, читая поток
+    событий прогресса, затем отправляет новые работы на анализ пакетами.
+    on_analyzed(work_id, assignment_id, error) вызывается для каждой
+    работы пакета по его завершении.
+    """
+    try:
+        job["status"] = "importing"
+        works: List[dict] = []
+        data = {"assignment_id": job["assignment_id"]} if job["assignment_id"] else {}
+
+        body = MultipartStream(data, [MultipartFile("archive", job["file_name"], archive_path)])
+
+        # Импорт большого архива идёт долго: ограничиваем только подключение и запись
+        async with client.stream("POST", f"{file_service_url}/import", content=body, headers=body.headers,
+                                 timeout=httpx.Timeout(30.0, read=None)) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise RuntimeError(response.json().get("detail", "Ошибка импорта архива"))
+            async for line in response.aiter_lines():
+                if line:
+                    works = _apply_event(job, json.loads(line)) or works
+
+        job["work_ids"] = [work["id"] for work in works]
+        job["to_analyze"] = len(works)
+        job["status"] = "analyzing"
+        print(f"📦 Импорт {job['id']}: сохранено {len(works)} работ, запуск анализа")
+
+        for start in range(0, len(works), batch_size):
+            batch = [
+                {"work_id": work["id"], "student_name": work["student_name"],
+                 "assignment_id": work["assignment_id"], "file_name": work["file_name"],
+                 "file_hash": work["file_hash"]}
+                for work in works[start:start + batch_size]
+            ]
+            try:
+                response = await client.post(f"{analysis_service_url}/analyze/batch",
+                                             json={"works": batch}, timeout=300.0)
+                response.raise_for_status()
+                result = response.json()
+                job["analyzed"] += result["total"] - result["failed"]
+                job["analysis_failed"] += result["failed"]
+                errors = {item["work_id"]: item.get("error") for item in result["results"]}
+            except httpx.HTTPError as e:
+                print(f"❌ Ошибка пакетного анализа: {e}")
+                job["analysis_failed"] += len(batch)
+                errors = {work["work_id"]: str(e) for work in batch}
+
+            if on_analyzed is not None:
+                for work in batch:
+                    await on_analyzed(work["work_id"], work["assignment_id"], errors.get(work["work_id"]))
+
+        job["status"] = "completed"
+        print(f"✅ Импорт {job['id']} завершён: проанализировано {job['analyzed']} из {job['to_analyze']}")
+    except Exception as e:
+        print(f"❌ Ошибка импорта {job['id']}: {e}")
+        job["status"] = "failed"
+        job["detail"] = str(e)
+    finally:
+        job["finished_at"] = datetime.now().isoformat()
+        os.remove(archive_path)
@@ -0,0 +1,76 @@
+import os
+import uuid
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class MultipartFile(NamedTuple):
+    field: str
+    file_name: str
+    source: Union[str, bytes]  # Путь к файлу на диске или содержимое
+    content_type: Optional[str] = None
+
+
+def _quote(value: str) -> str:
+    """Экранирование имени в Content-Disposition (как в httpx): кавычки, обратная косая черта, переводы строк"""
+    return (value.replace("\\", "\\\\").replace('"', "%22")
+            .replace("\r", "%0D").replace("\n", "%0A"))
+
+
+class MultipartStream:
+    """
+    Тело multipart/form-data, которое httpx отправляет по частям. Файлы
+    читаются чанками в пуле потоков — event loop не блокируется на диске,
+    как при передаче в httpx обычного файлового объекта. Размеры частей
+    известны заранее, поэтому запрос уходит с Content-Length, и принимающий
+    сервис может отклонить слишком большое тело сразу.
+    """
+
+    def __init__(self, fields: Dict[str, str], files: List[MultipartFile]):
+        self.boundary = uuid.uuid4().hex
+        self.fields = fields
+        self.files = files
+
+    def _field_part(self, name: str, value: str) -> bytes:
+        return (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f'{value}\r\n').encode('utf-8')
+
+    def _file_header(self, part: MultipartFile) -> bytes:
+        content_type = part.content_type or "application/octet-stream"
+        return (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(part.field)}"; '
+                f'filename="{_quote(part.file_name)}"\r\nContent-Type: {content_type}\r\n\r\n').encode('utf-8')
+
+    def _closing(self) -> bytes:
+        return f'--{self.boundary}--\r\n'.encode('utf-8')
+
+    @staticmethod
+    def _source_size(part: MultipartFile) -> int:
+        return len(part.source) if isinstance(part.source, bytes) else os.path.getsize(part.source)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        length = sum(len(self._field_part(name, value)) for name, value in self.fields.items())
+        length += sum(len(self._file_header(part)) + self._source_size(part) + 2 for part in self.files)
+        length += len(self._closing())
+        return {"Content-Type": f"multipart/form-data; boundary={self.boundary}",
+                "Content-Length": str(length)}
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for name, value in self.fields.items():
+            yield self._field_part(name, value)
+        for part in self.files:
+            yield self._file_header(part)
+            if isinstance(part.source, bytes):
+                yield part.source
+            else:
+                f = await run_in_threadpool(open, part.source, "rb")
+                try:
+                    while chunk := await run_in_threadpool(f.read, CHUNK_SIZE):
+                        yield chunk
+                finally:
+                    await run_in_threadpool(f.close)
+            yield b"\r\n"
+        yield self._closing()
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Ответы сервисов, которые имеет смысл кэшировать (404 — «отчёта ещё нет»)
+CACHEABLE_STATUSES = (200, 404)
+# Клиент всегда перепроверяет ответ по ETag — устаревший отчёт он не покажет
+CACHE_CONTROL = "no-cache"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    status_code: int
+    media_type: str
+    etag: str
+    expires_at: float
+    tags: Tuple[str, ...]
+
+
+def etag_for(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка If-None-Match (слабое сравнение, список или *)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in ("*", etag):
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Кэш ответов сервисов в памяти шлюза (отчёты по работам и заданиям).
+
+    Запись живёт не дольше ttl секунд и сбрасывается раньше по тегу
+    («work:5», «assignment:hw_1»), когда шлюз узнаёт о завершении анализа.
+    Одновременные промахи по одному ключу объединяются в один запрос к
+    сервису. Ответ несёт ETag: при совпадении If-None-Match отдаётся 304
+    без тела. При переполнении вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation = 0  # Растёт при каждом сбросе по тегу
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "not_modified": 0,
+                      "invalidations": 0, "expired": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self.stats["expired"] += 1
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _entry(self, body: bytes, status_code: int, media_type: str, tags: Iterable[str]) -> CachedResponse:
+        return CachedResponse(body, status_code, media_type, etag_for(body),
+                              time.monotonic() + self.ttl, tuple(tags))
+
+    def put(self, key: str, body: bytes, status_code: int, media_type: str,
+            tags: Iterable[str] = ()) -> CachedResponse:
+        entry = self._entry(body, status_code, media_type, tags)
+        if status_code not in CACHEABLE_STATUSES:
+            return entry
+        self._drop(key)
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+        return entry
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str) -> int:
+        """Сбрасывает все записи с любым из тегов; возвращает их число"""
+        self._generation += 1
+        dropped = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+                dropped += 1
+        self.stats["invalidations"] += dropped
+        return dropped
+
+    async def fetch(self, key: str, tags: Iterable[str],
+                    loader: Callable[[], Awaitable[Tuple[bytes, int, str]]]) -> CachedResponse:
+        """Запись из кэша или результат loader() — (тело, код, тип), сохранённый в кэш"""
+        entry = self.get(key)
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            # Загрузка — отдельная задача: отключение первого клиента не отменит её для остальных
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, tuple(tags), loader))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, tags: Tuple[str, ...],
+                    loader: Callable[[], Awaitable[Tuple[bytes, int, str]]]) -> CachedResponse:
+        generation = self._generation
+        try:
+            body, status_code, media_type = await loader()
+            if generation != self._generation:
+                # Пока шёл запрос, анализ завершился — ответ мог устареть, в кэш его не кладём
+                return self._entry(body, status_code, media_type, tags)
+            return self.put(key, body, status_code, media_type, tags)
+        finally:
+            self._inflight.pop(key, None)
+
+    def respond(self, request: Request, entry: CachedResponse) -> Response:
+        """Ответ клиенту: 304 при совпадении ETag, иначе тело из кэша"""
+        headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+        if entry.status_code == 200 and etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, status_code=entry.status_code,
+                        media_type=entry.media_type, headers=headers)
+
+    def info(self) -> dict:
+        return {"stats": self.stats, "entries": len(self._entries), "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl}
@@ -0,0 +1,220 @@
+import asyncio
+import io
+import re
+import signal
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Iterator, List, Optional, Union
+
+from fastapi import Request
+
+# Сверх таймаута воркера: если он не прервался сам (завис в C-коде), воркер перезапускается
+KILL_GRACE_SECONDS = 5.0
+
+# Те же правила, что у нормализации текстовых копий в File Storing Service
+CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+TRAILING_SPACES_RE = re.compile(r"[ \t]+\n")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class ExtractionTimeout(BaseException):
+    """
+    Документ не разобран за отведённое время. Наследуется от BaseException,
+    чтобы обработчики except Exception в парсерах и в _iter_pdf не
+    перехватывали сигнал таймаута.
+    """
+
+
+def _open(source: Union[bytes, str]) -> BinaryIO:
+    """Документ передаётся байтами или путём к временному файлу"""
+    if isinstance(source, str):
+        return open(source, "rb")
+    return io.BytesIO(source)
+
+
+def _decode(stream: BinaryIO) -> Iterator[str]:
+    text = stream.read().decode('utf-8', errors='ignore')
+    if text:
+        yield text
+
+
+def _iter_pdf(stream: BinaryIO) -> Iterator[str]:
+    """Текст PDF по страницам: PyPDF2, если он ничего не нашёл — pdfplumber"""
+    found = False
+    try:
+        import PyPDF2
+        for page in PyPDF2.PdfReader(stream).pages:
+            page_text = page.extract_text()
+            if page_text:
+                found = True
+                yield page_text
+    except Exception as e:
+        if found:
+            raise
+        print(f"⚠️ PyPDF2 не прочитал PDF: {e}")
+    if found:
+        return
+
+    import pdfplumber
+    stream.seek(0)
+    with pdfplumber.open(stream) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                yield page_text
+            # Кэш разобранных объектов страницы иначе растёт до конца документа
+            page.flush_cache()
+
+
+def _iter_docx(stream: BinaryIO) -> Iterator[str]:
+    import docx
+    for paragraph in docx.Document(stream).paragraphs:
+        if paragraph.text:
+            yield paragraph.text
+
+
+def iter_text(source: Union[bytes, str], filename: str) -> Iterator[str]:
+    """
+    Постраничный (для DOCX — по абзацам) генератор текста документа.
+    Парсеры импортируются только при первом документе своего формата.
+    """
+    with _open(source) as stream:
+        if filename.endswith('.pdf'):
+            yield from _iter_pdf(stream)
+        elif filename.endswith(('.doc', '.docx')):
+            yield from _iter_docx(stream)
+        else:
+            # .txt и неизвестные форматы декодируются как текст
+            yield from _decode(stream)
+
+
+def normalize_extracted(text: str) -> str:
+    """
+    Приводит текст к виду, в котором File Storing Service хранит его копию:
+    NFC, \\n, без управляющих символов и лишних пустых строк. Анализ получает
+    тот же текст, что потом загружается из хранилища, — оценки и смещения
+    фрагментов не зависят от того, вытеснен ли текст из кэша анализа.
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = CONTROL_CHARS_RE.sub("", text)
+    text = TRAILING_SPACES_RE.sub("\n", text)
+    text = BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def _on_alarm(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+    """Инициализация процесса-воркера: ограничение памяти и обработчик таймаута"""
+    signal.signal(signal.SIGALRM, _on_alarm)
+    if memory_limit_mb > 0:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"⚠️ Не удалось ограничить память воркера: {e}")
+
+
+def extract_text(source: Union[bytes, str], filename: str, timeout: float = 0) -> str:
+    """Выполняется в процессе-воркере: весь текст документа, нормализованный"""
+    if timeout > 0:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return normalize_extracted("\n".join(iter_text(source, filename)))
+    finally:
+        if timeout > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class ExtractionPool:
+    """
+    Пул процессов для извлечения текста из загружаемых документов.
+
+    Разбор PDF/DOCX нагружает CPU и держит GIL, поэтому вынесен из event
+    loop шлюза в отдельные процессы. Каждый документ ограничен по времени
+    (timeout) и памяти воркера (memory_limit_mb, RLIMIT_AS); ошибка,
+    нехватка памяти или таймаут дают пустой текст — анализ тогда получит
+    текст из File Storing Service.
+
+    Каждый воркер — отдельный однопроцессный executor, документ занимает
+    свободный воркер целиком. Зависший или упавший воркер перезапускается
+    один: документы, которые разбирают остальные воркеры, не теряются.
+    """
+
+    def __init__(self, max_workers: int = 2, timeout: float = 30.0, memory_limit_mb: int = 1024):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._workers: List[ProcessPoolExecutor] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self.stats = {"documents": 0, "failed": 0, "timeouts": 0, "restarts": 0, "seconds_total": 0.0}
+
+    def _new_worker(self) -> ProcessPoolExecutor:
+        worker = ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(self.memory_limit_mb,))
+        self._workers.append(worker)
+        return worker
+
+    def start(self) -> None:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.max_workers):
+                self._idle.put_nowait(self._new_worker())
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.shutdown(wait=False, cancel_futures=True)
+        self._workers = []
+        self._idle = None
+
+    def _recycle(self, worker: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Убивает зависший или упавший воркер и возвращает новый на его место"""
+        for process in list(getattr(worker, "_processes", {}).values()):
+            process.kill()
+        worker.shutdown(wait=False, cancel_futures=True)
+        if worker in self._workers:
+            self._workers.remove(worker)
+        self.stats["restarts"] += 1
+        return self._new_worker()
+
+    async def extract(self, source: Union[bytes, str], filename: str) -> str:
+        """Текст документа или пустая строка, если его не удалось извлечь"""
+        self.start()
+        idle = self._idle
+        worker = await idle.get()
+        started = time.perf_counter()
+        self.stats["documents"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(worker, extract_text, source, filename.lower(), self.timeout)
+            deadline = self.timeout + KILL_GRACE_SECONDS if self.timeout > 0 else None
+            return await asyncio.wait_for(future, timeout=deadline)
+        except (ExtractionTimeout, asyncio.TimeoutError) as e:
+            self.stats["timeouts"] += 1
+            print(f"⏱️  Извлечение текста из {filename} не уложилось в {self.timeout} с")
+            if isinstance(e, asyncio.TimeoutError):
+                worker = self._recycle(worker)
+            return ""
+        except BrokenProcessPool:
+            # Воркер убит (например, OOM killer) — его executor больше не принимает задачи
+            self.stats["failed"] += 1
+            print(f"❌ Воркер извлечения текста упал на {filename}")
+            worker = self._recycle(worker)
+            return ""
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"❌ Ошибка извлечения текста из {filename}: {e!r}")
+            return ""
+        finally:
+            self.stats["seconds_total"] += time.perf_counter() - started
+            idle.put_nowait(worker)
+
+
+def get_extraction_pool(request: Request) -> ExtractionPool:
+    """Зависимость FastAPI: пул извлечения текста, запущенный в lifespan приложения"""
+    return request.app.state.extraction_pool
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, NamedTuple, Optional
+
+import httpx
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from .multipart import MultipartFile, MultipartStream
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Загружаемый файл превысил допустимый размер"""
+
+
+class SpooledUpload(NamedTuple):
+    """Загруженный файл во временном файле шлюза с посчитанными хэшем и размером"""
+    path: str
+    file_name: str
+    content_type: Optional[str]
+    file_hash: str
+    file_size: int
+
+
+def _write_chunk(target: BinaryIO, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    target.write(chunk)
+
+
+async def spool_upload(upload: UploadFile, max_size: Optional[int] = None) -> SpooledUpload:
+    """
+    Один проход по телу загрузки: SHA-256, размер и копия во временном
+    файле. Дальше файл только читается — извлечением текста и при
+    отправке в File Storing Service — и целиком в памяти не держится.
+    Временный файл удаляет вызывающий.
+    """
+    fd, path = tempfile.mkstemp(prefix="upload-")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLargeError(f"File size exceeds {max_size} bytes")
+                await run_in_threadpool(_write_chunk, target, hasher, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, upload.filename, upload.content_type, hasher.hexdigest(), size)
+
+
+async def forward_upload(client: httpx.AsyncClient, url: str, spooled: SpooledUpload,
+                         student_name: str, assignment_id: str, extracted_text: str = "") -> httpx.Response:
+    """
+    Передаёт файл в File Storing Service вместе с уже посчитанным хэшем и
+    извлечённым текстом: сервис не разбирает файл повторно, а хэш либо
+    сверяет, либо принимает на веру (verify_upload_hash). Временный файл
+    читается в пуле потоков (MultipartStream), а не на event loop.
+    """
+    files = [MultipartFile("file", spooled.file_name, spooled.path, spooled.content_type)]
+    if extracted_text:
+        files.append(MultipartFile("extracted_text", "text.txt", extracted_text.encode('utf-8'),
+                                   "text/plain; charset=utf-8"))
+    data = {"student_name": student_name, "assignment_id": assignment_id, "file_hash": spooled.file_hash}
+    body = MultipartStream(data, files)
+    return await client.post(url, content=body, headers=body.headers)
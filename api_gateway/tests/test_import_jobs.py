@@ -0,0 +1,32 @@
+import asyncio
+import io
+import os
+import tempfile
+
+import pytest
+from fastapi import UploadFile
+
+from app.services.import_jobs import spool_archive
+from app.services.upload_pipeline import UploadTooLargeError
+
+
+def spooled_files():
+    return {name for name in os.listdir(tempfile.gettempdir()) if name.startswith("import-")}
+
+
+def test_spool_archive_stops_at_max_size():
+    before = spooled_files()
+    upload = UploadFile(io.BytesIO(b"x" * (3 * 1024 * 1024)), filename="works.zip")
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(spool_archive(upload, max_size=1024 * 1024))
+    assert spooled_files() == before
+
+
+def test_spool_archive_within_limit():
+    upload = UploadFile(io.BytesIO(b"archive"), filename="works.zip")
+    path = asyncio.run(spool_archive(upload, max_size=1024))
+    try:
+        with open(path, "rb") as f:
+            assert f.read() == b"archive"
+    finally:
+        os.remove(path)
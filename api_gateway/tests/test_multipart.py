@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, File, Form, UploadFile
+
+from app.services.multipart import MultipartFile, MultipartStream
+
+receiver = FastAPI()
+
+
+@receiver.post("/import")
+async def receive(archive: UploadFile = File(...), assignment_id: str = Form(None)):
+    return {"file_name": archive.filename, "content": (await archive.read()).decode(),
+            "assignment_id": assignment_id}
+
+
+def post(body: MultipartStream) -> dict:
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=receiver)) as client:
+            response = await client.post("http://test/import", content=body, headers=body.headers)
+            response.raise_for_status()
+            return response.json()
+    return asyncio.run(send())
+
+
+def test_streams_file_from_disk(tmp_path):
+    path = tmp_path / "archive.zip"
+    path.write_bytes(b"x" * 3000)
+    body = MultipartStream({"assignment_id": "hw-1"}, [MultipartFile("archive", "работы.zip", str(path))])
+
+    assert post(body) == {"file_name": "работы.zip", "content": "x" * 3000, "assignment_id": "hw-1"}
+
+
+def test_content_length_matches_body():
+    body = MultipartStream({}, [MultipartFile("archive", 'a "b".zip', b"payload")])
+
+    async def collect():
+        return b"".join([chunk async for chunk in body])
+    assert int(body.headers["Content-Length"]) == len(asyncio.run(collect()))
+    # Кавычки кодируются так же, как в httpx
+    assert post(body)["file_name"] == 'a %22b%22.zip'
+
+
+def test_forward_upload_streams_spooled_file(tmp_path):
+    from app.services.upload_pipeline import SpooledUpload, forward_upload
+
+    path = tmp_path / "work.txt"
+    path.write_bytes(b"text of the work")
+    spooled = SpooledUpload(str(path), "work.txt", "text/plain", "abc", 16)
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...), extracted_text: UploadFile = File(None),
+                     student_name: str = Form(...), assignment_id: str = Form(...), file_hash: str = Form(...)):
+        return {"content": (await file.read()).decode(), "text": (await extracted_text.read()).decode(),
+                "student_name": student_name, "file_hash": file_hash}
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app)) as client:
+            return (await forward_upload(client, "http://test/upload", spooled, "Иванов", "hw-1", "текст")).json()
+
+    assert asyncio.run(send()) == {"content": "text of the work", "text": "текст",
+                                   "student_name": "Иванов", "file_hash": "abc"}
@@ -0,0 +1,109 @@
+import asyncio
+
+from starlette.requests import Request
+
+from app.services import response_cache
+from app.services.response_cache import ResponseCache
+
+
+def request_with(if_none_match: str = None) -> Request:
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_put_and_get_roundtrip():
+    cache = ResponseCache()
+    entry = cache.put("report:1", b'{"id": 1}', 200, "application/json", tags=["work:1"])
+
+    assert cache.get("report:1") == entry
+    assert cache.get("report:2") is None
+
+
+def test_error_statuses_are_not_cached():
+    cache = ResponseCache()
+    cache.put("report:1", b"oops", 502, "text/plain")
+    assert cache.get("report:1") is None
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=30.0)
+    cache.put("report:1", b"body", 200, "application/json")
+
+    now[0] += 29.0
+    assert cache.get("report:1") is not None
+    now[0] += 1.0
+    assert cache.get("report:1") is None
+    assert cache.stats["expired"] == 1
+
+
+def test_invalidate_by_tag():
+    cache = ResponseCache()
+    cache.put("report:1", b"a", 200, "application/json", tags=["work:1", "assignment:hw_1"])
+    cache.put("report:2", b"b", 200, "application/json", tags=["work:2", "assignment:hw_1"])
+    cache.put("report:3", b"c", 200, "application/json", tags=["work:3", "assignment:hw_2"])
+
+    assert cache.invalidate("assignment:hw_1") == 2
+    assert cache.get("report:1") is None and cache.get("report:2") is None
+    assert cache.get("report:3") is not None
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", b"a", 200, "text/plain")
+    cache.put("b", b"b", 200, "text/plain")
+    cache.get("a")
+    cache.put("c", b"c", 200, "text/plain")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_respond_returns_304_for_matching_etag():
+    cache = ResponseCache()
+    entry = cache.put("report:1", b'{"id": 1}', 200, "application/json")
+
+    fresh = cache.respond(request_with(), entry)
+    assert fresh.status_code == 200 and fresh.body == entry.body
+    assert fresh.headers["etag"] == entry.etag
+
+    assert cache.respond(request_with(f'"other", W/{entry.etag}'), entry).status_code == 304
+    assert cache.respond(request_with('"other"'), entry).status_code == 200
+    assert cache.stats["not_modified"] == 1
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = ResponseCache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"body", 200, "application/json"
+
+    async def run():
+        return await asyncio.gather(*(cache.fetch("report:1", ["work:1"], loader) for _ in range(5)))
+
+    entries = asyncio.run(run())
+    assert calls == 1
+    assert len({entry.etag for entry in entries}) == 1
+    assert cache.stats["misses"] == 1 and cache.stats["coalesced"] == 4
+    assert cache.get("report:1") is not None
+
+
+def test_invalidation_during_load_is_not_cached():
+    cache = ResponseCache()
+
+    async def loader():
+        # Анализ завершился, пока шёл запрос к сервису
+        cache.invalidate("work:1")
+        return b"stale", 200, "application/json"
+
+    async def run():
+        return await cache.fetch("report:1", ["work:1"], loader)
+
+    entry = asyncio.run(run())
+    assert entry.body == b"stale"
+    assert cache.get("report:1") is None
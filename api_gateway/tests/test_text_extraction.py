@@ -0,0 +1,61 @@
+import asyncio
+import signal
+import sys
+import time
+import types
+
+import pytest
+
+from app.services import text_extraction
+from app.services.text_extraction import ExtractionPool, ExtractionTimeout, extract_text, iter_text
+
+
+def test_timeout_is_not_swallowed_by_pdf_fallback(monkeypatch):
+    class PdfReader:
+        def __init__(self, stream):
+            raise ExtractionTimeout()
+
+    monkeypatch.setitem(sys.modules, "PyPDF2", types.SimpleNamespace(PdfReader=PdfReader))
+    monkeypatch.setitem(sys.modules, "pdfplumber", None)  # До запасного парсера дойти не должно
+    with pytest.raises(ExtractionTimeout):
+        list(iter_text(b"%PDF-1.4", "work.pdf"))
+
+
+def test_extracted_text_is_normalized_like_the_stored_copy():
+    raw = "Заголовок  \r\n\r\n\r\n\r\ne\u0301\x00тюд\t\nконец\n\n"
+    assert extract_text(raw.encode("utf-8"), "work.txt") == "Заголовок\n\n\u00e9тюд\nконец"
+
+
+def fake_iter_text(source, filename):
+    # Выполняется в воркере (fork копирует подменённый модуль)
+    if filename == "hang.txt":
+        # Завис в C-коде: сигнал таймаута не помогает
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        time.sleep(60)
+    elif filename == "slow.txt":
+        time.sleep(1.8)
+    yield filename
+
+
+def test_stuck_worker_is_recycled_alone(monkeypatch):
+    monkeypatch.setattr(text_extraction, "iter_text", fake_iter_text)
+    monkeypatch.setattr(text_extraction, "KILL_GRACE_SECONDS", 0.5)
+    pool = ExtractionPool(max_workers=2, timeout=2.0, memory_limit_mb=0)
+
+    async def slow_after_delay():
+        # Ещё разбирается, когда зависший воркер убивают (через 2.5 с)
+        await asyncio.sleep(1.0)
+        return await pool.extract(b"", "slow.txt")
+
+    async def run():
+        pool.start()
+        try:
+            results = await asyncio.gather(pool.extract(b"", "hang.txt"), slow_after_delay())
+            return results, await pool.extract(b"", "fast.txt")
+        finally:
+            pool.shutdown()
+
+    (hung, slow), fast = asyncio.run(run())
+    assert (hung, slow, fast) == ("", "slow.txt", "fast.txt")
+    assert pool.stats["restarts"] == 1
+    assert pool.stats["timeouts"] == 1
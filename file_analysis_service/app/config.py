@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -13,9 +13,59 @@ class Settings(BaseSettings):
     # Другие сервисы
     file_service_url: str
 
+    # Общий пул соединений к File Storing Service (создаётся в lifespan)
+    http_timeout_seconds: float = 30.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+
     # Настройки анализа
     quickchart_url: str = "https://quickchart.io"
 
+    # MinHash/LSH индекс кандидатов (порог ~ (1 / bands) ** (1 / rows))
+    lsh_bands: int = 24
+    lsh_rows: int = 3
+
+    # Индекс отпечатков winnowing (append-only файл на диске)
+    fingerprint_index_path: str = "./index/fingerprints.bin"
+    winnow_k: int = 3
+    winnow_window: int = 4
+    fingerprint_min_shared: int = 3
+
+    # Движок точного сравнения: sequence_matcher (прежний difflib, под него подобран порог 0.7)
+    # или suffix_automaton (тайлинг по словам; шкала другая — см. benchmarks/bench_similarity_engines)
+    similarity_engine: str = "sequence_matcher"
+    similarity_min_match: int = 4
+
+    # Пул процессов для сравнения (0 — по числу ядер)
+    scoring_workers: int = 0
+    scoring_chunk_size: int = 16
+    analysis_deadline_seconds: float = 60.0
+
+    # Поиск лучших совпадений с отсечением по верхним оценкам
+    search_pruning: bool = True
+    search_top_k: int = 1
+    stop_at_threshold: bool = False  # Остановиться на первом совпадении выше порога плагиата
+
+    # Метод поиска: exact (точное сравнение кандидатов) или tfidf (косинус по разреженной матрице)
+    analysis_method: str = "exact"
+    tfidf_top_k: int = 5
+
+    # Кэш предобработанных текстов
+    text_cache_max_mb: int = 256
+    text_cache_policy: str = "lru"
+
+    # Область сравнения: assignment (то же задание), group (группа заданий) или global (все работы)
+    comparison_scope: str = "global"
+    # Новая партиция наполняется работами своей области пачками такого размера
+    partition_backfill_batch: int = 500
+    # Группы заданий для режима group, например {"algorithms": ["hw_1", "hw_2"]}
+    assignment_groups: Dict[str, List[str]] = {}
+
+    # Поиск совпадающих фрагментов (seed-and-extend): длина затравки и минимальный фрагмент в словах
+    passage_seed_size: int = 5
+    passage_min_tokens: int = 8
+
     class Config:
         env_file = ".env"
 
@@ -1,13 +1,49 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import httpx
 import urllib.parse
 import re
 import difflib
 
-app = FastAPI(title="File Analysis Service", version="1.0.0")
+from .config import settings
+from .services.minhash_index import evaluate_recall
+from .services.fingerprint_index import FingerprintIndex
+from .services.similarity_engines import ENGINES, get_engine
+from .services.scoring_pool import ScoringPool
+from .services.text_cache import CachedText, PreprocessedTextCache
+from .services.text_processing import normalize_text
+from .services.storage_client import WorksCatalog, fetch_texts
+from .services.passage_alignment import find_passages
+from .services.partitions import CorpusPartition, PartitionRegistry, SCOPES
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global storage_client
+    # Один клиент на приложение: соединения к File Storing Service переиспользуются (keep-alive)
+    storage_client = httpx.AsyncClient(
+        timeout=settings.http_timeout_seconds,
+        limits=httpx.Limits(max_connections=settings.http_max_connections,
+                            max_keepalive_connections=settings.http_max_keepalive_connections,
+                            keepalive_expiry=settings.http_keepalive_expiry)
+    )
+    app.state.http_client = storage_client
+    scoring_pool.start()
+    yield
+    scoring_pool.shutdown()
+    await storage_client.aclose()
+    index_executor.shutdown(wait=True)
+    fingerprint_index.close()
+
+
+app = FastAPI(title="File Analysis Service", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,10 +61,28 @@ class AnalysisRequest(BaseModel):
     file_name: str
     file_hash: str
     file_content: str = ""
+    scope: Optional[str] = None  # assignment, group или global; по умолчанию из настроек
+
+
+class BatchAnalysisRequest(BaseModel):
+    works: List[AnalysisRequest]
 
 
 # Хранилище данных
-all_works_cache = []  # Для текстового сравнения
+text_cache = PreprocessedTextCache(max_bytes=settings.text_cache_max_mb * 1024 * 1024,
+                                   policy=settings.text_cache_policy)
+partitions = PartitionRegistry(settings.assignment_groups, bands=settings.lsh_bands, rows=settings.lsh_rows)
+fingerprint_index = FingerprintIndex(settings.fingerprint_index_path,
+                                     k=settings.winnow_k, window=settings.winnow_window)
+similarity_engine = get_engine(settings.similarity_engine, min_match=settings.similarity_min_match)
+scoring_pool = ScoringPool(settings.similarity_engine, min_match=settings.similarity_min_match,
+                           max_workers=settings.scoring_workers or None,
+                           chunk_size=settings.scoring_chunk_size)
+# Все чтения и изменения индексов кандидатов (LSH, отпечатки, TF-IDF) — в одном
+# потоке: event loop не блокируется, а индексы не меняются во время поиска
+index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index")
+storage_client: httpx.AsyncClient = None  # Создаётся в lifespan
+works_catalog = WorksCatalog()
 reports_db = []
 next_report_id = 1
 FILE_SERVICE_URL = "http://file-storing:8001"
@@ -92,88 +146,239 @@ def calculate_text_similarity(text1: str, text2: str) -> float:
     if not text1 or not text2:
         return 0.0
 
-    # Используем SequenceMatcher для сравнения текстов
-    similarity = difflib.SequenceMatcher(None, text1, text2).ratio()
-    return similarity
+    # Движок выбирается в настройках (similarity_engine)
+    return similarity_engine.similarity(text1, text2)
+
+
+async def run_indexed(fn, *args, **kwargs):
+    """Выполняет fn в потоке индексов (index_executor)"""
+    return await asyncio.get_running_loop().run_in_executor(
+        index_executor, functools.partial(fn, *args, **kwargs)
+    )
+
+
+def add_to_indexes(partition: CorpusPartition, entries: Dict[int, CachedText], signatures: Dict[int, list]):
+    """Выполняется в потоке индексов; TF-IDF строится, только если он используется"""
+    for work_id, signature in signatures.items():
+        if signature is not None:
+            partition.lsh_index.add(work_id, signature=signature)
+    for work_id, entry in entries.items():
+        if work_id not in fingerprint_index:
+            fingerprint_index.add(work_id, entry.text)
+        if settings.analysis_method == "tfidf" and work_id not in partition.tfidf_scorer:
+            partition.tfidf_scorer.add(work_id, entry.text)
+
+
+def remove_from_indexes(work_ids: List[int]):
+    """Выполняется в потоке индексов: удалённые работы убираются из всех индексов"""
+    for work_id in work_ids:
+        partitions.remove_work(work_id)
+        fingerprint_index.remove(work_id)
+
+
+def find_candidates(partition: CorpusPartition, query_text: str, signature, scope_ids: set) -> set:
+    """Выполняется в потоке индексов: кандидаты из LSH-индекса и индекса отпечатков"""
+    candidate_ids = partition.lsh_index.query(signature=signature)
+    candidate_ids.update(
+        hit["work_id"] for hit in fingerprint_index.search(
+            query_text, min_shared=settings.fingerprint_min_shared, work_ids=scope_ids
+        )
+    )
+    return candidate_ids
+
+
+async def index_works(partition: CorpusPartition, entries: Dict[int, CachedText]):
+    """Добавляет работы во все индексы кандидатов, если их там ещё нет"""
+    lsh_index = partition.lsh_index
+    missing = {work_id: entry.shingle_hashes for work_id, entry in entries.items() if work_id not in lsh_index}
+    signatures = {}
+    if missing:
+        # MinHash-сигнатуры — перебор всех перестановок по всем шинглам, считаются
+        # параллельно вне event loop (индекс при этом не меняется)
+        signatures = await asyncio.get_running_loop().run_in_executor(
+            None, lsh_index.signatures_from_hashes, missing
+        )
+    # Отпечатки winnowing и строки TF-IDF — десятки миллисекунд на большую работу
+    await run_indexed(add_to_indexes, partition, entries, signatures)
+
+
+def load_texts(work_ids: List[int]):
+    """Загрузчик промахов кэша текстов: один потоковый запрос к file-storing"""
+    return fetch_texts(storage_client, FILE_SERVICE_URL, work_ids)
+
+
+async def backfill_partition(partition: CorpusPartition, works: List[dict]):
+    """
+    Один раз наполняет индексы партиции работами её области из каталога,
+    пачками по partition_backfill_batch. Работы, которые не удалось
+    загрузить, просто остаются вне индексов и сравниваются точно.
+    """
+    if partition.backfilled:
+        return
+    async with partition.backfill_lock:
+        if partition.backfilled:
+            return
+        missing = [work["id"] for work in works if work["id"] not in partition]
+        batch_size = settings.partition_backfill_batch
+        for start in range(0, len(missing), batch_size):
+            entries = await text_cache.get_many(missing[start:start + batch_size], load_texts)
+            await index_works(partition, entries)
+        partition.backfilled = True
+        print(f"🗂️  Партиция {partition.key} наполнена: {len(missing)} работ")
+
+
+async def sync_catalog() -> bool:
+    """
+    Докачивает изменения каталога работ (общее keep-alive соединение) и
+    убирает удалённые работы из индексов и кэша. False, если file-storing
+    ответил ошибкой.
+    """
+    try:
+        await works_catalog.sync(storage_client, FILE_SERVICE_URL)
+    except httpx.HTTPStatusError as e:
+        print(f"Ошибка синхронизации каталога работ: {e}")
+        return False
+    removed = list(works_catalog.pop_removed())
+    if removed:
+        await run_indexed(remove_from_indexes, removed)
+    for removed_id in removed:
+        text_cache.remove(removed_id)
+    return True
 
 
 @app.post("/analyze")
 async def analyze_file(request: AnalysisRequest):
-    global next_report_id, all_works_cache
+    global next_report_id
 
     # Проверяем, не анализировалась ли уже работа
     for report in reports_db:
         if report["work_id"] == request.work_id:
             return {"message": "Анализ уже выполнен", "report_id": report["id"]}
 
+    scope = request.scope or settings.comparison_scope
+    if scope not in SCOPES:
+        raise HTTPException(status_code=400, detail=f"Неизвестная область сравнения: {scope}")
+
+    if not request.file_content:
+        # Текст не передан (массовый импорт) — берём извлечённый текст из file-storing
+        texts = await fetch_texts(storage_client, FILE_SERVICE_URL, [request.work_id])
+        request.file_content = texts.get(request.work_id, "")
+
     try:
-        # Получаем все работы из File Storing Service
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{FILE_SERVICE_URL}/works")
-
-            max_similarity = 0.0
-            original_author = None
-            matched_work_id = None
-            matched_file_name = None
-
-            if response.status_code == 200:
-                data = response.json()
-                all_works = data.get("works", [])
-
-                print(f"🔍 Проверка плагиата для работы {request.work_id}. Всего работ: {len(all_works)}")
-                print(f"📝 Текст для анализа: {len(request.file_content)} символов")
-
-                # Ищем самую похожую работу
-                for work in all_works:
-                    # Пропускаем текущую работу и работы того же студента
-                    if work["id"] == request.work_id or work["student_name"] == request.student_name:
-                        continue
-
-                    # Получаем текст из кэша (если есть)
-                    work_text = ""
-                    for cached_work in all_works_cache:
-                        if cached_work["id"] == work["id"]:
-                            work_text = cached_work.get("text", "")
-                            break
-
-                    # Если текста нет в кэше, пытаемся получить из file-storing
-                    if not work_text and request.file_content:
-                        try:
-                            file_response = await client.get(f"{FILE_SERVICE_URL}/download/{work['id']}")
-                            if file_response.status_code == 200:
-                                # Здесь нужна логика извлечения текста из файла
-                                # Для простоты предположим, что это текстовый файл
-                                try:
-                                    work_text = file_response.content.decode('utf-8', errors='ignore')
-                                except:
-                                    work_text = ""
-                        except:
-                            work_text = ""
-
-                    # Сравниваем тексты
-                    if request.file_content and work_text:
-                        similarity = calculate_text_similarity(request.file_content, work_text)
-                        print(f"  • Сравнение с работой {work['id']} ({work['student_name']}): {similarity:.2%}")
-
-                        if similarity > max_similarity:
-                            max_similarity = similarity
-                            original_author = work["student_name"]
-                            matched_work_id = work["id"]
-                            matched_file_name = work["file_name"]
-
-            # Сохраняем текст текущей работы в кэш
-            if request.file_content:
-                current_work_data = {
-                    "id": request.work_id,
-                    "student_name": request.student_name,
-                    "text": request.file_content,
-                    "created_at": datetime.now().isoformat()
-                }
-                all_works_cache.append(current_work_data)
+        # Докачиваем изменения каталога работ до обращения к партиции: по каталогу
+        # наполняется новая партиция и отсекаются удалённые работы
+        catalog_synced = await sync_catalog()
+        partition = partitions.get(scope, request.assignment_id)
+        all_works = None
+        if catalog_synced:
+            all_works = works_catalog.select(partition.assignment_ids)
+            await backfill_partition(partition, all_works)
+
+        max_similarity = 0.0
+        original_author = None
+        matched_work_id = None
+        matched_file_name = None
+        matched_passages = []
+        top_matches = []
+
+        if all_works is not None:
+            print(f"🔍 Проверка плагиата для работы {request.work_id} ({partition.key}). Всего работ: {len(all_works)}")
+            print(f"📝 Текст для анализа: {len(request.file_content)} символов")
+
+            query_text = normalize_text(request.file_content)
+
+            # Кандидаты из LSH-индекса и индекса отпечатков: точно сравниваем
+            # только их и работы, которых в индексах ещё нет
+            candidate_ids = set()
+            scope_ids = {work["id"] for work in all_works}
+            if query_text:
+                signature = await asyncio.get_running_loop().run_in_executor(
+                    None, partition.lsh_index.signature, query_text
+                )
+                candidate_ids = await run_indexed(find_candidates, partition, query_text, signature, scope_ids)
+            skipped_by_index = 0
+            compare_ids = []
+
+            # Ищем самую похожую работу
+            for work in all_works:
+                # Пропускаем текущую работу и работы того же студента
+                if work["id"] == request.work_id or work["student_name"] == request.student_name:
+                    continue
+
+                indexed = work["id"] in partition
+                if indexed and work["id"] not in candidate_ids:
+                    skipped_by_index += 1
+                    continue
+                compare_ids.append(work["id"])
+
+            # Тексты из кэша; промахи (новые и вытесненные) догружаются из file-storing
+            entries = {}
+            if query_text:
+                entries = await text_cache.get_many(compare_ids, load_texts)
+                await index_works(partition, entries)
+
+            works_by_id = {work["id"]: work for work in all_works}
+            if settings.analysis_method == "tfidf" and query_text:
+                # Одно умножение разреженной матрицы на вектор вместо цикла по кандидатам
+                excluded = {work_id for work_id, work in works_by_id.items()
+                            if work["student_name"] == request.student_name}
+                excluded.add(request.work_id)
+                top = await run_indexed(partition.tfidf_scorer.top_k, query_text,
+                                        k=settings.tfidf_top_k, exclude=excluded)
+                scores = [(work_id, similarity) for work_id, similarity in top if work_id in works_by_id]
+            else:
+                # Точное сравнение кандидатов параллельно, вне event loop; движки получают
+                # исходные тексты (sequence_matcher сравнивает их посимвольно, как раньше)
+                scoring_candidates = [(work_id, entry.text) for work_id, entry in entries.items()]
+                if settings.search_pruning:
+                    # Дешёвые верхние оценки отсекают кандидатов, которые не войдут в top-k
+                    stop_above = PLAGIARISM_THRESHOLD if settings.stop_at_threshold else None
+                    scores = await scoring_pool.search(request.file_content, scoring_candidates,
+                                                       top_k=settings.search_top_k,
+                                                       stop_above=stop_above,
+                                                       deadline=settings.analysis_deadline_seconds)
+                else:
+                    scores = await scoring_pool.score(request.file_content, scoring_candidates,
+                                                      deadline=settings.analysis_deadline_seconds)
+
+            for work_id, similarity in scores:
+                work = works_by_id[work_id]
+                print(f"  • Сравнение с работой {work_id} ({work['student_name']}): {similarity:.2%}")
+
+                if similarity > max_similarity:
+                    max_similarity = similarity
+                    original_author = work["student_name"]
+                    matched_work_id = work_id
+                    matched_file_name = work["file_name"]
+
+            ranked = sorted(scores, key=lambda item: item[1], reverse=True)[:settings.search_top_k]
+            top_matches = [
+                {"work_id": work_id, "student_name": works_by_id[work_id]["student_name"],
+                 "similarity": round(similarity, 4)}
+                for work_id, similarity in ranked
+            ]
+
+            print(f"  • Индексы: кандидатов {len(candidate_ids)}, пропущено без сравнения {skipped_by_index}")
+
+            # Совпадающие фрагменты с найденной работой (смещения в извлечённых текстах)
+            if matched_work_id is not None:
+                matched_entries = await text_cache.get_many([matched_work_id], load_texts)
+                if matched_work_id in matched_entries:
+                    matched_passages = find_passages(request.file_content, matched_entries[matched_work_id].text,
+                                                     seed_size=settings.passage_seed_size,
+                                                     window=settings.winnow_window,
+                                                     min_tokens=settings.passage_min_tokens)
+
+        # Сохраняем предобработанный текст текущей работы в кэш и индексы всех
+        # партиций, в область которых входит её задание
+        if request.file_content:
+            entry = text_cache.put(request.work_id, request.file_content)
+            for covering in partitions.covering(request.assignment_id):
+                await index_works(covering, {request.work_id: entry})
 
-            # Определяем результат
-            plagiarism_score = max_similarity
-            is_plagiarism = plagiarism_score > PLAGIARISM_THRESHOLD
+        # Определяем результат
+        plagiarism_score = max_similarity
+        is_plagiarism = plagiarism_score > PLAGIARISM_THRESHOLD
 
         # Генерация облака слов
         word_cloud_url = None
@@ -207,6 +412,11 @@ async def analyze_file(request: AnalysisRequest):
             "similarity_percentage": round(plagiarism_score * 100, 2),
             "word_cloud_url": word_cloud_url,
             "file_hash": request.file_hash,
+            "report_data": {
+                "offsets": "extracted_text",
+                "matched_passages": matched_passages,
+                "top_matches": top_matches
+            },
             "created_at": datetime.now().isoformat()
         }
 
@@ -226,22 +436,68 @@ async def analyze_file(request: AnalysisRequest):
             "similarity_percentage": round(plagiarism_score * 100, 2)
         }
 
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        print(f"⏱️  Анализ работы {request.work_id} не уложился в {settings.analysis_deadline_seconds} с")
+        raise HTTPException(status_code=504, detail="Превышено время анализа")
     except Exception as e:
         print(f"❌ Ошибка анализа: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка анализа: {str(e)}")
 
 
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Анализ пакета работ (массовый импорт). Недостающие тексты догружаются
+    одним потоковым запросом, затем работы анализируются по очереди —
+    каждая сравнивается и с работами из предыдущей части пакета.
+    """
+    missing = [work.work_id for work in request.works if not work.file_content]
+    texts = await fetch_texts(storage_client, FILE_SERVICE_URL, missing)
+
+    results = []
+    failed = 0
+    for work in request.works:
+        if not work.file_content:
+            work.file_content = texts.get(work.work_id, "")
+        try:
+            results.append({"work_id": work.work_id, **await analyze_file(work)})
+        except HTTPException as e:
+            failed += 1
+            results.append({"work_id": work.work_id, "error": e.detail, "status_code": e.status_code})
+
+    print(f"📦 Пакетный анализ: {len(results) - failed} из {len(results)} работ")
+    return {"results": results, "total": len(results), "failed": failed}
+
+
 @app.get("/works/{work_id}/report")
-async def get_report(work_id: int):
+async def get_report(work_id: int, page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=200)):
+    """Отчёт по работе; совпадающие фрагменты отдаются постранично"""
     for report in reports_db:
         if report["work_id"] == work_id:
-            return report
+            passages = report["report_data"]["matched_passages"]
+            start = (page - 1) * page_size
+            return {
+                **report,
+                "report_data": {
+                    **report["report_data"],
+                    "matched_passages": passages[start:start + page_size],
+                    "passages_total": len(passages),
+                    "page": page,
+                    "page_size": page_size
+                }
+            }
     raise HTTPException(status_code=404, detail="Отчет не найден")
 
 
 @app.get("/assignment/{assignment_id}/reports")
 async def get_assignment_reports(assignment_id: str):
-    result = [r for r in reports_db if r["assignment_id"] == assignment_id]
+    # Фрагменты не включаем: они доступны постранично в отчёте по работе
+    result = [
+        {key: value for key, value in r.items() if key != "report_data"}
+        for r in reports_db if r["assignment_id"] == assignment_id
+    ]
     return {"reports": result, "total": len(result)}
 
 
@@ -252,4 +508,66 @@ async def health():
 
 @app.get("/debug/works")
 async def debug_works():
-    return {"works": all_works_cache, "total": len(all_works_cache)}
\ No newline at end of file
+    return {"works": list(text_cache.texts()), "total": len(text_cache), "cache": text_cache.stats()}
+
+
+@app.get("/fingerprints/search")
+async def search_fingerprints(text: str, min_shared: int = 1, limit: int = 20):
+    """Поиск работ с общими фрагментами по отпечаткам winnowing"""
+    # Удалённые в file-storing работы не должны попадать в выдачу
+    try:
+        await sync_catalog()
+    except httpx.HTTPError as e:
+        print(f"File Storing Service недоступен, каталог работ не обновлён: {e}")
+    return {
+        "results": await run_indexed(fingerprint_index.search, text, min_shared=min_shared, limit=limit),
+        "indexed_works": len(fingerprint_index)
+    }
+
+
+@app.get("/debug/engines/compare")
+async def compare_engines(work_id1: int, work_id2: int):
+    """Сравнивает пару закэшированных работ всеми движками"""
+    texts = text_cache.texts()
+    if work_id1 not in texts or work_id2 not in texts:
+        raise HTTPException(status_code=404, detail="Работа не найдена в кэше")
+
+    return {
+        name: round(get_engine(name, min_match=settings.similarity_min_match)
+                    .similarity(texts[work_id1], texts[work_id2]), 4)
+        for name in ENGINES
+    }
+
+
+@app.get("/debug/search-stats")
+async def debug_search_stats():
+    """Счётчики поиска: сколько кандидатов отсечено оценками, сколько посчитано точно"""
+    return {
+        "pruning": settings.search_pruning,
+        "top_k": settings.search_top_k,
+        "stop_at_threshold": settings.stop_at_threshold,
+        "stats": scoring_pool.stats
+    }
+
+
+@app.get("/debug/lsh")
+async def debug_lsh(bands: int = None, rows: int = None, threshold: float = PLAGIARISM_THRESHOLD,
+                    sample: int = 50):
+    """Параметры LSH-индекса и recall относительно полного перебора по кэшу"""
+    bands = bands or settings.lsh_bands
+    rows = rows or settings.lsh_rows
+    if bands < 1 or rows < 1:
+        raise HTTPException(status_code=400, detail="bands и rows должны быть положительными")
+
+    # O(sample × N) точных сравнений — в пуле потоков, event loop не блокируется
+    texts = text_cache.texts()
+    recall = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+        evaluate_recall, texts, calculate_text_similarity, threshold,
+        bands=bands, rows=rows, sample_size=sample
+    ))
+    return {
+        "active_bands": settings.lsh_bands,
+        "active_rows": settings.lsh_rows,
+        "partitions": partitions.stats(),
+        "evaluation": recall
+    }
\ No newline at end of file
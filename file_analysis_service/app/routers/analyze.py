@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
 from sqlalchemy.orm import Session
 import asyncio
+import httpx
 
 from ..database.connection import get_db
 from ..database import crud
 from ..schemas.report import ReportCreate, AnalysisRequest, ReportResponse
 from ..services.plagiarism_checker import PlagiarismChecker
+from ..services.storage_client import get_http_client
 from ..services.word_cloud import WordCloudGenerator
 from ..config import settings
 
@@ -14,16 +16,19 @@ router = APIRouter()
 
 async def analyze_file_background(
         analysis_request: AnalysisRequest,
-        db: Session
+        db: Session,
+        http_client: httpx.AsyncClient
 ):
     """Фоновая задача для анализа файла"""
     try:
         # Проверяем на плагиат
         is_plagiarism, score, original_author, matched_work_id = await PlagiarismChecker.check_plagiarism(
+            http_client,
             file_hash=analysis_request.file_hash,
             assignment_id=analysis_request.assignment_id,
             student_name=analysis_request.student_name,
-            file_service_url=settings.file_service_url
+            file_service_url=settings.file_service_url,
+            scope=analysis_request.scope
         )
 
         # Генерируем облако слов (если есть текст)
@@ -63,7 +68,8 @@ async def analyze_file_background(
 async def analyze_file(
         request: AnalysisRequest,
         background_tasks: BackgroundTasks,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_db),
+        http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """
     Запускает анализ файла на плагиат.
@@ -79,7 +85,7 @@ async def analyze_file(
         }
 
     # Запускаем фоновую задачу
-    background_tasks.add_task(analyze_file_background, request, db)
+    background_tasks.add_task(analyze_file_background, request, db, http_client)
 
     return {
         "message": "Analysis started",
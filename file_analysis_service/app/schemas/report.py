@@ -33,4 +33,5 @@ class AnalysisRequest(BaseModel):
     assignment_id: str = Field(..., min_length=1, max_length=50)
     file_name: str = Field(..., min_length=1, max_length=255)
     file_hash: str = Field(..., min_length=64, max_length=64)
-    file_content: Optional[str] = None  # Для текстовых файлов можно передать текст
\ No newline at end of file
+    file_content: Optional[str] = None  # Для текстовых файлов можно передать текст
+    scope: Optional[str] = None  # assignment, group или global; по умолчанию из настроек
\ No newline at end of file
@@ -0,0 +1,192 @@
+import mmap
+import os
+import struct
+from collections import Counter
+from typing import Container, Dict, List, Optional, Set, Tuple
+
+from .text_processing import normalize_text, stable_hash
+
+FILE_MAGIC = b"WFPI0001"
+RECORD = struct.Struct("<QI")  # хэш отпечатка (u64), id работы (u32)
+# Запись с таким «хэшем» — надгробие: работа удалена из индекса
+TOMBSTONE = (1 << 64) - 1
+
+
+def winnow(words: List[str], k: int = 3, window: int = 4) -> List[Tuple[int, int]]:
+    """
+    Winnowing (MOSS): из каждого окна в `window` подряд идущих хэшей
+    k-грамм выбирается минимальный (при равенстве — самый правый).
+    Любой общий фрагмент длиной от window + k - 1 слов гарантированно
+    даёт хотя бы один общий отпечаток. Возвращает пары (хэш, позиция слова).
+    """
+    if len(words) < k:
+        return []
+
+    hashes = [stable_hash(' '.join(words[i:i + k])) for i in range(len(words) - k + 1)]
+    if len(hashes) <= window:
+        position = min(range(len(hashes)), key=lambda i: (hashes[i], -i))
+        return [(hashes[position], position)]
+
+    fingerprints = []
+    last_position = -1
+    for start in range(len(hashes) - window + 1):
+        position = min(range(start, start + window), key=lambda i: (hashes[i], -i))
+        if position != last_position:
+            fingerprints.append((hashes[position], position))
+            last_position = position
+    return fingerprints
+
+
+class FingerprintIndex:
+    """
+    Инвертированный индекс отпечатков winnowing: хэш -> id работ.
+
+    На диске хранится append-only файл из записей фиксированной длины
+    (хэш, id работы). При открытии файл читается через mmap, а в памяти
+    строится словарь, поэтому поиск не зависит от размера корпуса, а индекс
+    переживает перезапуск контейнера.
+
+    Удаление дописывает надгробие (TOMBSTONE, id работы): до перезапуска
+    работа отфильтровывается при поиске, а при открытии файл уплотняется —
+    записи удалённых работ и надгробия не попадают ни в память, ни на диск.
+    """
+
+    def __init__(self, path: str, k: int = 3, window: int = 4):
+        self.path = path
+        self.k = k
+        self.window = window
+        self._postings: Dict[int, Set[int]] = {}
+        self._fingerprint_counts: Dict[int, int] = {}
+        # Удалённые работы: отфильтровываются при поиске и повторно не добавляются
+        self._removed: Set[int] = set()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+        self._file = open(self.path, "ab")
+
+    def __len__(self) -> int:
+        return len(self._fingerprint_counts)
+
+    def __contains__(self, work_id: int) -> bool:
+        return work_id in self._fingerprint_counts
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, "wb") as f:
+                f.write(FILE_MAGIC)
+            return
+
+        with open(self.path, "r+b") as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"{self.path} не является файлом индекса отпечатков")
+
+            size = os.path.getsize(self.path)
+            body_size = size - len(FILE_MAGIC)
+            complete = body_size - body_size % RECORD.size
+            if complete != body_size:
+                # Хвост от оборванной записи (падение посреди append)
+                f.truncate(len(FILE_MAGIC) + complete)
+            if complete == 0:
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)[len(FILE_MAGIC):len(FILE_MAGIC) + complete]
+                try:
+                    removed = {work_id for fingerprint, work_id in RECORD.iter_unpack(view)
+                               if fingerprint == TOMBSTONE}
+                    for fingerprint, work_id in RECORD.iter_unpack(view):
+                        if work_id not in removed:
+                            self._index(fingerprint, work_id)
+                finally:
+                    view.release()
+
+        if removed:
+            self._removed.update(removed)
+            self._compact()
+            print(f"🗜️  Индекс отпечатков уплотнён: убрано удалённых работ {len(removed)}")
+
+    def _compact(self) -> None:
+        """Переписывает файл только из живых записей (временный файл + атомарная замена)"""
+        temp_path = self.path + ".compact"
+        with open(temp_path, "wb") as f:
+            f.write(FILE_MAGIC)
+            for fingerprint, work_ids in self._postings.items():
+                f.write(b"".join(RECORD.pack(fingerprint, work_id) for work_id in work_ids))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def _index(self, fingerprint: int, work_id: int) -> bool:
+        works = self._postings.setdefault(fingerprint, set())
+        if work_id in works:
+            return False
+        works.add(work_id)
+        self._fingerprint_counts[work_id] = self._fingerprint_counts.get(work_id, 0) + 1
+        return True
+
+    def fingerprints(self, text: str) -> Set[int]:
+        return {fingerprint for fingerprint, _ in winnow(normalize_text(text).split(), self.k, self.window)}
+
+    def add(self, work_id: int, text: str) -> int:
+        """
+        Дописывает отпечатки работы в файл. Повторное добавление ничего не
+        пишет; id удалённой работы не переиспользуется (как и в file-storing).
+        """
+        if work_id in self._fingerprint_counts or work_id in self._removed:
+            return 0
+
+        records = bytearray()
+        for fingerprint in self.fingerprints(text):
+            if self._index(fingerprint, work_id):
+                records += RECORD.pack(fingerprint, work_id)
+
+        if records:
+            self._file.write(records)
+            self._file.flush()
+        return len(records) // RECORD.size
+
+    def remove(self, work_id: int) -> bool:
+        """Дописывает надгробие работы; False, если её нет в индексе"""
+        if self._fingerprint_counts.pop(work_id, None) is None:
+            return False
+        self._removed.add(work_id)
+        self._file.write(RECORD.pack(TOMBSTONE, work_id))
+        self._file.flush()
+        return True
+
+    def search(self, text: str, min_shared: int = 1, limit: int = None,
+               work_ids: Optional[Container[int]] = None) -> List[dict]:
+        """
+        Ищет работы с общими отпечатками. containment — доля отпечатков
+        запроса, найденных в работе. work_ids ограничивает поиск работами
+        области сравнения — до отбора limit лучших.
+        """
+        query = self.fingerprints(text)
+        if not query:
+            return []
+
+        shared = Counter()
+        for fingerprint in query:
+            shared.update(self._postings.get(fingerprint, ()))
+        for work_id in self._removed.intersection(shared):
+            del shared[work_id]
+        if work_ids is not None:
+            for work_id in [work_id for work_id in shared if work_id not in work_ids]:
+                del shared[work_id]
+
+        results = [
+            {
+                "work_id": work_id,
+                "shared": count,
+                "containment": count / len(query)
+            }
+            for work_id, count in shared.most_common(limit)
+            if count >= min_shared
+        ]
+        return results
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
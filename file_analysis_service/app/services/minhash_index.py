@@ -0,0 +1,163 @@
+import random
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .text_processing import normalize_text, shingle_hashes
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+class MinHashLSHIndex:
+    """
+    MinHash-сигнатуры шинглов + LSH-бандинг.
+
+    Сигнатура из bands * rows значений делится на bands полос; работы,
+    у которых совпала хотя бы одна полоса, становятся кандидатами для
+    точного сравнения. Порог срабатывания примерно (1 / bands) ** (1 / rows)
+    по Жаккару шинглов.
+    """
+
+    def __init__(self, bands: int = 24, rows: int = 3, shingle_size: int = 3, seed: int = 42):
+        if bands < 1 or rows < 1:
+            raise ValueError("bands и rows должны быть положительными")
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        self.num_perm = bands * rows
+
+        # Одинаковый seed -> одинаковые перестановки после перезапуска
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(self.num_perm)
+        ]
+
+        self._buckets: List[Dict[Tuple[int, ...], Set[int]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[int, Tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, work_id: int) -> bool:
+        return work_id in self._signatures
+
+    @property
+    def threshold(self) -> float:
+        """Приблизительный порог Жаккара, с которого пара почти наверняка станет кандидатом"""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        """MinHash-сигнатура текста; None, если текст слишком короткий для шинглов"""
+        hashes = shingle_hashes(normalize_text(text).split(), self.shingle_size)
+        return self.signature_from_hashes(hashes)
+
+    def signature_from_hashes(self, hashes: Set[int]) -> Optional[Tuple[int, ...]]:
+        if not hashes:
+            return None
+        values = [h & MAX_HASH for h in hashes]
+        return tuple(
+            min((a * x + b) % MERSENNE_PRIME for x in values) & MAX_HASH
+            for a, b in self._permutations
+        )
+
+    def signatures_from_hashes(self, hash_sets: Dict[int, Iterable[int]]) -> Dict[int, Optional[Tuple[int, ...]]]:
+        """Сигнатуры нескольких работ за один вызов (его выполняют вне event loop)"""
+        return {work_id: self.signature_from_hashes(set(hashes)) for work_id, hashes in hash_sets.items()}
+
+    def _bands_of(self, signature: Tuple[int, ...]) -> Iterable[Tuple[int, Tuple[int, ...]]]:
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows]
+
+    def add(self, work_id: int, text: str = "", signature: Optional[Tuple[int, ...]] = None) -> bool:
+        """Добавляет работу в индекс. Возвращает False, если сигнатуру построить не удалось"""
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return False
+
+        self.remove(work_id)
+        self._signatures[work_id] = signature
+        for band, key in self._bands_of(signature):
+            self._buckets[band].setdefault(key, set()).add(work_id)
+        return True
+
+    def remove(self, work_id: int) -> None:
+        signature = self._signatures.pop(work_id, None)
+        if signature is None:
+            return
+        for band, key in self._bands_of(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(work_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def query(self, text: str = "", signature: Optional[Tuple[int, ...]] = None) -> Set[int]:
+        """Возвращает id работ-кандидатов, совпавших хотя бы в одной полосе"""
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return set()
+
+        candidates = set()
+        for band, key in self._bands_of(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                candidates.update(bucket)
+        return candidates
+
+
+def evaluate_recall(
+        texts: Dict[int, str],
+        similarity: Callable[[str, str], float],
+        threshold: float,
+        bands: int = 24,
+        rows: int = 3,
+        sample_size: Optional[int] = None
+) -> dict:
+    """
+    Сравнивает LSH-кандидатов с полным перебором.
+
+    Для каждой работы из выборки считаются точные сходства со всеми
+    остальными; recall — доля пар со сходством >= threshold, которые
+    LSH вернул как кандидатов.
+    """
+    index = MinHashLSHIndex(bands=bands, rows=rows)
+    for work_id, text in texts.items():
+        index.add(work_id, text)
+
+    query_ids = list(texts.keys())
+    if sample_size is not None:
+        query_ids = query_ids[:sample_size]
+
+    relevant_pairs = 0
+    found_pairs = 0
+    candidates_total = 0
+    comparisons_total = 0
+
+    for work_id in query_ids:
+        candidates = index.query(texts[work_id])
+        candidates.discard(work_id)
+        candidates_total += len(candidates)
+
+        for other_id, other_text in texts.items():
+            if other_id == work_id:
+                continue
+            comparisons_total += 1
+            if similarity(texts[work_id], other_text) >= threshold:
+                relevant_pairs += 1
+                if other_id in candidates:
+                    found_pairs += 1
+
+    return {
+        "bands": bands,
+        "rows": rows,
+        "lsh_threshold": round(index.threshold, 4),
+        "similarity_threshold": threshold,
+        "queries": len(query_ids),
+        "relevant_pairs": relevant_pairs,
+        "found_pairs": found_pairs,
+        "recall": found_pairs / relevant_pairs if relevant_pairs else 1.0,
+        "candidate_ratio": candidates_total / comparisons_total if comparisons_total else 0.0
+    }
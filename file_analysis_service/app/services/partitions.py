@@ -0,0 +1,98 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from .minhash_index import MinHashLSHIndex
+from .tfidf_scorer import TfidfBatchScorer
+
+SCOPES = ("assignment", "group", "global")
+
+
+def resolve_scope(scope: str, assignment_id: str,
+                  assignment_groups: Dict[str, List[str]]) -> Tuple[str, Optional[List[str]]]:
+    """
+    Возвращает ключ партиции и список заданий в ней (None — все работы).
+    Задание, не входящее ни в одну группу, в режиме group сравнивается
+    только само с собой.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"Неизвестная область сравнения: {scope}. Доступны: {', '.join(SCOPES)}")
+
+    if scope == "global":
+        return "global", None
+
+    if scope == "group":
+        for group_name, assignment_ids in assignment_groups.items():
+            if assignment_id in assignment_ids:
+                return f"group:{group_name}", list(assignment_ids)
+
+    return f"assignment:{assignment_id}", [assignment_id]
+
+
+class CorpusPartition:
+    """
+    Индексы кандидатов для одной области сравнения (задание, группа или все работы).
+
+    Новая партиция пуста: работы, загруженные до первого обращения к
+    области, добавляются один раз при наполнении (backfilled), затем
+    новые работы индексируются во всех партициях, куда входит их задание.
+    """
+
+    def __init__(self, key: str, assignment_ids: Optional[List[str]], bands: int, rows: int):
+        self.key = key
+        self.assignment_ids = assignment_ids
+        self.lsh_index = MinHashLSHIndex(bands=bands, rows=rows)
+        self.tfidf_scorer = TfidfBatchScorer()
+        self.backfilled = False
+        self.backfill_lock = asyncio.Lock()
+
+    def __contains__(self, work_id: int) -> bool:
+        return work_id in self.lsh_index or work_id in self.tfidf_scorer
+
+    def covers(self, assignment_id: str) -> bool:
+        return self.assignment_ids is None or assignment_id in self.assignment_ids
+
+    def remove(self, work_id: int) -> None:
+        self.lsh_index.remove(work_id)
+        self.tfidf_scorer.remove(work_id)
+
+    def stats(self) -> dict:
+        return {
+            "key": self.key,
+            "assignment_ids": self.assignment_ids,
+            "backfilled": self.backfilled,
+            "lsh_works": len(self.lsh_index),
+            "tfidf_works": len(self.tfidf_scorer)
+        }
+
+
+class PartitionRegistry:
+    """Партиции создаются лениво при первом обращении к области сравнения"""
+
+    def __init__(self, assignment_groups: Dict[str, List[str]], bands: int, rows: int):
+        self.assignment_groups = assignment_groups
+        self.bands = bands
+        self.rows = rows
+        self._partitions: Dict[str, CorpusPartition] = {}
+
+    def __len__(self) -> int:
+        return len(self._partitions)
+
+    def get(self, scope: str, assignment_id: str) -> CorpusPartition:
+        key, assignment_ids = resolve_scope(scope, assignment_id, self.assignment_groups)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = CorpusPartition(key, assignment_ids, self.bands, self.rows)
+        return partition
+
+    def covering(self, assignment_id: str) -> List[CorpusPartition]:
+        """Созданные партиции, в область которых входит задание"""
+        return [partition for partition in self._partitions.values() if partition.covers(assignment_id)]
+
+    def remove_work(self, work_id: int) -> None:
+        """Убирает удалённую работу из индексов всех партиций"""
+        # Копия: вызывается из потока индексов, пока event loop может создавать партиции
+        for partition in list(self._partitions.values()):
+            partition.remove(work_id)
+
+    def stats(self) -> List[dict]:
+        return [partition.stats() for partition in self._partitions.values()]
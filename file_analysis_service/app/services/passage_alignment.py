@@ -0,0 +1,85 @@
+from typing import Dict, List, Tuple
+
+from .fingerprint_index import winnow
+from .text_processing import WORD_RE
+
+
+def word_spans(text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Слова текста в нижнем регистре и их смещения (начало, конец) в символах исходной строки"""
+    words = []
+    spans = []
+    for match in WORD_RE.finditer(text):
+        words.append(match.group().lower())
+        spans.append(match.span())
+    return words, spans
+
+
+def find_passages(source: str, matched: str, seed_size: int = 5, window: int = 4,
+                  min_tokens: int = 8, max_seed_occurrences: int = 8) -> List[dict]:
+    """
+    Совпадающие фрагменты двух текстов методом seed-and-extend.
+
+    Затравки — общие отпечатки winnowing (k-граммы из seed_size слов);
+    каждая затравка расширяется пословно влево и вправо, пока слова
+    совпадают. Затравки, уже покрытые найденным фрагментом на той же
+    диагонали, пропускаются, поэтому стоимость пропорциональна объёму
+    совпадений, а не произведению длин текстов.
+
+    Тексты передаются как есть (извлечённые из файлов): слова сравниваются
+    без учёта регистра, а смещения и фрагменты относятся к исходным строкам.
+    """
+    source_words, source_spans = word_spans(source)
+    matched_words, matched_spans = word_spans(matched)
+    if len(source_words) < seed_size or len(matched_words) < seed_size:
+        return []
+
+    # Позиции отпечатков исходного текста; очень частые k-граммы ограничиваем
+    seeds: Dict[int, List[int]] = {}
+    for fingerprint, position in winnow(source_words, seed_size, window):
+        positions = seeds.setdefault(fingerprint, [])
+        if len(positions) < max_seed_occurrences:
+            positions.append(position)
+
+    # Найденные фрагменты по диагоналям: смещение -> список (начало, конец) в исходном тексте
+    covered: Dict[int, List[Tuple[int, int]]] = {}
+    passages = []
+
+    for fingerprint, matched_position in winnow(matched_words, seed_size, window):
+        for source_position in seeds.get(fingerprint, ()):
+            diagonal = source_position - matched_position
+            if any(start <= source_position < end for start, end in covered.get(diagonal, ())):
+                continue
+            if source_words[source_position:source_position + seed_size] != \
+                    matched_words[matched_position:matched_position + seed_size]:
+                continue  # коллизия хэша
+
+            start_s, start_m = source_position, matched_position
+            while start_s > 0 and start_m > 0 and source_words[start_s - 1] == matched_words[start_m - 1]:
+                start_s -= 1
+                start_m -= 1
+
+            end_s, end_m = source_position + seed_size, matched_position + seed_size
+            while (end_s < len(source_words) and end_m < len(matched_words)
+                   and source_words[end_s] == matched_words[end_m]):
+                end_s += 1
+                end_m += 1
+
+            covered.setdefault(diagonal, []).append((start_s, end_s))
+            if end_s - start_s >= min_tokens:
+                passages.append((start_s, end_s, start_m, end_m))
+
+    passages.sort()
+    result = []
+    for start_s, end_s, start_m, end_m in passages:
+        source_start, source_end = source_spans[start_s][0], source_spans[end_s - 1][1]
+        matched_start, matched_end = matched_spans[start_m][0], matched_spans[end_m - 1][1]
+        result.append({
+            "source_start": source_start,
+            "source_end": source_end,
+            "matched_start": matched_start,
+            "matched_end": matched_end,
+            "tokens": end_s - start_s,
+            "text": source[source_start:source_end],
+            "matched_text": matched[matched_start:matched_end]
+        })
+    return result
@@ -2,30 +2,37 @@ import hashlib
 import httpx
 from typing import Optional, Tuple, List
 from ..config import settings
+from .partitions import resolve_scope
+from .storage_client import list_works
 
 
 class PlagiarismChecker:
     @staticmethod
     async def check_plagiarism(
+            client: httpx.AsyncClient,
             file_hash: str,
-            student_name: str,  # Убрали assignment_id из обязательных параметров
-            file_service_url: str
+            student_name: str,
+            file_service_url: str,
+            assignment_id: Optional[str] = None,
+            scope: Optional[str] = None
     ) -> Tuple[bool, float, Optional[str], Optional[int]]:
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # Запрашиваем все работы
-                response = await client.get(f"{file_service_url}/works")
+        # Без задания сравнивать можно только со всеми работами
+        scope = scope or settings.comparison_scope
+        if assignment_id is None:
+            scope = "global"
+        _, assignment_ids = resolve_scope(scope, assignment_id, settings.assignment_groups)
 
-                if response.status_code == 200:
-                    data = response.json()
-                    works = data.get("works", [])
+        try:
+            # Запрашиваем работы области сравнения через общий клиент приложения
+            works = await list_works(client, file_service_url, assignment_ids)
 
-                    for work in works:
-                        if (work["file_hash"] == file_hash and
-                                work["student_name"] != student_name):
-                            return True, 1.0, work["student_name"], work["id"]
+            if works is not None:
+                for work in works:
+                    if (work["file_hash"] == file_hash and
+                            work["student_name"] != student_name):
+                        return True, 1.0, work["student_name"], work["id"]
 
-                return False, 0.0, None, None
+            return False, 0.0, None, None
         except Exception as e:
             print(f"Error in plagiarism check: {e}")
             return False, 0.0, None, None
\ No newline at end of file
@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .similarity_engines import SimilarityEngine, get_engine
+
+# Движки создаются один раз на процесс-воркер
+_worker_engines: Dict[Tuple[str, int], SimilarityEngine] = {}
+
+STAT_KEYS = ("candidates", "scored", "pruned", "skipped_after_stop", "early_stops")
+
+
+def _engine(engine_name: str, min_match: int) -> SimilarityEngine:
+    key = (engine_name, min_match)
+    engine = _worker_engines.get(key)
+    if engine is None:
+        engine = _worker_engines[key] = get_engine(engine_name, min_match=min_match)
+    return engine
+
+
+def score_chunk(engine_name: str, min_match: int, query_text: str,
+                candidates: List[Tuple[int, str]]) -> List[Tuple[int, float]]:
+    """Выполняется в процессе-воркере: точные оценки для части кандидатов"""
+    engine = _engine(engine_name, min_match)
+    return [(work_id, engine.similarity(query_text, text)) for work_id, text in candidates]
+
+
+def search_chunk(engine_name: str, min_match: int, query_text: str,
+                 candidates: List[Tuple[int, str]], top_k: int,
+                 stop_above: Optional[float]) -> Tuple[List[Tuple[int, float]], Dict[str, int]]:
+    """
+    Выполняется в процессе-воркере: поиск top_k лучших с отсечением.
+
+    Кандидаты упорядочиваются по самой дешёвой верхней оценке; точный
+    расчёт пропускается, если какая-либо оценка не превышает k-й лучший
+    результат. При stop_above поиск останавливается на первом результате
+    выше порога.
+    """
+    engine = _engine(engine_name, min_match)
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    stats["candidates"] = len(candidates)
+
+    ordered = []
+    for work_id, text in candidates:
+        bounds = engine.upper_bounds(query_text, text)
+        first = next(bounds, 1.0)
+        ordered.append((first, work_id, text, bounds))
+    ordered.sort(key=lambda item: item[0], reverse=True)
+
+    best: List[Tuple[float, int]] = []  # min-heap из top_k (score, work_id)
+    scores = []
+    for position, (first, work_id, text, bounds) in enumerate(ordered):
+        floor = best[0][0] if len(best) >= top_k else -1.0
+        if first <= floor:
+            # Остальные упорядочены по убыванию первой оценки — тоже не пройдут
+            stats["pruned"] += len(ordered) - position
+            break
+        if any(bound <= floor for bound in bounds):
+            stats["pruned"] += 1
+            continue
+
+        score = engine.similarity(query_text, text)
+        stats["scored"] += 1
+        scores.append((work_id, score))
+        if len(best) < top_k:
+            heapq.heappush(best, (score, work_id))
+        elif score > best[0][0]:
+            heapq.heapreplace(best, (score, work_id))
+
+        if stop_above is not None and score > stop_above:
+            stats["early_stops"] += 1
+            stats["skipped_after_stop"] += len(ordered) - position - 1
+            break
+
+    return scores, stats
+
+
+class ScoringPool:
+    """
+    Пул процессов для CPU-ёмкого сравнения текстов.
+
+    Кандидаты делятся на чанки и оцениваются параллельно, event loop
+    uvicorn при этом остаётся свободным. Отмена корутины или истечение
+    дедлайна отменяет ещё не начатые чанки.
+    """
+
+    def __init__(self, engine_name: str, min_match: int = 4,
+                 max_workers: Optional[int] = None, chunk_size: int = 16):
+        self.engine_name = engine_name
+        self.min_match = min_match
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = dict.fromkeys(STAT_KEYS, 0)
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _chunks(self, candidates: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+        # Не меньше одного чанка на воркер, чтобы загрузить все ядра
+        size = min(self.chunk_size, max(1, -(-len(candidates) // self.max_workers)))
+        return [candidates[i:i + size] for i in range(0, len(candidates), size)]
+
+    async def score(self, query_text: str, candidates: List[Tuple[int, str]],
+                    deadline: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Оценивает всех кандидатов. При превышении deadline (в секундах)
+        выбрасывает asyncio.TimeoutError, оставшиеся чанки отменяются.
+        """
+        if not candidates:
+            return []
+        self.start()
+
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self._executor, score_chunk,
+                                 self.engine_name, self.min_match, query_text, chunk)
+            for chunk in self._chunks(candidates)
+        ]
+        try:
+            chunk_results = await asyncio.wait_for(asyncio.gather(*futures), timeout=deadline)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        return [score for chunk in chunk_results for score in chunk]
+
+    async def search(self, query_text: str, candidates: List[Tuple[int, str]], top_k: int = 1,
+                     stop_above: Optional[float] = None,
+                     deadline: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        top_k лучших совпадений с отсечением по верхним оценкам. Если какой-то
+        чанк нашёл результат выше stop_above, остальные чанки отменяются.
+        Счётчики отсечений накапливаются в self.stats.
+        """
+        if not candidates:
+            return []
+        self.start()
+
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self._executor, search_chunk, self.engine_name, self.min_match,
+                                 query_text, chunk, top_k, stop_above)
+            for chunk in self._chunks(candidates)
+        ]
+        scores = []
+
+        async def collect():
+            for next_done in asyncio.as_completed(futures):
+                chunk_scores, chunk_stats = await next_done
+                scores.extend(chunk_scores)
+                for key, value in chunk_stats.items():
+                    self.stats[key] += value
+                if chunk_stats["early_stops"]:
+                    break
+
+        try:
+            await asyncio.wait_for(collect(), timeout=deadline)
+        finally:
+            # После раннего останова, отмены или дедлайна оставшиеся чанки не нужны
+            for future in futures:
+                future.cancel()
+
+        return heapq.nlargest(top_k, scores, key=lambda item: item[1])
@@ -0,0 +1,269 @@
+import difflib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .text_processing import normalize_text, tokenize
+
+
+class SimilarityEngine(ABC):
+    """Интерфейс движка попарного сравнения текстов (результат от 0 до 1)"""
+
+    name: str = ""
+
+    @abstractmethod
+    def similarity(self, text1: str, text2: str) -> float:
+        ...
+
+    def upper_bounds(self, text1: str, text2: str) -> Iterator[float]:
+        """
+        Последовательность всё более точных верхних оценок similarity,
+        от самой дешёвой. Поиск прекращает точный расчёт, как только
+        очередная оценка не превышает уже найденный результат.
+        """
+        return iter(())
+
+
+class SequenceMatcherEngine(SimilarityEngine):
+    """
+    Прежнее поведение: difflib.SequenceMatcher по символам исходных строк.
+    В худшем случае квадратичен, оставлен для сравнения результатов.
+    """
+
+    name = "sequence_matcher"
+
+    def similarity(self, text1: str, text2: str) -> float:
+        if not text1 or not text2:
+            return 0.0
+        return difflib.SequenceMatcher(None, text1, text2).ratio()
+
+    def upper_bounds(self, text1: str, text2: str) -> Iterator[float]:
+        if not text1 or not text2:
+            yield 0.0
+            return
+        matcher = difflib.SequenceMatcher(None, text1, text2)
+        yield matcher.real_quick_ratio()
+        yield matcher.quick_ratio()
+
+
+class SuffixAutomaton:
+    """Суффиксный автомат над последовательностью целых чисел (id токенов)"""
+
+    def __init__(self, sequence: List[int]):
+        self.transitions: List[Dict[int, int]] = [{}]
+        self.link: List[int] = [-1]
+        self.length: List[int] = [0]
+        # Позиция конца первого вхождения строк состояния в исходной последовательности
+        self.first_end: List[int] = [-1]
+        self.is_clone: List[bool] = [False]
+        self._children: Optional[List[List[int]]] = None
+        last = 0
+
+        for position, symbol in enumerate(sequence):
+            current = len(self.length)
+            self.transitions.append({})
+            self.length.append(self.length[last] + 1)
+            self.link.append(0)
+            self.first_end.append(position)
+            self.is_clone.append(False)
+
+            state = last
+            while state != -1 and symbol not in self.transitions[state]:
+                self.transitions[state][symbol] = current
+                state = self.link[state]
+
+            if state != -1:
+                target = self.transitions[state][symbol]
+                if self.length[state] + 1 == self.length[target]:
+                    self.link[current] = target
+                else:
+                    clone = len(self.length)
+                    self.transitions.append(dict(self.transitions[target]))
+                    self.length.append(self.length[state] + 1)
+                    self.link.append(self.link[target])
+                    self.first_end.append(self.first_end[target])
+                    self.is_clone.append(True)
+                    while state != -1 and self.transitions[state].get(symbol) == target:
+                        self.transitions[state][symbol] = clone
+                        state = self.link[state]
+                    self.link[target] = clone
+                    self.link[current] = clone
+
+            last = current
+
+    def occurrence_ends(self, state: int) -> List[int]:
+        """
+        Концы всех вхождений строк состояния в исходную последовательность по
+        возрастанию: первые концы неклонированных состояний его поддерева
+        суффиксных ссылок.
+        """
+        if self._children is None:
+            self._children = [[] for _ in self.length]
+            for child in range(1, len(self.length)):
+                self._children[self.link[child]].append(child)
+        ends = []
+        stack = [state]
+        while stack:
+            current = stack.pop()
+            if not self.is_clone[current]:
+                ends.append(self.first_end[current])
+            stack.extend(self._children[current])
+        ends.sort()
+        return ends
+
+    def matching_statistics(self, sequence: List[int]) -> List[Tuple[int, int]]:
+        """
+        Для каждой позиции — длина самого длинного общего фрагмента, который
+        в ней заканчивается, и состояние автомата с этим фрагментом (0, если
+        совпадения нет). Конец первого вхождения — first_end[state], все
+        вхождения — occurrence_ends(state).
+        """
+        result = []
+        state = 0
+        matched = 0
+        transitions, link, length = self.transitions, self.link, self.length
+
+        for symbol in sequence:
+            while state and symbol not in transitions[state]:
+                state = link[state]
+                matched = length[state]
+            if symbol in transitions[state]:
+                state = transitions[state][symbol]
+                matched += 1
+            else:
+                matched = 0
+            result.append((matched, state if matched else 0))
+        return result
+
+
+def greedy_tiles(tokens1: List[int], tokens2: List[int], min_match: int) -> int:
+    """
+    Greedy String Tiling: число токенов, покрытых непересекающимися общими
+    фрагментами (тайлами) длиной не меньше min_match. Тайл помечает токены
+    в обоих текстах, поэтому повтор одного фрагмента засчитывается один раз.
+
+    За проход строится автомат по непомеченным токенам первого текста,
+    второй текст прогоняется через него, и максимальные совпадения
+    раскладываются от длинных к коротким. Повторы фрагмента во втором тексте
+    кладутся в том же проходе на следующие свободные вхождения в первом
+    (occurrence_ends), а не упираются в первое, уже занятое. Совпадение,
+    задевшее помеченные токены второго текста (или не нашедшее свободного
+    вхождения в первом), ищется заново в следующем проходе — помеченные
+    токены заменяются уникальными метками, через которые совпадения не
+    проходят. Проход кладёт все непересекающиеся совпадения текущей
+    наибольшей длины, поэтому число проходов зависит от числа разных длин
+    тайлов, а не от числа повторов.
+    """
+    marked1 = bytearray(len(tokens1))
+    marked2 = bytearray(len(tokens2))
+    covered = 0
+
+    while True:
+        # id токенов неотрицательны, метки — отрицательные и различные в обоих текстах
+        source = [-1 - i if marked1[i] else token for i, token in enumerate(tokens1)]
+        query = [-1 - len(tokens1) - j if marked2[j] else token for j, token in enumerate(tokens2)]
+        automaton = SuffixAutomaton(source)
+        statistics = automaton.matching_statistics(query)
+
+        candidates = []
+        for end2, (length, state) in enumerate(statistics):
+            extended = end2 + 1 < len(statistics) and statistics[end2 + 1][0] == length + 1
+            if length >= min_match and not extended:
+                candidates.append((length, end2 - length + 1, state))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        # (состояние, длина) -> [концы вхождений в первом тексте, первый не проверенный]
+        occurrences: Dict[Tuple[int, int], list] = {}
+        deferred = 0  # Длина самого длинного отложенного совпадения
+        for length, start2, state in candidates:
+            if length < deferred:
+                # Более короткие тайлы не кладём: отложенный длинный может занять их токены
+                break
+            if any(marked2[start2:start2 + length]):
+                deferred = length
+                continue
+            cursor = occurrences.get((state, length))
+            if cursor is None:
+                cursor = occurrences[(state, length)] = [automaton.occurrence_ends(state), 0]
+            ends, position = cursor
+            # Пометки только добавляются: занятое вхождение больше не проверяем
+            while position < len(ends) and any(marked1[ends[position] - length + 1:ends[position] + 1]):
+                position += 1
+            cursor[1] = position
+            if position == len(ends):
+                deferred = length
+                continue
+            start1 = ends[position] - length + 1
+            marked1[start1:start1 + length] = b"\x01" * length
+            marked2[start2:start2 + length] = b"\x01" * length
+            covered += length
+
+        if not deferred:
+            return covered
+
+
+class SuffixAutomatonEngine(SimilarityEngine):
+    """
+    Сравнение по словам через суффиксный автомат.
+
+    Тексты покрываются общими фрагментами длиной от min_match слов по
+    схеме Greedy String Tiling (greedy_tiles). Результат — 2 * M / (len1 + len2),
+    где M — число покрытых слов, как у SequenceMatcher.ratio(), но по
+    словам, а не символам: шкалы у движков разные, порог плагиата для
+    этого движка нужно подбирать отдельно (см. benchmarks).
+    """
+
+    name = "suffix_automaton"
+
+    def __init__(self, min_match: int = 4):
+        self.min_match = min_match
+
+    def encode(self, text1: str, text2: str):
+        words1 = tokenize(normalize_text(text1))
+        words2 = tokenize(normalize_text(text2))
+        # При равных по длине совпадениях выбор тайлов зависит от порядка
+        # текстов — упорядочиваем их, чтобы similarity(a, b) == similarity(b, a)
+        if (len(words1), words1) > (len(words2), words2):
+            words1, words2 = words2, words1
+        vocabulary: Dict[str, int] = {}
+        tokens1 = [vocabulary.setdefault(word, len(vocabulary)) for word in words1]
+        tokens2 = [vocabulary.setdefault(word, len(vocabulary)) for word in words2]
+        return tokens1, tokens2
+
+    def similarity(self, text1: str, text2: str) -> float:
+        if not text1 or not text2:
+            return 0.0
+        tokens1, tokens2 = self.encode(text1, text2)
+        return self.similarity_tokens(tokens1, tokens2)
+
+    def upper_bounds(self, text1: str, text2: str) -> Iterator[float]:
+        words1 = tokenize(normalize_text(text1))
+        words2 = tokenize(normalize_text(text2))
+        total = len(words1) + len(words2)
+        if not words1 or not words2:
+            yield 0.0
+            return
+
+        # Тайл покрывает одинаковое число слов в обоих текстах, и только
+        # слова, встречающиеся в обоих: M <= min(shared1, shared2)
+        vocabulary1, vocabulary2 = set(words1), set(words2)
+        shared1 = sum(1 for word in words1 if word in vocabulary2)
+        shared2 = sum(1 for word in words2 if word in vocabulary1)
+        yield 2 * min(shared1, shared2) / total
+
+    def similarity_tokens(self, tokens1: List[int], tokens2: List[int]) -> float:
+        if not tokens1 or not tokens2:
+            return 0.0
+        min_match = min(self.min_match, len(tokens1), len(tokens2))
+        return 2 * greedy_tiles(tokens1, tokens2, min_match) / (len(tokens1) + len(tokens2))
+
+
+ENGINES = (SequenceMatcherEngine.name, SuffixAutomatonEngine.name)
+
+
+def get_engine(name: str, min_match: int = 4) -> SimilarityEngine:
+    """Создаёт движок по имени из настроек"""
+    if name == SequenceMatcherEngine.name:
+        return SequenceMatcherEngine()
+    if name == SuffixAutomatonEngine.name:
+        return SuffixAutomatonEngine(min_match=min_match)
+    raise ValueError(f"Неизвестный движок сравнения: {name}. Доступны: {', '.join(ENGINES)}")
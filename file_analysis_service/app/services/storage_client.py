@@ -0,0 +1,137 @@
+import json
+import struct
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import httpx
+from fastapi import Request
+
+# Кадр бинарного формата /files/texts: id работы (u32), длина текста (u32), текст в UTF-8
+TEXT_FRAME_HEADER = struct.Struct(">II")
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Зависимость FastAPI: общий клиент, созданный в lifespan приложения"""
+    return request.app.state.http_client
+
+
+async def stream_texts(
+        client: httpx.AsyncClient,
+        file_service_url: str,
+        work_ids: Optional[List[int]] = None,
+        assignment_id: Optional[str] = None,
+        frame_format: str = "ndjson"
+) -> AsyncIterator[Tuple[int, str]]:
+    """Потоково читает тексты работ из File Storing Service одним запросом"""
+    payload = {"work_ids": work_ids, "assignment_id": assignment_id, "format": frame_format}
+
+    async with client.stream("POST", f"{file_service_url}/files/texts", json=payload) as response:
+        response.raise_for_status()
+
+        if frame_format == "binary":
+            buffer = bytearray()
+            async for chunk in response.aiter_bytes():
+                buffer += chunk
+                while len(buffer) >= TEXT_FRAME_HEADER.size:
+                    work_id, length = TEXT_FRAME_HEADER.unpack_from(buffer)
+                    end = TEXT_FRAME_HEADER.size + length
+                    if len(buffer) < end:
+                        break
+                    yield work_id, bytes(buffer[TEXT_FRAME_HEADER.size:end]).decode('utf-8')
+                    del buffer[:end]
+            return
+
+        async for line in response.aiter_lines():
+            if line:
+                item = json.loads(line)
+                yield item["work_id"], item["text"]
+
+
+async def fetch_texts(client: httpx.AsyncClient, file_service_url: str, work_ids: List[int]) -> Dict[int, str]:
+    """Тексты работ по списку id; при недоступности сервиса — пустой словарь"""
+    if not work_ids:
+        return {}
+
+    texts = {}
+    try:
+        async for work_id, text in stream_texts(client, file_service_url, work_ids=work_ids):
+            texts[work_id] = text
+    except httpx.HTTPError as e:
+        print(f"Ошибка загрузки текстов из file-storing: {e}")
+    return texts
+
+
+async def list_works(client: httpx.AsyncClient, file_service_url: str,
+                     assignment_ids: Optional[List[str]] = None, page_size: int = 1000) -> Optional[List[dict]]:
+    """
+    Метаданные работ области сравнения: все работы (assignment_ids=None,
+    постранично по /works?after=) или работы перечисленных заданий.
+    None, если сервис ответил ошибкой.
+    """
+    works = []
+    if assignment_ids is None:
+        after = 0
+        while True:
+            response = await client.get(f"{file_service_url}/works", params={"after": after, "limit": page_size})
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            works.extend(data.get("works", []))
+            after = data.get("next_after", after)
+            if not data.get("has_more"):
+                return works
+
+    for assignment_id in assignment_ids:
+        response = await client.get(f"{file_service_url}/assignment/{assignment_id}/works")
+        if response.status_code != 200:
+            return None
+        works.extend(response.json().get("works", []))
+    return works
+
+
+class WorksCatalog:
+    """
+    Локальная копия метаданных работ, синхронизируемая по ленте
+    изменений /works?since=<cursor>: каждый запрос докачивает только
+    работы, изменившиеся с прошлой синхронизации. Удалённые работы
+    убираются из каталога и копятся в removed до pop_removed().
+    """
+
+    def __init__(self, page_size: int = 1000):
+        self.page_size = page_size
+        self.cursor = 0
+        self.works: Dict[int, dict] = {}
+        self.removed: Set[int] = set()
+
+    def pop_removed(self) -> Set[int]:
+        removed, self.removed = self.removed, set()
+        return removed
+
+    async def sync(self, client: httpx.AsyncClient, file_service_url: str) -> int:
+        """Докачивает изменения; возвращает число полученных записей"""
+        received = 0
+        while True:
+            response = await client.get(
+                f"{file_service_url}/works",
+                params={"since": self.cursor, "limit": self.page_size}
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            for work in data.get("works", []):
+                if work.get("deleted"):
+                    self.works.pop(work["id"], None)
+                    self.removed.add(work["id"])
+                else:
+                    self.works[work["id"]] = work
+            received += len(data.get("works", []))
+            self.cursor = data.get("next_cursor", self.cursor)
+
+            if not data.get("has_more"):
+                return received
+
+    def select(self, assignment_ids: Optional[List[str]] = None) -> List[dict]:
+        """Работы области сравнения: все или перечисленных заданий"""
+        if assignment_ids is None:
+            return list(self.works.values())
+        wanted = set(assignment_ids)
+        return [work for work in self.works.values() if work["assignment_id"] in wanted]
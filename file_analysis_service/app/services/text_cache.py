@@ -0,0 +1,134 @@
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .text_processing import normalize_text, shingle_hashes
+
+TextLoader = Callable[[List[int]], Awaitable[Dict[int, str]]]
+
+
+class CachedText:
+    """
+    Текст работы в том виде, в каком его отдал file-storing (по нему
+    считаются сходство и смещения фрагментов), и отсортированные хэши
+    шинглов нормализованного текста для MinHash.
+    """
+
+    __slots__ = ("work_id", "text", "shingle_hashes", "size", "hits")
+
+    def __init__(self, work_id: int, text: str, shingles: array):
+        self.work_id = work_id
+        self.text = text
+        self.shingle_hashes = shingles
+        self.size = sys.getsizeof(text) + shingles.itemsize * len(shingles)
+        self.hits = 0
+
+
+class PreprocessedTextCache:
+    """
+    Кэш предобработанных текстов с ключом по id работы.
+
+    Размер ограничен бюджетом памяти (max_bytes); при переполнении
+    вытесняются записи по политике lru или lfu. Вытесненные и отсутствующие
+    тексты подгружаются лениво через переданный загрузчик.
+    """
+
+    def __init__(self, max_bytes: int, policy: str = "lru", shingle_size: int = 3):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Неизвестная политика вытеснения: {policy}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.shingle_size = shingle_size
+
+        self._entries: "OrderedDict[int, CachedText]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, work_id: int) -> bool:
+        return work_id in self._entries
+
+    def preprocess(self, work_id: int, raw_text: str) -> CachedText:
+        shingles = array("Q", sorted(shingle_hashes(normalize_text(raw_text).split(), self.shingle_size)))
+        return CachedText(work_id, raw_text, shingles)
+
+    def put(self, work_id: int, raw_text: str) -> CachedText:
+        entry = self.preprocess(work_id, raw_text)
+        self._discard(work_id)
+        self._entries[work_id] = entry
+        self.current_bytes += entry.size
+        self._evict()
+        return entry
+
+    def get(self, work_id: int) -> Optional[CachedText]:
+        entry = self._entries.get(work_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry.hits += 1
+        self._entries.move_to_end(work_id)
+        return entry
+
+    async def get_many(self, work_ids: Iterable[int], loader: TextLoader) -> Dict[int, CachedText]:
+        """Возвращает записи для всех id; промахи догружаются одним вызовом loader"""
+        found = {}
+        missing = []
+        for work_id in work_ids:
+            entry = self.get(work_id)
+            if entry is None:
+                missing.append(work_id)
+            else:
+                found[work_id] = entry
+
+        if missing:
+            loaded = await loader(missing)
+            self.loads += len(loaded)
+            for work_id, raw_text in loaded.items():
+                if raw_text:
+                    found[work_id] = self.put(work_id, raw_text)
+        return found
+
+    def texts(self) -> Dict[int, str]:
+        """Исходные тексты всех записей (без влияния на статистику)"""
+        return {work_id: entry.text for work_id, entry in self._entries.items()}
+
+    def remove(self, work_id: int) -> None:
+        self._discard(work_id)
+
+    def _discard(self, work_id: int) -> None:
+        entry = self._entries.pop(work_id, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+
+    def _evict(self) -> None:
+        # Последнюю добавленную запись не вытесняем, даже если она одна больше бюджета
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            if self.policy == "lru":
+                victim = next(iter(self._entries))
+            else:
+                newest = next(reversed(self._entries))
+                victim = min((entry for entry in self._entries.values() if entry.work_id != newest),
+                             key=lambda entry: entry.hits).work_id
+            self._discard(victim)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "policy": self.policy,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "loads": self.loads
+        }
@@ -0,0 +1,28 @@
+import hashlib
+import re
+from typing import List, Set
+
+WORD_RE = re.compile(r'\b\w+\b')
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к нижнему регистру и схлопывает пробелы"""
+    if not text:
+        return ""
+    return ' '.join(text.lower().split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает нормализованный текст на слова"""
+    return WORD_RE.findall(text)
+
+
+def stable_hash(value: str) -> int:
+    """64-битный хэш, одинаковый во всех процессах и после перезапуска"""
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def shingle_hashes(words: List[str], n: int = 3) -> Set[int]:
+    """Хэши шинглов из n слов (те же шинглы, что в get_shingles)"""
+    return {stable_hash(' '.join(words[i:i + n])) for i in range(len(words) - n + 1)}
@@ -0,0 +1,237 @@
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .text_processing import normalize_text, tokenize
+
+INITIAL_VOCABULARY_CAPACITY = 1024
+
+# Блок строк матрицы: номер первой строки, tf и поэлементный квадрат tf
+Block = Tuple[int, sparse.csr_matrix, sparse.csr_matrix]
+
+
+def _widen(matrix: sparse.csr_matrix, width: int) -> sparse.csr_matrix:
+    """Та же матрица с большим числом столбцов (без копирования данных)"""
+    if matrix.shape[1] == width:
+        return matrix
+    return sparse.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], width))
+
+
+class TfidfBatchScorer:
+    """
+    Пакетный TF-IDF/косинусный поиск по корпусу.
+
+    Хранится разреженная матрица сублинейных tf (1 + log count) по общему
+    словарю слов и шинглов из shingle_size слов. idf не зашивается в матрицу:
+    при запросе косинус считается разреженными умножениями матрица-вектор,
+    поэтому добавление работы не требует пересчёта весов.
+
+    Матрица состоит из блоков строк: новые работы при следующем запросе
+    собираются в отдельный блок, соседние блоки сравнимого размера
+    сливаются (как в LSM-дереве), так что блоков O(log n), а каждая строка
+    копируется O(log n) раз. Документные частоты — массив, обновляемый в
+    add/remove. Удалённые строки исключаются из выдачи и вычищаются
+    уплотнением, когда их доля превышает compact_ratio, — вместе с
+    терминами словаря, которые больше не встречаются ни в одной работе.
+    """
+
+    def __init__(self, shingle_size: int = 3, compact_ratio: float = 0.25, min_compact_rows: int = 64):
+        self.shingle_size = shingle_size
+        self.compact_ratio = compact_ratio
+        self.min_compact_rows = min_compact_rows
+        self.vocabulary: Dict[str, int] = {}
+        self._document_frequency = np.zeros(INITIAL_VOCABULARY_CAPACITY, dtype=np.int64)
+        self._row_work_ids: List[int] = []
+        self._rows_by_work: Dict[int, int] = {}
+        self._removed: Set[int] = set()
+
+        self._blocks: List[Block] = []
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []  # Строки, ещё не собранные в блок
+        # Зависят от числа работ и частот — сбрасываются при каждом изменении корпуса
+        self._idf_cache: Optional[np.ndarray] = None
+        self._norms_cache: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._rows_by_work)
+
+    def __contains__(self, work_id: int) -> bool:
+        return work_id in self._rows_by_work
+
+    def _terms(self, text: str) -> Counter:
+        words = tokenize(normalize_text(text))
+        terms = Counter(words)
+        n = self.shingle_size
+        terms.update(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return terms
+
+    def _invalidate(self) -> None:
+        self._idf_cache = None
+        self._norms_cache = None
+
+    def add(self, work_id: int, text: str) -> bool:
+        terms = self._terms(text)
+        if not terms:
+            return False
+        self.remove(work_id)
+
+        columns = np.empty(len(terms), dtype=np.int64)
+        weights = np.empty(len(terms), dtype=np.float64)
+        for position, (term, count) in enumerate(terms.items()):
+            column = self.vocabulary.get(term)
+            if column is None:
+                column = self.vocabulary[term] = len(self.vocabulary)
+            columns[position] = column
+            weights[position] = 1.0 + math.log(count)
+        order = np.argsort(columns)
+        columns, weights = columns[order], weights[order]
+
+        if len(self.vocabulary) > len(self._document_frequency):
+            grown = np.zeros(max(len(self.vocabulary), 2 * len(self._document_frequency)), dtype=np.int64)
+            grown[:len(self._document_frequency)] = self._document_frequency
+            self._document_frequency = grown
+        self._document_frequency[columns] += 1
+
+        self._rows_by_work[work_id] = len(self._row_work_ids)
+        self._row_work_ids.append(work_id)
+        self._pending.append((columns, weights))
+        self._invalidate()
+        return True
+
+    def _row_columns(self, row: int) -> np.ndarray:
+        built = len(self._row_work_ids) - len(self._pending)
+        if row >= built:
+            return self._pending[row - built][0]
+        for start, tf, _ in self._blocks:
+            if start <= row < start + tf.shape[0]:
+                local = row - start
+                return tf.indices[tf.indptr[local]:tf.indptr[local + 1]]
+        raise KeyError(row)
+
+    def remove(self, work_id: int) -> None:
+        row = self._rows_by_work.pop(work_id, None)
+        if row is None:
+            return
+        self._document_frequency[self._row_columns(row)] -= 1
+        self._removed.add(row)
+        self._invalidate()
+        if (len(self._removed) >= self.min_compact_rows
+                and len(self._removed) > self.compact_ratio * len(self._row_work_ids)):
+            self._compact()
+
+    def _build(self, rows: List[Tuple[np.ndarray, np.ndarray]]) -> sparse.csr_matrix:
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(columns) for columns, _ in rows])
+        indices = np.concatenate([columns for columns, _ in rows])
+        data = np.concatenate([weights for _, weights in rows])
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(self.vocabulary)))
+
+    def _sync(self) -> None:
+        """Собирает новые строки в блок и сливает соседние блоки сравнимого размера"""
+        if not self._pending:
+            return
+        start = len(self._row_work_ids) - len(self._pending)
+        tf = self._build(self._pending)
+        self._blocks.append((start, tf, tf.multiply(tf).tocsr()))
+        self._pending = []
+
+        while len(self._blocks) > 1 and self._blocks[-2][1].shape[0] <= 2 * self._blocks[-1][1].shape[0]:
+            (start, tf1, squared1), (_, tf2, squared2) = self._blocks[-2:]
+            width = max(tf1.shape[1], tf2.shape[1])
+            self._blocks[-2:] = [(
+                start,
+                sparse.vstack([_widen(tf1, width), _widen(tf2, width)], format="csr"),
+                sparse.vstack([_widen(squared1, width), _widen(squared2, width)], format="csr")
+            )]
+
+    def _compact(self) -> None:
+        """Убирает удалённые строки и неиспользуемые термины, перенумеровывая столбцы"""
+        self._sync()
+        width = len(self.vocabulary)
+        keep = np.array([row for row in range(len(self._row_work_ids)) if row not in self._removed],
+                        dtype=np.int64)
+        alive = self._document_frequency[:width] > 0
+        remap = np.cumsum(alive) - 1
+
+        blocks, self._blocks = self._blocks, []
+        if len(keep):
+            tf = sparse.vstack([_widen(block, width) for _, block, _ in blocks], format="csr")[keep]
+            tf = sparse.csr_matrix((tf.data, remap[tf.indices], tf.indptr), shape=(len(keep), int(alive.sum())))
+            self._blocks = [(0, tf, tf.multiply(tf).tocsr())]
+
+        frequency = self._document_frequency[:width][alive]
+        self._document_frequency = np.zeros(max(INITIAL_VOCABULARY_CAPACITY, 2 * len(frequency)), dtype=np.int64)
+        self._document_frequency[:len(frequency)] = frequency
+        self.vocabulary = {term: int(remap[column]) for term, column in self.vocabulary.items() if alive[column]}
+        self._row_work_ids = [self._row_work_ids[row] for row in keep]
+        self._rows_by_work = {work_id: row for row, work_id in enumerate(self._row_work_ids)}
+        self._removed = set()
+        self._invalidate()
+
+    def _idf(self) -> np.ndarray:
+        if self._idf_cache is None:
+            documents = len(self._rows_by_work)
+            frequency = self._document_frequency[:len(self.vocabulary)]
+            self._idf_cache = np.log((1.0 + documents) / (1.0 + frequency)) + 1.0
+        return self._idf_cache
+
+    def _norms(self) -> np.ndarray:
+        """Нормы строк с текущими idf — одно разреженное умножение на блок после изменения корпуса"""
+        if self._norms_cache is None:
+            idf_squared = self._idf() ** 2
+            self._norms_cache = np.concatenate(
+                [np.sqrt(squared @ idf_squared[:squared.shape[1]]) for _, _, squared in self._blocks]
+            ) if self._blocks else np.zeros(0)
+        return self._norms_cache
+
+    def top_k(self, text: str, k: int = 5, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Косинусная близость запроса ко всем работам корпуса, лучшие k (work_id, score)"""
+        if not self._rows_by_work or k <= 0:
+            return []
+
+        # Разреженный запрос: в скалярное произведение входят только термины корпуса,
+        # но норма запроса считается по всем его терминам — новые слова (df = 0)
+        # снижают близость, а не отбрасываются
+        unknown_idf = math.log(1.0 + len(self._rows_by_work)) + 1.0
+        unknown_squared = 0.0
+        columns = []
+        weights = []
+        for term, count in self._terms(text).items():
+            column = self.vocabulary.get(term)
+            if column is not None and self._document_frequency[column] > 0:
+                columns.append(column)
+                weights.append(1.0 + math.log(count))
+            else:
+                unknown_squared += ((1.0 + math.log(count)) * unknown_idf) ** 2
+        if not columns:
+            return []
+        columns = np.array(columns, dtype=np.int64)
+        idf = self._idf()[columns]
+        query_weights = np.array(weights) * idf
+        query_norm = math.sqrt(float(query_weights @ query_weights) + unknown_squared)
+
+        self._sync()
+        norms = self._norms()
+        dot = np.empty(len(self._row_work_ids))
+        for start, tf, _ in self._blocks:
+            # Термины новее блока в его строках не встречаются
+            inside = columns < tf.shape[1]
+            query = sparse.csc_matrix(
+                (query_weights[inside] * idf[inside], (columns[inside], np.zeros(inside.sum(), dtype=np.int64))),
+                shape=(tf.shape[1], 1)
+            )
+            dot[start:start + tf.shape[0]] = (tf @ query).toarray().ravel()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(norms > 0, dot / (norms * query_norm), 0.0)
+
+        excluded_rows = set(self._removed)
+        excluded_rows.update(self._rows_by_work[w] for w in exclude if w in self._rows_by_work)
+        if excluded_rows:
+            scores[list(excluded_rows)] = -1.0
+
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self._row_work_ids[row], float(scores[row])) for row in best if scores[row] > 0]
@@ -0,0 +1,139 @@
+"""
+Бенчмарк движков сравнения на правдоподобных почти-дубликатах.
+
+Тексты собираются из предложений со словами по закону Ципфа (частые
+служебные слова, словоформы с окончаниями), копии получаются типичными
+для списывания правками: замены и вставки слов, перестановка
+предложений, частичное заимствование. Для каждого сценария печатаются
+оценки и время обоих движков — по ним видно, как шкала suffix_automaton
+соотносится с порогом 0.7, подобранным для sequence_matcher.
+
+Запуск из каталога file_analysis_service:
+    python -m benchmarks.bench_similarity_engines
+    python -m benchmarks.bench_similarity_engines --sizes 1000 5000 20000 --repeat 3
+"""
+import argparse
+import random
+import time
+
+from app.services.similarity_engines import SequenceMatcherEngine, SuffixAutomatonEngine
+
+FUNCTION_WORDS = ["и", "в", "не", "на", "что", "с", "по", "это", "как", "а", "к", "для", "из",
+                  "от", "при", "о", "его", "то", "так", "же", "или", "но", "также", "где", "если"]
+ENDINGS = ["", "а", "ы", "ой", "ом", "ами", "ах", "ия", "ии", "ение", "ения", "ать", "ает", "ают", "ный", "ная", "ное"]
+SYLLABLES = ["ал", "го", "ри", "тм", "гра", "ф", "вер", "ши", "на", "ре", "бро", "пу", "ть", "ма", "сси",
+             "в", "сор", "ти", "ров", "ка", "дер", "ево", "хе", "ш", "стек", "оче", "редь", "спи", "сок"]
+
+
+class TextGenerator:
+    """Словарь с частотами по Ципфу: служебные слова вверху, словоформы основ ниже"""
+
+    def __init__(self, rng: random.Random, stems: int = 1500):
+        self.rng = rng
+        words = list(FUNCTION_WORDS)
+        seen = set(words)
+        while len(words) < len(FUNCTION_WORDS) + stems * 3:
+            stem = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for ending in rng.sample(ENDINGS, 3):
+                if stem + ending not in seen:
+                    seen.add(stem + ending)
+                    words.append(stem + ending)
+        self.words = words
+        self.weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    def sentence(self) -> list:
+        length = self.rng.randint(8, 20)
+        return self.rng.choices(self.words, weights=self.weights, k=length)
+
+    def sentences(self, words: int) -> list:
+        result = []
+        total = 0
+        while total < words:
+            result.append(self.sentence())
+            total += len(result[-1])
+        return result
+
+    def edit(self, sentences: list, rate: float) -> list:
+        """Замены, вставки и удаления слов с вероятностью rate на слово"""
+        edited = []
+        for sentence in sentences:
+            words = []
+            for word in sentence:
+                roll = self.rng.random()
+                if roll < rate / 3:
+                    continue
+                if roll < 2 * rate / 3:
+                    words.append(self.rng.choices(self.words, weights=self.weights)[0])
+                    continue
+                words.append(word)
+                if roll < rate:
+                    words.append(self.rng.choices(self.words, weights=self.weights)[0])
+            edited.append(words)
+        return edited
+
+
+def render(sentences: list) -> str:
+    return " ".join(" ".join(sentence).capitalize() + "." for sentence in sentences)
+
+
+def scenarios(generator: TextGenerator, words: int):
+    """(название, исходный текст, проверяемый текст)"""
+    original = generator.sentences(words)
+    rng = generator.rng
+
+    yield "копия", original, original
+    yield "правки 5%", original, generator.edit(original, 0.05)
+    yield "правки 15%", original, generator.edit(original, 0.15)
+
+    shuffled = generator.edit(original, 0.05)
+    rng.shuffle(shuffled)
+    yield "перестановка + 5%", original, shuffled
+
+    half = len(original) // 2
+    yield "списана половина", original, generator.edit(original[:half], 0.05) + generator.sentences(words // 2)
+
+    quarter = len(original) // 4
+    yield "списана четверть", original, generator.edit(original[:quarter], 0.05) + generator.sentences(words * 3 // 4)
+
+    yield "другая работа", original, generator.sentences(words)
+
+
+def measure(engine, text1: str, text2: str, repeat: int):
+    best = None
+    score = 0.0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        score = engine.similarity(text1, text2)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, score
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generator = TextGenerator(random.Random(args.seed))
+    engines = [SequenceMatcherEngine(), SuffixAutomatonEngine()]
+
+    header = f"{'сценарий':<20} {'слов':>6}"
+    for engine in engines:
+        header += f" {engine.name + ', с':>22} {'score':>7}"
+    print(header)
+
+    for size in args.sizes:
+        for name, original, copy in scenarios(generator, size):
+            text1, text2 = render(original), render(copy)
+            row = f"{name:<20} {size:>6}"
+            for engine in engines:
+                elapsed, score = measure(engine, text1, text2, args.repeat)
+                row += f" {elapsed:>22.4f} {score:>7.3f}"
+            print(row)
+        print()
+
+
+if __name__ == "__main__":
+    main()
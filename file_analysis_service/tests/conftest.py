@@ -0,0 +1,4 @@
+import os
+
+# Настройки сервиса читаются при импорте app.config — адрес file-storing обязателен
+os.environ.setdefault("FILE_SERVICE_URL", "http://file-storing:8001")
@@ -0,0 +1,87 @@
+import os
+
+from app.services.fingerprint_index import RECORD, FingerprintIndex, winnow
+
+ESSAY = ("алгоритм дейкстры находит кратчайшие пути от одной вершины графа до всех остальных "
+         "при условии что веса всех рёбер неотрицательны и использует очередь с приоритетом")
+OTHER = ("сортировка слиянием делит массив пополам рекурсивно сортирует половины и сливает "
+         "их за линейное время получая итоговую сложность n log n")
+
+
+def words(text):
+    return text.split()
+
+
+def test_winnow_guarantees_shared_fingerprint_for_long_common_passage():
+    k, window = 3, 4
+    passage = words(ESSAY)[:window + k - 1]
+    left = words(OTHER)[:7] + passage + words(OTHER)[7:]
+    right = ["вступление"] * 5 + passage
+    assert {h for h, _ in winnow(left, k, window)} & {h for h, _ in winnow(right, k, window)}
+
+
+def test_winnow_positions_point_to_kgram_start():
+    k = 3
+    tokens = words(ESSAY)
+    for fingerprint, position in winnow(tokens, k, 4):
+        assert winnow(tokens[position:position + k], k, 4)[0][0] == fingerprint
+
+
+def test_search_survives_reopen(tmp_path):
+    path = str(tmp_path / "fingerprints.bin")
+    index = FingerprintIndex(path)
+    assert index.add(1, ESSAY) > 0
+    assert index.add(2, OTHER) > 0
+    assert index.add(1, ESSAY) == 0
+    before = index.search(ESSAY)
+    index.close()
+
+    reopened = FingerprintIndex(path)
+    assert len(reopened) == 2
+    assert reopened.search(ESSAY) == before
+    assert before[0]["work_id"] == 1 and before[0]["containment"] == 1.0
+    reopened.close()
+
+
+def test_removed_work_is_hidden_and_compacted_on_load(tmp_path):
+    path = str(tmp_path / "fingerprints.bin")
+    index = FingerprintIndex(path)
+    index.add(1, ESSAY)
+    index.add(2, ESSAY + " " + OTHER)
+    assert index.remove(1)
+    assert not index.remove(1)
+    assert 1 not in index
+    assert [hit["work_id"] for hit in index.search(ESSAY)] == [2]
+    size_with_tombstone = os.path.getsize(path)
+    index.close()
+
+    reopened = FingerprintIndex(path)
+    assert 1 not in reopened and 2 in reopened
+    assert [hit["work_id"] for hit in reopened.search(ESSAY)] == [2]
+    assert os.path.getsize(path) < size_with_tombstone
+    # id удалённой работы не переиспользуется
+    assert reopened.add(1, ESSAY) == 0
+    reopened.close()
+
+
+def test_truncated_tail_is_repaired(tmp_path):
+    path = str(tmp_path / "fingerprints.bin")
+    index = FingerprintIndex(path)
+    index.add(1, ESSAY)
+    index.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD.size - 3))
+
+    reopened = FingerprintIndex(path)
+    assert 1 in reopened
+    assert (os.path.getsize(path) - 8) % RECORD.size == 0
+    reopened.close()
+
+
+def test_search_scope_is_applied_before_limit(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.bin"))
+    for work_id in range(1, 6):
+        index.add(work_id, ESSAY)
+    hits = index.search(ESSAY, limit=2, work_ids={4, 5})
+    assert sorted(hit["work_id"] for hit in hits) == [4, 5]
+    index.close()
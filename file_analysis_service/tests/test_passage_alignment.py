@@ -0,0 +1,21 @@
+from app.services.passage_alignment import find_passages
+
+SOURCE = ("Введение.\n\nАлгоритм  Дейкстры находит кратчайшие пути от одной вершины графа "
+          "до всех остальных вершин. Заключение.")
+MATCHED = ("Совсем другое начало! алгоритм дейкстры НАХОДИТ кратчайшие\tпути от одной вершины "
+           "графа до всех остальных вершин и т.д.")
+
+
+def test_offsets_point_into_extracted_texts():
+    passages = find_passages(SOURCE, MATCHED, seed_size=3, window=2, min_tokens=5)
+    assert len(passages) == 1
+    passage = passages[0]
+    assert passage["tokens"] == 13
+    assert SOURCE[passage["source_start"]:passage["source_end"]] == passage["text"]
+    assert MATCHED[passage["matched_start"]:passage["matched_end"]] == passage["matched_text"]
+    assert passage["text"].startswith("Алгоритм  Дейкстры")
+    assert passage["matched_text"].endswith("остальных вершин")
+
+
+def test_short_overlap_is_not_reported():
+    assert find_passages(SOURCE, "кратчайшие пути от одной", seed_size=3, window=2, min_tokens=8) == []
@@ -0,0 +1,127 @@
+import difflib
+import random
+
+import pytest
+
+from app.services import similarity_engines
+from app.services.similarity_engines import SuffixAutomatonEngine, get_engine, greedy_tiles
+
+PASSAGE = ("алгоритм дейкстры находит кратчайшие пути от одной вершины графа "
+           "до всех остальных при неотрицательных весах рёбер")
+
+
+def naive_tiling(a, b, min_match):
+    """Эталонный Greedy String Tiling полным перебором"""
+    marked_a, marked_b = [False] * len(a), [False] * len(b)
+    covered = 0
+    while True:
+        best, tiles = 0, []
+        for i in range(len(a)):
+            for j in range(len(b)):
+                k = 0
+                while (i + k < len(a) and j + k < len(b) and a[i + k] == b[j + k]
+                       and not marked_a[i + k] and not marked_b[j + k]):
+                    k += 1
+                if k > best:
+                    best, tiles = k, [(i, j)]
+                elif k == best and k:
+                    tiles.append((i, j))
+        if best < min_match:
+            return covered
+        for i, j in tiles:
+            if any(marked_a[i:i + best]) or any(marked_b[j:j + best]):
+                continue
+            marked_a[i:i + best] = [True] * best
+            marked_b[j:j + best] = [True] * best
+            covered += best
+
+
+def test_repeated_source_passage_is_counted_once():
+    engine = SuffixAutomatonEngine()
+    doubled = PASSAGE + " " + PASSAGE
+    assert engine.similarity(PASSAGE, doubled) == pytest.approx(2 / 3)
+    assert engine.similarity(doubled, PASSAGE) == pytest.approx(2 / 3)
+    # Та же доля, что у difflib, который движок заменяет
+    assert difflib.SequenceMatcher(None, PASSAGE, doubled).ratio() == pytest.approx(2 / 3, abs=0.01)
+
+
+def test_identical_and_disjoint_texts():
+    engine = SuffixAutomatonEngine()
+    assert engine.similarity(PASSAGE, PASSAGE) == 1.0
+    assert engine.similarity(PASSAGE, "совершенно другой текст про сортировку массивов слиянием") == 0.0
+    assert engine.similarity(PASSAGE, "") == 0.0
+
+
+def test_similarity_is_symmetric():
+    rng = random.Random(7)
+    vocabulary = PASSAGE.split()
+    engine = SuffixAutomatonEngine(min_match=2)
+    for _ in range(300):
+        text1 = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 40)))
+        text2 = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 40)))
+        assert engine.similarity(text1, text2) == engine.similarity(text2, text1)
+
+
+def test_tiles_match_reference_greedy_string_tiling():
+    rng = random.Random(1)
+    for _ in range(500):
+        a = [rng.randrange(5) for _ in range(rng.randint(1, 25))]
+        b = [x for x in a if rng.random() > 0.1]
+        b = [x if rng.random() > 0.15 else rng.randrange(5) for x in b] + a[:rng.randrange(6)]
+        if not b:
+            continue
+        min_match = rng.choice([1, 2, 3, 4])
+        covered = greedy_tiles(a, b, min_match)
+        assert covered <= min(len(a), len(b))
+        # Жадный выбор при равных длинах зависит от порядка текстов
+        assert covered in {naive_tiling(a, b, min_match), naive_tiling(b, a, min_match)}
+
+
+def repeated_phrases(rng, repeats, noise1, noise2):
+    """Одна фраза, повторённая в обоих текстах через разные вставки"""
+    phrase = list(range(10, 20))
+    tokens1, tokens2 = [], []
+    for _ in range(repeats):
+        tokens1 += phrase + [rng.randrange(*noise1)]
+        tokens2 += phrase + [rng.randrange(*noise2)]
+    return tokens1, tokens2
+
+
+def test_repeated_phrases_match_reference():
+    rng = random.Random(5)
+    for _ in range(20):
+        a, b = repeated_phrases(rng, rng.randint(1, 5), (100, 103), (200, 203))
+        min_match = rng.choice([2, 4])
+        assert greedy_tiles(a, b, min_match) in {naive_tiling(a, b, min_match), naive_tiling(b, a, min_match)}
+
+
+def test_repeated_phrases_take_few_passes(monkeypatch):
+    passes = 0
+
+    class CountingAutomaton(similarity_engines.SuffixAutomaton):
+        def __init__(self, sequence):
+            nonlocal passes
+            passes += 1
+            super().__init__(sequence)
+
+    monkeypatch.setattr(similarity_engines, "SuffixAutomaton", CountingAutomaton)
+    a, b = repeated_phrases(random.Random(0), 500, (1000, 2000), (2000, 3000))
+    # Каждый повтор во втором тексте ложится на свой повтор в первом
+    assert greedy_tiles(a, b, 4) == 500 * 10
+    assert passes <= 2
+
+
+def test_upper_bound_is_not_below_similarity():
+    rng = random.Random(3)
+    vocabulary = PASSAGE.split()
+    engine = SuffixAutomatonEngine(min_match=2)
+    for _ in range(200):
+        text1 = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 30)))
+        text2 = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 30)))
+        score = engine.similarity(text1, text2)
+        assert all(bound >= score - 1e-12 for bound in engine.upper_bounds(text1, text2))
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        get_engine("levenshtein")
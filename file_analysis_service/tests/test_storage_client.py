@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+
+from app.services.storage_client import WorksCatalog, list_works
+
+URL = "http://file-storing:8001"
+
+
+def works_service(works, feed):
+    """Заглушка /works: keyset-страницы по id и лента изменений по change_seq"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        limit = int(params.get("limit", 1000))
+        if "since" in params:
+            entries = [entry for entry in feed if entry["change_seq"] > int(params["since"])]
+            page = entries[:limit]
+            return httpx.Response(200, json={
+                "works": page, "has_more": len(entries) > limit,
+                "next_cursor": page[-1]["change_seq"] if page else int(params["since"])
+            })
+        after = int(params.get("after", 0))
+        remaining = [work for work in works if work["id"] > after]
+        page = remaining[:limit]
+        return httpx.Response(200, json={
+            "works": page, "has_more": len(remaining) > limit,
+            "next_after": page[-1]["id"] if page else after
+        })
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_list_works_follows_keyset_pages():
+    works = [{"id": work_id, "assignment_id": "hw_1"} for work_id in range(1, 26)]
+    client = works_service(works, [])
+    result = asyncio.run(list_works(client, URL, page_size=10))
+    assert [work["id"] for work in result] == list(range(1, 26))
+
+
+def test_catalog_applies_change_feed_with_tombstones():
+    feed = [{"id": work_id, "assignment_id": "hw_1", "change_seq": work_id} for work_id in range(1, 8)]
+    feed.append({"id": 3, "assignment_id": "hw_1", "change_seq": 8, "deleted": True})
+    catalog = WorksCatalog(page_size=3)
+    client = works_service([], feed)
+
+    assert asyncio.run(catalog.sync(client, URL)) == 8
+    assert sorted(catalog.works) == [1, 2, 4, 5, 6, 7]
+    assert catalog.pop_removed() == {3}
+    assert catalog.cursor == 8
+
+    feed.append({"id": 9, "assignment_id": "hw_2", "change_seq": 9})
+    assert asyncio.run(catalog.sync(client, URL)) == 1
+    assert [work["id"] for work in catalog.select(["hw_2"])] == [9]
+    assert catalog.pop_removed() == set()
@@ -0,0 +1,127 @@
+import math
+import random
+
+import pytest
+
+from app.services.tfidf_scorer import TfidfBatchScorer
+
+WORDS = ("граф вершина ребро путь дерево куча очередь стек массив список сортировка слияние "
+         "поиск хеш таблица ключ значение рекурсия цикл индекс матрица вектор строка символ").split()
+
+
+def brute_force(scorer, documents, text, k, exclude=()):
+    """Плотный TF-IDF с тем же словарём терминов, посчитанный заново по живым работам"""
+    terms = {work_id: scorer._terms(document) for work_id, document in documents.items()}
+    frequency = {}
+    for counts in terms.values():
+        for term in counts:
+            frequency[term] = frequency.get(term, 0) + 1
+    idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in frequency.items()}
+
+    # Термины запроса, которых нет в корпусе (df = 0), входят в его норму
+    unknown_idf = math.log(1 + len(documents)) + 1
+
+    def vector(counts):
+        return {term: (1 + math.log(count)) * idf.get(term, unknown_idf) for term, count in counts.items()}
+
+    query = vector(scorer._terms(text))
+    query_norm = math.sqrt(sum(v * v for v in query.values()))
+    scores = []
+    for work_id, counts in terms.items():
+        if work_id in exclude:
+            continue
+        row = vector(counts)
+        norm = math.sqrt(sum(v * v for v in row.values()))
+        score = sum(v * row.get(term, 0.0) for term, v in query.items()) / (norm * query_norm)
+        if score > 0:
+            scores.append((work_id, score))
+    scores.sort(key=lambda item: -item[1])
+    return scores[:k]
+
+
+def random_text(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def assert_same_ranking(actual, expected):
+    assert len(actual) == len(expected)
+    for (_, got), (_, want) in zip(actual, expected):
+        assert got == pytest.approx(want)
+    # Какие из равных оценок попадут на последние места, не определено — сравниваем работы выше границы
+    cutoff = expected[-1][1] + 1e-9 if expected else 0.0
+    assert {w for w, s in actual if s > cutoff} == {w for w, s in expected if s > cutoff}
+
+
+def test_top_k_matches_brute_force_through_adds_removes_and_compaction():
+    rng = random.Random(7)
+    scorer = TfidfBatchScorer(min_compact_rows=8)
+    documents = {}
+    next_id = 0
+    for step in range(300):
+        if documents and rng.random() < 0.35:
+            work_id = rng.choice(sorted(documents))
+            del documents[work_id]
+            scorer.remove(work_id)
+        else:
+            documents[next_id] = random_text(rng, rng.randint(5, 40))
+            scorer.add(next_id, documents[next_id])
+            next_id += 1
+
+        if step % 10 == 0 and documents:
+            query = random_text(rng, 30)
+            exclude = set(rng.sample(sorted(documents), min(2, len(documents))))
+            assert_same_ranking(scorer.top_k(query, k=5, exclude=exclude),
+                                brute_force(scorer, documents, query, 5, exclude))
+
+    assert len(scorer) == len(documents)
+    # Удалённые строки не копятся: уплотнение срабатывало по ходу
+    assert len(scorer._row_work_ids) < next_id
+
+
+def test_exact_copy_ranks_first():
+    scorer = TfidfBatchScorer()
+    rng = random.Random(1)
+    texts = {work_id: random_text(rng, 60) for work_id in range(50)}
+    for work_id, text in texts.items():
+        scorer.add(work_id, text)
+    best_id, best_score = scorer.top_k(texts[17], k=1)[0]
+    assert best_id == 17
+    assert best_score == pytest.approx(1.0)
+
+
+def test_readding_work_replaces_row():
+    scorer = TfidfBatchScorer()
+    scorer.add(1, "граф вершина ребро путь дерево")
+    scorer.add(2, "куча очередь стек массив список")
+    scorer.add(1, "куча очередь стек массив список")
+    assert len(scorer) == 2
+    assert {work_id for work_id, _ in scorer.top_k("граф вершина ребро", k=5)} == set()
+    assert {work_id for work_id, _ in scorer.top_k("куча очередь стек", k=5)} == {1, 2}
+
+
+def test_compaction_prunes_vocabulary():
+    scorer = TfidfBatchScorer(min_compact_rows=4, compact_ratio=0.25)
+    for work_id in range(10):
+        scorer.add(work_id, f"общий текст уникальное{work_id} слово{work_id} ещё{work_id}")
+    scorer.top_k("общий текст", k=3)
+    for work_id in range(4):
+        scorer.remove(work_id)
+    assert not scorer._removed
+    assert "уникальное0" not in scorer.vocabulary
+    assert "уникальное7" in scorer.vocabulary
+    assert [w for w, _ in scorer.top_k("уникальное7 слово7", k=1)] == [7]
+
+
+def test_new_vocabulary_lowers_score():
+    rng = random.Random(3)
+    documents = {work_id: random_text(rng, 60) for work_id in range(20)}
+    scorer = TfidfBatchScorer()
+    for work_id, document in documents.items():
+        scorer.add(work_id, document)
+    # Общее с работой 1 только начало, остальное — слова, которых в корпусе нет
+    query = " ".join(documents[1].split()[:8] + [f"новое{i}" for i in range(200)])
+
+    result = scorer.top_k(query, k=3)
+    assert_same_ranking(result, brute_force(scorer, documents, query, 3))
+    assert result[0][0] == 1
+    assert result[0][1] < 0.3
@@ -0,0 +1,52 @@
+from typing import Dict
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+MB = 1024 * 1024
+
+
+class BodySizeLimitMiddleware:
+    """
+    Ограничение размера тела запроса для загрузочных путей.
+
+    Starlette вычитывает multipart-тело целиком (файлы — во временные
+    файлы) ещё до вызова обработчика, так что проверка размера в самом
+    обработчике срабатывает только после приёма всего тела. Здесь запрос,
+    объявивший Content-Length больше лимита, отклоняется сразу (413),
+    а тело без Content-Length обрывается, как только принятые байты
+    превысят лимит.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    def _detail(self, limit: int) -> str:
+        return f"Размер запроса превышает {limit // MB} МБ"
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": self._detail(limit)}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI пробрасывает HTTPException из чтения тела как есть
+                    raise HTTPException(status_code=413, detail=self._detail(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -8,12 +8,33 @@ class Settings(BaseSettings):
     app_port: int = 8001
 
     # База данных
-    database_url: str
+    database_url: str = "sqlite:///./file_storage.db"
 
     # Файлы
     upload_dir: str = "./uploads"
     max_file_size_mb: int = 10
     allowed_extensions: List[str] = ["txt", "pdf", "doc", "docx"]
+    max_import_size_mb: int = 500  # Архив для массового импорта
+    # Всё тело запроса /upload (файл, извлечённый текст и поля формы) — проверяется до разбора multipart
+    max_upload_request_mb: int = 25
+    # Сверять хэш, переданный шлюзом при загрузке, с содержимым (False — принимать на веру)
+    verify_upload_hash: bool = True
+
+    # Сжатие на диске: none, gzip или zstd (Python 3.14 или пакет zstandard)
+    blob_compression: str = "gzip"
+    text_compression: str = "gzip"
+    # Уже сжатые форматы хранятся как есть
+    incompressible_extensions: List[str] = ["pdf", "docx", "zip", "gz", "zst", "png", "jpg", "jpeg"]
+
+    # Пул потоков для файлового ввода-вывода и хэширования
+    io_workers: int = 8
+    io_max_pending: int = 64  # Больше операций ждут в корутинах, а не в очереди пула
+
+    # Сборка мусора: блобы без ссылок и осиротевшие файлы (0 — фоновая сборка выключена)
+    gc_interval_seconds: float = 60.0
+    gc_grace_seconds: float = 600.0
+    gc_batch_size: int = 100
+    gc_shards_per_pass: int = 16
 
     class Config:
         env_file = ".env"
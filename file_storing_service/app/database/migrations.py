@@ -0,0 +1,33 @@
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from ..models.work import Work
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """
+    Доводит схему существующей БД до моделей. create_all создаёт только
+    недостающие таблицы (blobs), а столбцы в уже существующую works не
+    добавляет — это делают ALTER TABLE ниже. Возвращает выполненные шаги.
+    """
+    inspector = inspect(engine)
+    if "works" not in inspector.get_table_names():
+        return []
+
+    columns = {column["name"] for column in inspector.get_columns("works")}
+    steps = []
+    with engine.begin() as connection:
+        if "change_seq" not in columns:
+            column_type = Work.__table__.c.change_seq.type.compile(dialect=engine.dialect)
+            connection.execute(text(f"ALTER TABLE works ADD COLUMN change_seq {column_type} NOT NULL DEFAULT 0"))
+            # Существующие работы попадают в ленту изменений в порядке id
+            connection.execute(text("UPDATE works SET change_seq = id"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_works_change_seq ON works (change_seq)"))
+            steps.append("works.change_seq")
+        if "deleted_at" not in columns:
+            column_type = Work.__table__.c.deleted_at.type.compile(dialect=engine.dialect)
+            connection.execute(text(f"ALTER TABLE works ADD COLUMN deleted_at {column_type}"))
+            steps.append("works.deleted_at")
+    return steps
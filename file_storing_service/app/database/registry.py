@@ -0,0 +1,260 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+
+from .connection import Base, SessionLocal, engine
+from .migrations import upgrade_schema
+from ..models.blob import Blob
+from ..models.work import Work
+
+
+def work_to_dict(work: Work) -> dict:
+    return {
+        "id": work.id,
+        "student_name": work.student_name,
+        "assignment_id": work.assignment_id,
+        "file_name": work.file_name,
+        "file_hash": work.file_hash,
+        "file_path": work.file_path,
+        "file_size": work.file_size,
+        "uploaded_at": work.uploaded_at.isoformat() if work.uploaded_at else None,
+        "change_seq": work.change_seq
+    }
+
+
+def tombstone_to_dict(work: Work) -> dict:
+    """Запись ленты об удалённой работе"""
+    return {
+        "id": work.id,
+        "assignment_id": work.assignment_id,
+        "file_hash": work.file_hash,
+        "change_seq": work.change_seq,
+        "deleted": True
+    }
+
+
+class WorksRegistry:
+    """
+    Реестр работ поверх таблицы works с индексами в памяти
+    по id, file_hash и assignment_id.
+
+    При старте (load) схема БД доводится до моделей, индексы заполняются
+    из БД, поэтому сервис перезапускается «тёплым»; промахи по id
+    дочитываются из БД (get/get_many блокируют поток — из async-обработчиков
+    их вызывают через пул ввода-вывода, попадания проверяет cached).
+
+    Каждое изменение получает возрастающий change_seq — по нему
+    потребители синхронизируются инкрементально (changes_since).
+    Удалённая работа остаётся в ленте записью с deleted=True.
+
+    Содержимое хранится один раз на хэш: таблица blobs считает живые
+    работы, ссылающиеся на блоб (ref_count), в той же транзакции, что и
+    изменение работ. Блобы с нулевым счётчиком собирает BlobCollector.
+    """
+
+    def __init__(self, session_factory: sessionmaker = SessionLocal):
+        self._session_factory = session_factory
+        # Запись идёт и из event loop, и из потоков импорта — change_seq выдаётся под блокировкой
+        self._write_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._by_id: Dict[int, dict] = {}
+        self._by_hash: Dict[str, List[int]] = {}
+        self._by_assignment: Dict[str, List[int]] = {}
+        self._ids: List[int] = []  # По возрастанию — для keyset-пагинации
+        self._feed: List[Tuple[int, int]] = []  # (change_seq, id) по возрастанию
+        self._tombstones: Dict[int, dict] = {}
+        self.last_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def load(self) -> None:
+        for step in upgrade_schema(engine):
+            print(f"🔁 Схема БД: добавлен столбец {step}")
+        Base.metadata.create_all(bind=engine)
+        self._reset()
+        with self._session_factory() as db:
+            for work in db.query(Work).order_by(Work.change_seq, Work.id).all():
+                if work.deleted_at is None:
+                    self._index(work_to_dict(work))
+                else:
+                    self._add_tombstone(tombstone_to_dict(work))
+            self.last_seq = db.query(func.max(Work.change_seq)).scalar() or 0
+
+            if self._by_id and db.query(Blob).first() is None:
+                self._backfill_blobs(db)
+
+    def _backfill_blobs(self, db: Session) -> None:
+        """Счётчики ссылок для базы, созданной до появления таблицы blobs"""
+        rows = (db.query(Work.file_hash, func.count(Work.id), func.max(Work.file_size))
+                .filter(Work.deleted_at.is_(None))
+                .group_by(Work.file_hash).all())
+        db.add_all(Blob(file_hash=file_hash, ref_count=count, file_size=size) for file_hash, count, size in rows)
+        db.commit()
+        print(f"🔁 Заполнена таблица blobs: {len(rows)} блобов")
+
+    def _reference(self, db: Session, items: List[dict]) -> None:
+        """Увеличивает счётчики ссылок блобов новых работ (в транзакции вызывающего)"""
+        counts = Counter(fields["file_hash"] for fields in items)
+        sizes = {fields["file_hash"]: fields["file_size"] for fields in items}
+        for file_hash, count in counts.items():
+            blob = db.get(Blob, file_hash)
+            if blob is None:
+                db.add(Blob(file_hash=file_hash, file_size=sizes[file_hash], ref_count=count))
+            else:
+                blob.ref_count += count
+                blob.unreferenced_at = None
+
+    def _index(self, work: dict) -> dict:
+        if work["id"] in self._by_id:
+            return self._by_id[work["id"]]
+        self._by_id[work["id"]] = work
+        self._by_hash.setdefault(work["file_hash"], []).append(work["id"])
+        self._by_assignment.setdefault(work["assignment_id"], []).append(work["id"])
+        self._ids.insert(bisect_right(self._ids, work["id"]), work["id"])
+        self._feed.insert(bisect_right(self._feed, (work["change_seq"], work["id"])),
+                          (work["change_seq"], work["id"]))
+        return work
+
+    def _unindex(self, work: dict) -> None:
+        del self._by_id[work["id"]]
+        self._by_hash[work["file_hash"]].remove(work["id"])
+        if not self._by_hash[work["file_hash"]]:
+            del self._by_hash[work["file_hash"]]
+        self._by_assignment[work["assignment_id"]].remove(work["id"])
+        del self._ids[bisect_left(self._ids, work["id"])]
+        del self._feed[bisect_left(self._feed, (work["change_seq"], work["id"]))]
+
+    def _add_tombstone(self, tombstone: dict) -> None:
+        self._tombstones[tombstone["id"]] = tombstone
+        self._feed.insert(bisect_right(self._feed, (tombstone["change_seq"], tombstone["id"])),
+                          (tombstone["change_seq"], tombstone["id"]))
+
+    def create(self, **fields) -> dict:
+        """Сохраняет работу в БД и добавляет её в индексы"""
+        with self._write_lock, self._session_factory() as db:
+            self.last_seq += 1
+            work = Work(**fields, change_seq=self.last_seq)
+            db.add(work)
+            self._reference(db, [fields])
+            db.commit()
+            db.refresh(work)
+            return self._index(work_to_dict(work))
+
+    def create_many(self, items: List[dict]) -> List[dict]:
+        """Сохраняет несколько работ одной транзакцией: либо все, либо ни одной"""
+        if not items:
+            return []
+        with self._write_lock, self._session_factory() as db:
+            works = []
+            for offset, fields in enumerate(items, start=1):
+                works.append(Work(**fields, change_seq=self.last_seq + offset))
+            db.add_all(works)
+            self._reference(db, items)
+            db.commit()
+            self.last_seq += len(works)
+            for work in works:
+                db.refresh(work)
+            return [self._index(work_to_dict(work)) for work in works]
+
+    def cached(self, work_id: int) -> Optional[dict]:
+        """Работа из индекса в памяти, без обращения к БД"""
+        return self._by_id.get(work_id)
+
+    def get(self, work_id: int) -> Optional[dict]:
+        work = self._by_id.get(work_id)
+        if work is None:
+            with self._session_factory() as db:
+                db_work = db.get(Work, work_id)
+                if db_work is not None and db_work.deleted_at is None:
+                    work = self._index(work_to_dict(db_work))
+        return work
+
+    def get_many(self, work_ids: List[int]) -> List[dict]:
+        """Живые работы по списку id в том же порядке; промахи дочитываются одним запросом"""
+        missing = [work_id for work_id in work_ids if work_id not in self._by_id]
+        if missing:
+            with self._session_factory() as db:
+                for db_work in db.query(Work).filter(Work.id.in_(missing), Work.deleted_at.is_(None)):
+                    self._index(work_to_dict(db_work))
+        return [self._by_id[work_id] for work_id in work_ids if work_id in self._by_id]
+
+    def delete(self, work_id: int) -> Optional[dict]:
+        """
+        Удаляет работу: в ленте остаётся запись deleted, счётчик ссылок
+        блоба уменьшается. Сам файл удалит сборщик мусора. None, если
+        работы нет.
+        """
+        with self._write_lock, self._session_factory() as db:
+            db_work = db.get(Work, work_id)
+            if db_work is None or db_work.deleted_at is not None:
+                return None
+
+            now = datetime.now(timezone.utc)
+            self.last_seq += 1
+            db_work.deleted_at = now
+            db_work.change_seq = self.last_seq
+            blob = db.get(Blob, db_work.file_hash)
+            if blob is not None:
+                blob.ref_count = max(0, blob.ref_count - 1)
+                if blob.ref_count == 0:
+                    blob.unreferenced_at = now
+            db.commit()
+
+            if work_id in self._by_id:
+                self._unindex(self._by_id[work_id])
+            tombstone = tombstone_to_dict(db_work)
+            self._add_tombstone(tombstone)
+            return tombstone
+
+    def unreferenced_blobs(self, older_than: datetime, limit: int = 100) -> List[str]:
+        """Хэши блобов без ссылок дольше, чем с момента older_than"""
+        with self._session_factory() as db:
+            rows = (db.query(Blob.file_hash)
+                    .filter(Blob.ref_count == 0, Blob.unreferenced_at <= older_than)
+                    .order_by(Blob.unreferenced_at).limit(limit).all())
+            return [file_hash for file_hash, in rows]
+
+    def drop_blob(self, file_hash: str, older_than: datetime) -> bool:
+        """Удаляет запись блоба, только если на него по-прежнему нет ссылок"""
+        with self._write_lock, self._session_factory() as db:
+            deleted = (db.query(Blob)
+                       .filter(Blob.file_hash == file_hash, Blob.ref_count == 0,
+                               Blob.unreferenced_at <= older_than)
+                       .delete(synchronize_session=False))
+            db.commit()
+            return deleted == 1
+
+    def has_blob(self, file_hash: str) -> bool:
+        if file_hash in self._by_hash:
+            return True
+        with self._session_factory() as db:
+            return db.get(Blob, file_hash) is not None
+
+    def find_by_hash(self, file_hash: str) -> List[dict]:
+        return [self._by_id[work_id] for work_id in self._by_hash.get(file_hash, [])]
+
+    def by_assignment(self, assignment_id: str) -> List[dict]:
+        return [self._by_id[work_id] for work_id in self._by_assignment.get(assignment_id, [])]
+
+    def all(self) -> List[dict]:
+        return list(self._by_id.values())
+
+    def page(self, after_id: int = 0, limit: int = 100) -> Tuple[List[dict], bool]:
+        """Keyset-пагинация по id: работы с id > after_id и признак продолжения"""
+        start = bisect_right(self._ids, after_id)
+        ids = self._ids[start:start + limit]
+        return [self._by_id[work_id] for work_id in ids], start + limit < len(self._ids)
+
+    def changes_since(self, cursor: int = 0, limit: int = 100) -> Tuple[List[dict], bool]:
+        """Работы, изменённые после позиции cursor в ленте, и признак продолжения"""
+        start = bisect_right(self._feed, (cursor, float("inf")))
+        entries = self._feed[start:start + limit]
+        works = [self._by_id.get(work_id) or self._tombstones[work_id] for _, work_id in entries]
+        return works, start + limit < len(self._feed)
@@ -1,10 +1,58 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Iterator, List, Literal, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import json
 import os
-import hashlib
-from datetime import datetime
+import struct
+import tempfile
 
-app = FastAPI(title="File Storing Service", version="1.0.0")
+from .config import settings
+from .body_limit import MB, BodySizeLimitMiddleware
+from .storage.compression import acompress_stream, negotiate_encoding
+from .storage.gc import BlobCollector
+from .storage.io_executor import IOExecutor
+from .storage.bulk_import import ArchiveError, BulkImporter
+from .storage.local_storage import CHUNK_SIZE, TEMP_PREFIX, LocalStorage, FileTooLargeError, HashMismatchError
+from .storage.responses import IMMUTABLE_CACHE, SHA256_RE, blob_response
+from .storage.text_sidecars import TextSidecarStore
+from .database.registry import WorksRegistry
+
+
+async def gc_loop():
+    """Фоновая сборка мусора короткими проходами в пуле потоков"""
+    while True:
+        await asyncio.sleep(settings.gc_interval_seconds)
+        try:
+            await io_executor.run(blob_collector.run_once, op="gc")
+        except Exception as e:
+            print(f"❌ Ошибка сборки мусора: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Индексы заполняются из БД — после перезапуска сервис сразу «тёплый»
+    works_registry.load()
+    gc_task = asyncio.create_task(gc_loop()) if settings.gc_interval_seconds > 0 else None
+    yield
+    if gc_task is not None:
+        gc_task.cancel()
+    io_executor.shutdown()
+
+
+app = FastAPI(title="File Storing Service", version="1.0.0", lifespan=lifespan)
+
+# Слишком большие тела отклоняются до того, как Starlette сохранит их во временные файлы.
+# Добавляется раньше CORS, то есть внутрь него: ответ 413 получает CORS-заголовки,
+# и браузер показывает ошибку, а не «сетевой сбой»
+app.add_middleware(BodySizeLimitMiddleware, limits={
+    "/upload": settings.max_upload_request_mb * MB,
+    "/import": (settings.max_import_size_mb + 1) * MB  # Запас на заголовки multipart и поля формы
+})
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,104 +62,312 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = "/app/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Весь файловый ввод-вывод async-обработчиков идёт через ограниченный пул
+io_executor = IOExecutor(max_workers=settings.io_workers, max_pending=settings.io_max_pending)
+
+storage = LocalStorage(io=io_executor)
+
+# Извлечённые тексты рядом с блобами, по одному на содержимое
+text_sidecars = TextSidecarStore(storage)
+
+# Реестр работ: БД + индексы в памяти по id, хэшу и заданию
+works_registry = WorksRegistry()
 
-# Простое хранилище в памяти
-works_db = []
-next_id = 1
+blob_collector = BlobCollector(storage, text_sidecars, works_registry,
+                               grace_seconds=settings.gc_grace_seconds,
+                               batch_size=settings.gc_batch_size,
+                               shards_per_pass=settings.gc_shards_per_pass)
+
+bulk_importer = BulkImporter(storage, text_sidecars, works_registry,
+                             max_file_size=settings.max_file_size_mb * 1024 * 1024,
+                             allowed_extensions=settings.allowed_extensions)
 
 
 @app.post("/upload")
 async def upload_file(
         file: UploadFile = File(...),
         student_name: str = Form(...),
-        assignment_id: str = Form(...)
+        assignment_id: str = Form(...),
+        file_hash: Optional[str] = Form(None),
+        extracted_text: Optional[UploadFile] = File(None)
 ):
-    global next_id
+    """
+    Сохраняет работу. Шлюз может передать уже посчитанный SHA-256
+    (file_hash) и извлечённый текст (extracted_text, частью multipart,
+    т.к. поля формы ограничены 1 МБ) — тогда файл не разбирается повторно,
+    а при verify_upload_hash=False и не хэшируется.
+    """
+    if file_hash is not None and not SHA256_RE.match(file_hash):
+        raise HTTPException(status_code=400, detail="Некорректный file_hash")
 
     try:
-        file_content = await file.read()
-        file_hash = hashlib.sha256(file_content).hexdigest()
-
-        # Извлекаем текст для анализа
-        extracted_text = ""
-        if file.filename.endswith(('.txt', '.pdf', '.doc', '.docx')):
-            try:
-                if file.filename.endswith('.txt'):
-                    extracted_text = file_content.decode('utf-8', errors='ignore')
-            except:
-                pass
+        # Потоковая запись во временный файл с подсчётом хэша на лету
+        try:
+            file_path, file_hash, file_size = await storage.save_upload(
+                file, file.filename, max_size=settings.max_file_size_mb * 1024 * 1024,
+                expected_hash=file_hash, verify=settings.verify_upload_hash
+            )
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Размер файла превышает {settings.max_file_size_mb} МБ"
+            )
+        except HashMismatchError:
+            raise HTTPException(status_code=400, detail="file_hash не совпадает с содержимым файла")
 
         # Проверяем на дубликат
-        for work in works_db:
-            if work["file_hash"] == file_hash:
-                if work["student_name"] == student_name and work["assignment_id"] == assignment_id:
-                    return {
-                        "message": "Файл уже был загружен ранее",
-                        "work_id": work["id"],
-                        "status": "already_uploaded"
-                    }
-                break
-
-        # Сохраняем файл
-        file_path = os.path.join(UPLOAD_DIR, f"{file_hash}_{file.filename}")
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+        for work in works_registry.find_by_hash(file_hash):
+            if work["student_name"] == student_name and work["assignment_id"] == assignment_id:
+                return {
+                    "message": "Файл уже был загружен ранее",
+                    "work_id": work["id"],
+                    "status": "already_uploaded"
+                }
 
-        # Сохраняем метаданные
-        work_data = {
-            "id": next_id,
-            "student_name": student_name,
-            "assignment_id": assignment_id,
-            "file_name": file.filename,
-            "file_hash": file_hash,
-            "file_path": file_path,
-            "file_size": len(file_content),
-            "file_text": extracted_text,  # Сохраняем текст для сравнения
-            "uploaded_at": datetime.now().isoformat()
-        }
-
-        works_db.append(work_data)
-        next_id += 1
+        # Текст извлекается один раз на содержимое — дубликаты используют готовую копию
+        if not await io_executor.run(text_sidecars.exists, file_hash, op="locate"):
+            text = (await extracted_text.read()).decode('utf-8', errors='replace') if extracted_text else ""
+            if text.strip():
+                await io_executor.run(text_sidecars.adopt, file_hash, text, op="write_text")
+            else:
+                await io_executor.run(text_sidecars.ensure, file_hash, file.filename, op="extract")
 
-        return work_data
+        # Сохраняем метаданные
+        return await io_executor.run(functools.partial(
+            works_registry.create,
+            student_name=student_name,
+            assignment_id=assignment_id,
+            file_name=file.filename,
+            file_hash=file_hash,
+            file_path=file_path,
+            file_size=file_size
+        ), op="register")
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Ошибка загрузки: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка загрузки: {str(e)}")
 
+def spool_archive(source: BinaryIO, max_size: int) -> str:
+    """Копирует архив во временный файл хранилища: ZIP читается с конца, нужен seek"""
+    fd, archive_path = tempfile.mkstemp(dir=storage.upload_dir, prefix=TEMP_PREFIX, suffix=".archive")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(f"Archive size exceeds {max_size} bytes")
+                target.write(chunk)
+    except BaseException:
+        os.remove(archive_path)
+        raise
+    return archive_path
+
+
+async def import_events(started: dict, events: Iterator[dict], archive_path: str) -> AsyncIterator[bytes]:
+    """События импорта в NDJSON; каждая запись архива обрабатывается в пуле ввода-вывода"""
+    event = started
+    try:
+        while event is not None:
+            yield (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+            event = await io_executor.run(next, events, None, op="import")
+    except Exception as e:
+        print(f"❌ Ошибка импорта: {e}")
+        yield (json.dumps({"event": "error", "detail": str(e)}, ensure_ascii=False) + "\n").encode('utf-8')
+    finally:
+        await io_executor.run(events.close, op="import")
+        await io_executor.run(os.remove, archive_path, op="remove")
+
+
+@app.post("/import")
+async def import_archive(
+        archive: UploadFile = File(...),
+        assignment_id: Optional[str] = Form(None)
+):
+    """
+    Массовый импорт работ из ZIP/tar архива.
+
+    Студенты берутся из manifest.csv / manifest.json в архиве (file,
+    student_name, assignment_id), без манифеста — из каталога верхнего
+    уровня или имени файла. Ответ — поток NDJSON: started, по событию
+    на каждую запись и done со списком зарегистрированных работ.
+    """
+    try:
+        archive_path = await io_executor.run(spool_archive, archive.file,
+                                             settings.max_import_size_mb * 1024 * 1024, op="spool")
+    except FileTooLargeError:
+        raise HTTPException(status_code=400, detail=f"Размер архива превышает {settings.max_import_size_mb} МБ")
+
+    # Первое событие читается до ответа, чтобы ошибки архива и манифеста вернулись как 400
+    events = bulk_importer.run(archive_path, assignment_id)
+    try:
+        started = await io_executor.run(next, events, op="import")
+    except BaseException as e:
+        os.remove(archive_path)
+        if isinstance(e, ArchiveError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+
+    return StreamingResponse(import_events(started, events, archive_path),
+                             media_type="application/x-ndjson")
+
+
+class BulkTextRequest(BaseModel):
+    work_ids: Optional[List[int]] = None
+    assignment_id: Optional[str] = None
+    format: Literal["ndjson", "binary"] = "ndjson"
+
+
+# Кадр бинарного формата: id работы (u32), длина текста в байтах (u32), текст в UTF-8
+TEXT_FRAME_HEADER = struct.Struct(">II")
+
+
+def read_work_text(work: dict) -> str:
+    """Текст работы из текстовой копии; для старых работ она создаётся при первом обращении"""
+    return text_sidecars.ensure(work["file_hash"], work["file_name"])
+
+
+async def single_chunk(body: bytes) -> AsyncIterator[bytes]:
+    yield body
+
+
+# Меньшие ответы не сжимаются — накладные расходы больше выигрыша
+MIN_COMPRESS_SIZE = 1024
+
+
+def encoded_response(chunks: AsyncIterable[bytes], media_type: str, accept_encoding: Optional[str],
+                     size_hint: Optional[int] = None) -> Response:
+    """Потоковый ответ, сжатый кодировкой из Accept-Encoding клиента (zstd или gzip)"""
+    codec = negotiate_encoding(accept_encoding)
+    if codec is None or (size_hint is not None and size_hint < MIN_COMPRESS_SIZE):
+        return StreamingResponse(chunks, media_type=media_type)
+    return StreamingResponse(
+        acompress_stream(chunks, codec),
+        media_type=media_type,
+        headers={"Content-Encoding": codec.name, "Vary": "Accept-Encoding"}
+    )
+
+
+async def lookup_work(work_id: int) -> Optional[dict]:
+    """Работа из индекса в памяти; промах дочитывается из БД в пуле ввода-вывода"""
+    work = works_registry.cached(work_id)
+    if work is None:
+        work = await io_executor.run(works_registry.get, work_id, op="lookup")
+    return work
+
+
+async def lookup_works(work_ids: List[int]) -> List[dict]:
+    """Работы по списку id; если есть промахи — один запрос к БД в пуле ввода-вывода"""
+    works = [works_registry.cached(work_id) for work_id in work_ids]
+    if all(work is not None for work in works):
+        return works
+    return await io_executor.run(works_registry.get_many, work_ids, op="lookup")
+
+
 @app.get("/files/{work_id}/text")
-async def get_file_text(work_id: int):
+async def get_file_text(work_id: int, request: Request):
     """Получает текст файла для анализа плагиата"""
-    for work in works_db:
-        if work["id"] == work_id:
-            if "file_text" in work and work["file_text"]:
-                return {"text": work["file_text"]}
-            else:
-                # Попробуем прочитать файл
-                try:
-                    with open(work["file_path"], "rb") as f:
-                        content = f.read()
-                        if work["file_name"].endswith('.txt'):
-                            text = content.decode('utf-8', errors='ignore')
-                            return {"text": text}
-                except:
-                    return {"text": ""}
-    raise HTTPException(status_code=404, detail="Работа не найдена")
+    work = await lookup_work(work_id)
+    if work is None:
+        raise HTTPException(status_code=404, detail="Работа не найдена")
+    text = await io_executor.run(read_work_text, work, op="read_text")
+    body = json.dumps({"text": text, "extractor_version": text_sidecars.version},
+                      ensure_ascii=False).encode('utf-8')
+    return encoded_response(single_chunk(body), "application/json",
+                            request.headers.get("accept-encoding"), size_hint=len(body))
+
+
+@app.post("/files/texts")
+async def get_files_texts(request: BulkTextRequest, http_request: Request):
+    """
+    Потоковая выдача текстов многих работ за один запрос: по списку id
+    или по заданию. NDJSON (по строке на работу) или бинарные кадры;
+    поток сжимается, если клиент принимает zstd или gzip.
+    """
+    if request.work_ids is None and request.assignment_id is None:
+        raise HTTPException(status_code=400, detail="Нужно указать work_ids или assignment_id")
+
+    if request.work_ids is not None:
+        works = await lookup_works(request.work_ids)
+    else:
+        works = works_registry.by_assignment(request.assignment_id)
+
+    async def ndjson_stream():
+        for work in works:
+            text = await io_executor.run(read_work_text, work, op="read_text")
+            line = json.dumps({"work_id": work["id"], "text": text}, ensure_ascii=False)
+            yield (line + "\n").encode('utf-8')
+
+    async def binary_stream():
+        for work in works:
+            payload = (await io_executor.run(read_work_text, work, op="read_text")).encode('utf-8')
+            yield TEXT_FRAME_HEADER.pack(work["id"], len(payload)) + payload
+
+    accept_encoding = http_request.headers.get("accept-encoding")
+    if request.format == "binary":
+        return encoded_response(binary_stream(), "application/octet-stream", accept_encoding)
+    return encoded_response(ndjson_stream(), "application/x-ndjson", accept_encoding)
+
+
+@app.api_route("/download/{work_id}", methods=["GET", "HEAD"])
+async def download_file(work_id: int, request: Request):
+    """Скачивание файла работы: Range, If-Range и If-None-Match по хэшу"""
+    work = await lookup_work(work_id)
+    if work is None:
+        raise HTTPException(status_code=404, detail="Работа не найдена")
+    return await blob_response(request, storage, work["file_hash"], file_name=work["file_name"])
+
+
+@app.api_route("/blobs/{file_hash}", methods=["GET", "HEAD"])
+async def download_blob(file_hash: str, request: Request):
+    """Блоб по хэшу содержимого — неизменяемый, кэшируется навсегда"""
+    return await blob_response(request, storage, file_hash, cache_control=IMMUTABLE_CACHE)
 
 
 @app.get("/works/{work_id}")
 async def get_work(work_id: int):
-    for work in works_db:
-        if work["id"] == work_id:
-            return work
-    raise HTTPException(status_code=404, detail="Работа не найдена")
+    work = await lookup_work(work_id)
+    if work is None:
+        raise HTTPException(status_code=404, detail="Работа не найдена")
+    return work
+
+
+@app.delete("/works/{work_id}")
+async def delete_work(work_id: int):
+    """
+    Удаляет работу. Файл удаляется сборщиком мусора, когда на его
+    содержимое не останется ссылок; в ленте /works?since появится
+    запись с deleted=true.
+    """
+    tombstone = await io_executor.run(works_registry.delete, work_id, op="delete")
+    if tombstone is None:
+        raise HTTPException(status_code=404, detail="Работа не найдена")
+    return {"message": "Работа удалена", **tombstone}
+
+
+@app.get("/debug/gc")
+async def gc_stats():
+    return {"stats": blob_collector.stats, "interval_seconds": settings.gc_interval_seconds,
+            "grace_seconds": settings.gc_grace_seconds}
+
+
+@app.post("/debug/gc/run")
+async def run_gc():
+    """Внеочередной проход сборки мусора"""
+    return {"stats": await io_executor.run(blob_collector.run_once, op="gc")}
+
+
+@app.get("/debug/io")
+async def io_stats():
+    """Очередь и задержки пула файлового ввода-вывода по видам операций"""
+    return io_executor.stats()
 
 
 @app.get("/assignment/{assignment_id}/works")
-async def get_assignment_works(assignment_id: str):
-    result = [w for w in works_db if w["assignment_id"] == assignment_id]
+async def get_assignment_works(assignment_id: str, fields: Optional[str] = None):
+    result = [project_work(w, parse_fields(fields)) for w in works_registry.by_assignment(assignment_id)]
     return {"works": result, "total": len(result)}
 
 
@@ -119,7 +375,66 @@ async def get_assignment_works(assignment_id: str):
 async def health():
     return {"status": "healthy", "service": "file-storing"}
 
+# Поля по умолчанию — только метаданные, без текста работы
+METADATA_FIELDS = ("id", "student_name", "assignment_id", "file_name", "file_hash",
+                   "file_size", "uploaded_at", "change_seq")
+ALL_FIELDS = METADATA_FIELDS + ("file_path",)
+
+
+def parse_fields(fields: Optional[str]) -> tuple:
+    """Разбирает параметр fields: список через запятую или all"""
+    if not fields:
+        return METADATA_FIELDS
+    if fields == "all":
+        return ALL_FIELDS
+    requested = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in requested if field not in ALL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(unknown)}")
+    # id нужен для курсоров, поэтому отдаётся всегда
+    return ("id",) + tuple(field for field in requested if field != "id")
+
+
+def project_work(work: dict, fields: tuple) -> dict:
+    if work.get("deleted"):
+        # Запись ленты об удалённой работе отдаётся как есть
+        return work
+    return {field: work[field] for field in fields}
+
+
 @app.get("/works")
-async def get_all_works():
-    """Получает все работы в системе (для глобальной проверки плагиата)"""
-    return {"works": works_db, "total": len(works_db)}
\ No newline at end of file
+async def get_all_works(
+        limit: int = Query(1000, ge=1, le=5000),
+        after: int = Query(0, ge=0),
+        since: Optional[int] = Query(None, ge=0),
+        fields: Optional[str] = None
+):
+    """
+    Работы в системе (для глобальной проверки плагиата).
+
+    По умолчанию — keyset-пагинация по id (after = последний полученный id)
+    и только метаданные; fields=all или список полей добавляет остальное.
+    С since=<cursor> возвращается лента изменений после курсора (включая
+    удалённые работы с deleted=true): потребитель сохраняет next_cursor
+    и синхронизируется инкрементально.
+    """
+    projection = parse_fields(fields)
+
+    if since is not None:
+        works, has_more = works_registry.changes_since(since, limit)
+        next_cursor = works[-1]["change_seq"] if works else since
+        return {
+            "works": [project_work(w, projection) for w in works],
+            "total": len(works_registry),
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+
+    works, has_more = works_registry.page(after, limit)
+    return {
+        "works": [project_work(w, projection) for w in works],
+        "total": len(works_registry),
+        "next_after": works[-1]["id"] if works else after,
+        "has_more": has_more,
+        "cursor": works_registry.last_seq
+    }
\ No newline at end of file
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ..database.connection import Base
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    file_hash = Column(String(64), primary_key=True)  # SHA256 содержимого
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # Число живых работ с этим содержимым
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    unreferenced_at = Column(DateTime(timezone=True), nullable=True, index=True)  # Когда ref_count стал 0
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime
 from sqlalchemy.sql import func
 from ..database.connection import Base
 
@@ -7,9 +7,11 @@ class Work(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     student_name = Column(String(100), nullable=False)
-    assignment_id = Column(String(50), nullable=False)
+    assignment_id = Column(String(50), nullable=False, index=True)
     file_name = Column(String(255), nullable=False)
-    file_hash = Column(String(64), nullable=False, unique=True)  # SHA256 hash
+    file_hash = Column(String(64), nullable=False, index=True)  # SHA256 hash (одинаковый у дубликатов)
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer, nullable=False)
-    uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    change_seq = Column(Integer, nullable=False, default=0, index=True)  # Позиция в ленте изменений
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Удалённая работа остаётся в ленте
\ No newline at end of file
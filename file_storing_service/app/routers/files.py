@@ -1,12 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Request
 from sqlalchemy.orm import Session
 import os
 
 from ..database.connection import get_db
 from ..database import crud
 from ..schemas.work import WorkCreate, WorkResponse
-from ..storage.local_storage import LocalStorage
+from ..storage.local_storage import LocalStorage, FileTooLargeError
+from ..storage.responses import blob_response
 from ..config import settings
 
 router = APIRouter()
@@ -20,19 +20,16 @@ async def upload_file(
         assignment_id: str = Form(...),
         db: Session = Depends(get_db)
 ):
-    # Проверка размера файла
-    file_content = await file.read()
-    file_size = len(file_content)
-
-    if file_size > settings.max_file_size_mb * 1024 * 1024:
+    # Потоковое сохранение с проверкой размера по ходу загрузки
+    try:
+        file_path, file_hash, file_size = await storage.save_upload(
+            file, file.filename, max_size=settings.max_file_size_mb * 1024 * 1024
+        )
+    except FileTooLargeError:
         raise HTTPException(
             status_code=400,
             detail=f"File size exceeds {settings.max_file_size_mb}MB limit"
         )
-
-    # Сохраняем файл
-    try:
-        file_path, file_hash = storage.save_file(file_content, file.filename)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
 
@@ -78,20 +75,13 @@ async def get_works_by_assignment(assignment_id: str, db: Session = Depends(get_
     return {"works": works, "total": len(works)}
 
 
-@router.get("/download/{work_id}")
-async def download_file(work_id: int, db: Session = Depends(get_db)):
+@router.api_route("/download/{work_id}", methods=["GET", "HEAD"])
+async def download_file(work_id: int, request: Request, db: Session = Depends(get_db)):
     work = crud.get_work_by_id(db, work_id)
     if not work:
         raise HTTPException(status_code=404, detail="Work not found")
 
-    if not os.path.exists(work.file_path):
-        raise HTTPException(status_code=404, detail="File not found on disk")
-
-    return FileResponse(
-        path=work.file_path,
-        filename=work.file_name,
-        media_type="application/octet-stream"
-    )
+    return await blob_response(request, storage, work.file_hash, file_name=work.file_name)
 
 
 @router.get("/health")
@@ -0,0 +1,225 @@
+import csv
+import io
+import json
+import posixpath
+import tarfile
+import zipfile
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .local_storage import FileTooLargeError, LocalStorage
+from .text_sidecars import TextSidecarStore
+from ..database.registry import WorksRegistry
+
+MANIFEST_NAMES = ("manifest.csv", "manifest.json")
+
+# Статус записи -> счётчик в итоговом событии
+SUMMARY_KEYS = {"stored": "stored", "duplicate": "duplicates", "skipped": "skipped", "error": "errors"}
+
+
+class ArchiveError(Exception):
+    """Архив не удалось прочитать или манифест некорректен"""
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    size: int
+    open: Callable[[], BinaryIO]
+
+
+@contextmanager
+def open_archive(path: str) -> Iterator[List[ArchiveEntry]]:
+    """
+    Записи-файлы ZIP или tar (в том числе .tar.gz) в порядке следования
+    в архиве. Содержимое не распаковывается: каждая запись открывается
+    потоком по требованию.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            yield [
+                ArchiveEntry(info.filename, info.file_size, lambda info=info: archive.open(info))
+                for info in archive.infolist() if not info.is_dir()
+            ]
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, "r:*") as archive:
+            yield [
+                ArchiveEntry(member.name, member.size, lambda member=member: archive.extractfile(member))
+                for member in archive.getmembers() if member.isfile()
+            ]
+    else:
+        raise ArchiveError("Поддерживаются только ZIP и tar архивы")
+
+
+def is_service_file(name: str) -> bool:
+    """Служебные файлы архиваторов и ОС (__MACOSX, .DS_Store и т.п.)"""
+    parts = name.split("/")
+    return parts[0] == "__MACOSX" or any(part.startswith(".") for part in parts)
+
+
+def clean_path(name: str) -> str:
+    return posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+
+
+def parse_manifest(data: bytes, name: str) -> Dict[str, dict]:
+    """
+    Манифест: путь файла -> {"student_name", "assignment_id"?}.
+
+    manifest.csv — колонки file, student_name и необязательная assignment_id;
+    manifest.json — список таких объектов или словарь {путь: ФИО}.
+    """
+    rows = []
+    try:
+        if name.endswith(".json"):
+            content = json.loads(data.decode("utf-8-sig"))
+            if isinstance(content, dict):
+                rows = [{"file": path, "student_name": student} for path, student in content.items()]
+            else:
+                rows = list(content)
+        else:
+            rows = list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ArchiveError(f"Не удалось разобрать {name}: {e}")
+
+    manifest = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ArchiveError(f"В {name} ожидаются объекты с полями file и student_name")
+        path = (row.get("file") or "").strip()
+        student_name = (row.get("student_name") or "").strip()
+        if not path or not student_name:
+            raise ArchiveError(f"В {name} у каждой строки должны быть file и student_name")
+        manifest[clean_path(path)] = {
+            "student_name": student_name,
+            "assignment_id": (row.get("assignment_id") or "").strip() or None
+        }
+    return manifest
+
+
+def find_manifest(entries: List[ArchiveEntry]) -> Tuple[Optional[ArchiveEntry], str]:
+    """Самый верхний манифест в архиве и его каталог (пути в нём относительные)"""
+    manifests = [entry for entry in entries
+                 if posixpath.basename(entry.name) in MANIFEST_NAMES and not is_service_file(entry.name)]
+    if not manifests:
+        return None, ""
+    manifest = min(manifests, key=lambda entry: entry.name.count("/"))
+    return manifest, posixpath.dirname(clean_path(manifest.name))
+
+
+def student_from_path(path: str) -> str:
+    """Без манифеста: ФИО — каталог верхнего уровня (Иванов/essay.pdf) или имя файла"""
+    if "/" in path:
+        return path.split("/", 1)[0]
+    return posixpath.splitext(path)[0]
+
+
+class BulkImporter:
+    """
+    Импорт работ целого задания из архива.
+
+    Записи архива потоково сохраняются в хранилище (с дедупликацией по
+    хэшу содержимого), для каждого нового содержимого один раз извлекается
+    текст. Работы регистрируются в конце одной транзакцией, а до тех пор
+    сохранённые блобы арендованы у сборщика мусора (storage.pin): долгий
+    импорт не теряет содержимое, записанное в начале. run() — генератор
+    событий прогресса, которые отдаются клиенту в NDJSON.
+    """
+
+    def __init__(self, storage: LocalStorage, text_sidecars: TextSidecarStore, registry: WorksRegistry,
+                 max_file_size: Optional[int] = None, allowed_extensions: Optional[List[str]] = None):
+        self.storage = storage
+        self.text_sidecars = text_sidecars
+        self.registry = registry
+        self.max_file_size = max_file_size
+        self.allowed_extensions = {ext.lower() for ext in allowed_extensions} if allowed_extensions else None
+
+    def run(self, archive_path: str, assignment_id: Optional[str] = None) -> Iterator[dict]:
+        with open_archive(archive_path) as entries:
+            manifest_entry, base = find_manifest(entries)
+            manifest = None
+            if manifest_entry is not None:
+                with manifest_entry.open() as f:
+                    manifest = parse_manifest(f.read(), manifest_entry.name)
+
+            files = [entry for entry in entries
+                     if entry is not manifest_entry and not is_service_file(entry.name)]
+            yield {"event": "started", "total": len(files), "manifest": manifest is not None}
+
+            pending: List[dict] = []
+            seen = set()
+            summary = dict.fromkeys(SUMMARY_KEYS.values(), 0)
+
+            try:
+                for index, entry in enumerate(files, start=1):
+                    result = self._import_entry(entry, base, manifest, assignment_id, pending, seen)
+                    summary[SUMMARY_KEYS[result["status"]]] += 1
+                    yield {"event": "entry", "index": index, "total": len(files), **result}
+
+                works = self.registry.create_many(pending)
+            finally:
+                # После регистрации блобы защищены ссылками, при ошибке — снова подлежат сборке
+                for fields in pending:
+                    self.storage.unpin(fields["file_hash"])
+
+        yield {"event": "done", **summary, "created": len(works), "works": works}
+
+    def _import_entry(self, entry: ArchiveEntry, base: str, manifest: Optional[Dict[str, dict]],
+                      assignment_id: Optional[str], pending: List[dict], seen: set) -> dict:
+        path = clean_path(entry.name)
+        if base:
+            if not path.startswith(base + "/"):
+                return {"file": path, "status": "skipped", "reason": "вне каталога манифеста"}
+            path = path[len(base) + 1:]
+
+        extension = posixpath.splitext(path)[1].lstrip(".").lower()
+        if self.allowed_extensions is not None and extension not in self.allowed_extensions:
+            return {"file": path, "status": "skipped", "reason": "неподдерживаемый формат"}
+
+        if manifest is not None:
+            row = manifest.get(path)
+            if row is None:
+                return {"file": path, "status": "skipped", "reason": "нет в манифесте"}
+            student_name = row["student_name"]
+            work_assignment = row["assignment_id"] or assignment_id
+        else:
+            student_name = student_from_path(path)
+            work_assignment = assignment_id
+        if not work_assignment:
+            return {"file": path, "status": "error", "reason": "не указано задание"}
+
+        file_name = posixpath.basename(path)
+        try:
+            with entry.open() as stream:
+                file_path, file_hash, file_size = self.storage.save_stream(stream, file_name,
+                                                                           max_size=self.max_file_size,
+                                                                           pin=True)
+        except FileTooLargeError:
+            return {"file": path, "status": "error", "reason": "превышен размер файла"}
+        except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+            return {"file": path, "status": "error", "reason": str(e)}
+
+        # Дубликат: то же содержимое того же студента в том же задании — аренда
+        # нужна только содержимому, которое будет зарегистрировано
+        key = (file_hash, student_name, work_assignment)
+        if key in seen:
+            self.storage.unpin(file_hash)
+            return {"file": path, "status": "duplicate", "file_hash": file_hash}
+        for work in self.registry.find_by_hash(file_hash):
+            if work["student_name"] == student_name and work["assignment_id"] == work_assignment:
+                self.storage.unpin(file_hash)
+                return {"file": path, "status": "duplicate", "file_hash": file_hash, "work_id": work["id"]}
+        seen.add(key)
+
+        # В pending до извлечения текста: аренду снимет run() при любом исходе
+        pending.append({
+            "student_name": student_name,
+            "assignment_id": work_assignment,
+            "file_name": file_name,
+            "file_hash": file_hash,
+            "file_path": file_path,
+            "file_size": file_size
+        })
+
+        if not self.text_sidecars.exists(file_hash):
+            self.text_sidecars.ensure(file_hash, file_name)
+
+        return {"file": path, "status": "stored", "student_name": student_name, "file_hash": file_hash}
@@ -0,0 +1,144 @@
+import builtins
+import gzip
+import zlib
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Dict, Iterable, Iterator, Optional
+
+try:
+    # Python 3.14+
+    from compression import zstd as _zstd
+except ImportError:
+    _zstd = None
+
+try:
+    import zstandard as _zstandard
+except ImportError:
+    _zstandard = None
+
+
+class Codec:
+    """
+    Формат хранения объекта: суффикс файла на диске и имя для
+    Content-Encoding. open() возвращает файловый объект, который сам
+    сжимает при записи и распаковывает при чтении.
+    """
+    name = "identity"
+    suffix = ""
+
+    def open(self, path: str, mode: str) -> BinaryIO:
+        return builtins.open(path, mode)
+
+    def compressor(self):
+        """Потоковый компрессор с методами compress() и flush()"""
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+    suffix = ".gz"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def open(self, path: str, mode: str) -> BinaryIO:
+        if "w" in mode:
+            # mtime=0 — одинаковое содержимое даёт одинаковые байты
+            return gzip.GzipFile(path, mode, compresslevel=self.level, mtime=0)
+        return gzip.open(path, mode)
+
+    def compressor(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    suffix = ".zst"
+
+    def __init__(self, level: int = 3):
+        self.level = level
+
+    def open(self, path: str, mode: str) -> BinaryIO:
+        if _zstd is not None:
+            return _zstd.open(path, mode, level=self.level) if "w" in mode else _zstd.open(path, mode)
+        if "w" in mode:
+            return _zstandard.open(path, mode, cctx=_zstandard.ZstdCompressor(level=self.level))
+        return _zstandard.open(path, mode)
+
+    def compressor(self):
+        if _zstd is not None:
+            return _zstd.ZstdCompressor(level=self.level)
+        return _zstandard.ZstdCompressor(level=self.level).compressobj()
+
+
+IDENTITY = Codec()
+
+CODECS: Dict[str, Codec] = {"none": IDENTITY, "gzip": GzipCodec()}
+if _zstd is not None or _zstandard is not None:
+    CODECS["zstd"] = ZstdCodec()
+
+# Порядок поиска объекта на диске; объект мог быть записан при другой настройке
+STORED_CODECS = tuple(CODECS.values())
+
+# Предпочтение при выборе Content-Encoding для ответа
+WIRE_PREFERENCE = ("zstd", "gzip")
+
+
+def get_codec(name: str) -> Codec:
+    """Кодек по имени из настроек; zstd без библиотеки заменяется на gzip"""
+    if name == "zstd" and "zstd" not in CODECS:
+        print("⚠️  zstd недоступен (нужен Python 3.14 или пакет zstandard), используется gzip")
+        return CODECS["gzip"]
+    if name not in CODECS:
+        raise ValueError(f"Неизвестный формат сжатия: {name}")
+    return CODECS[name]
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Разбирает Accept-Encoding в словарь кодировка -> q"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        token, _, params = item.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[Codec]:
+    """Лучший доступный кодек из принимаемых клиентом или None (без сжатия)"""
+    accepted = accepted_encodings(accept_encoding)
+    for name in WIRE_PREFERENCE:
+        if name in CODECS and accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return CODECS[name]
+    return None
+
+
+def client_accepts(accept_encoding: Optional[str], codec: Codec) -> bool:
+    accepted = accepted_encodings(accept_encoding)
+    return accepted.get(codec.name, accepted.get("*", 0.0)) > 0
+
+
+def compress_stream(chunks: Iterable[bytes], codec: Codec) -> Iterator[bytes]:
+    """Сжимает поток кусков на лету, не собирая его целиком в памяти"""
+    compressor = codec.compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def acompress_stream(chunks: AsyncIterable[bytes], codec: Codec) -> AsyncIterator[bytes]:
+    """Асинхронный вариант compress_stream для потоков, читаемых через пул ввода-вывода"""
+    compressor = codec.compressor()
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,123 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from .local_storage import BLOB_NAME_RE, LocalStorage
+from .text_sidecars import SIDECAR_NAME_RE, TextSidecarStore
+from ..database.registry import WorksRegistry
+
+
+class BlobCollector:
+    """
+    Инкрементальная сборка мусора хранилища.
+
+    За один проход (run_once) обрабатывается не больше batch_size блобов
+    с нулевым счётчиком ссылок и shards_per_pass каталогов ab/cd, где
+    ищутся блобы без записи в таблице blobs (например, после прерванного
+    импорта), текстовые копии без блоба или устаревшей версии и старые
+    временные файлы. Удаляется только то, что не менялось дольше
+    grace_seconds: загрузка, повторно использующая блоб, обновляет его
+    mtime под той же блокировкой хэша, поэтому не теряет содержимое.
+    Блобы, арендованные через storage.pin (записанные идущим импортом),
+    не удаляются независимо от возраста.
+    """
+
+    def __init__(self, storage: LocalStorage, text_sidecars: TextSidecarStore, registry: WorksRegistry,
+                 grace_seconds: float = 600.0, batch_size: int = 100, shards_per_pass: int = 16):
+        self.storage = storage
+        self.text_sidecars = text_sidecars
+        self.registry = registry
+        self.grace_seconds = grace_seconds
+        self.batch_size = batch_size
+        self.shards_per_pass = shards_per_pass
+        self._pending_shards: List[str] = []
+        self.stats = {
+            "passes": 0,
+            "sweep_cycles": 0,
+            "blobs_reclaimed": 0,
+            "orphans_reclaimed": 0,
+            "sidecars_removed": 0,
+            "temp_files_removed": 0,
+            "skipped_recent": 0,
+            "bytes_reclaimed": 0
+        }
+
+    def _is_recent(self, path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) < self.grace_seconds
+        except FileNotFoundError:
+            return False
+
+    def _blob_is_recent(self, file_hash: str) -> bool:
+        located = self.storage.locate(file_hash)
+        return located is not None and self._is_recent(located[0])
+
+    def _remove_file(self, path: str, counter: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self.stats[counter] += 1
+        self.stats["bytes_reclaimed"] += size
+
+    def reclaim_unreferenced(self, cutoff: datetime) -> None:
+        """Блобы, на которые не ссылается ни одна работа дольше grace_seconds"""
+        for file_hash in self.registry.unreferenced_blobs(cutoff, self.batch_size):
+            with self.storage.hash_lock(file_hash):
+                if self._blob_is_recent(file_hash) or self.storage.is_pinned(file_hash):
+                    # Содержимое только что загружено снова — ссылка вот-вот появится
+                    self.stats["skipped_recent"] += 1
+                    continue
+                if not self.registry.drop_blob(file_hash, cutoff):
+                    continue
+                freed = self.storage.remove(file_hash) + self.text_sidecars.remove_all(file_hash)
+            self.stats["blobs_reclaimed"] += 1
+            self.stats["bytes_reclaimed"] += freed
+
+    def sweep_shard(self, shard_dir: str) -> None:
+        """Блобы без записи в реестре и лишние текстовые копии в одном каталоге ab/cd"""
+        try:
+            entries = list(os.scandir(shard_dir))
+        except FileNotFoundError:
+            return
+
+        for entry in entries:
+            blob_match = BLOB_NAME_RE.match(entry.name)
+            if blob_match:
+                file_hash = blob_match.group(1)
+                if self._is_recent(entry.path) or self.storage.is_pinned(file_hash) \
+                        or self.registry.has_blob(file_hash):
+                    continue
+                with self.storage.hash_lock(file_hash):
+                    if self._is_recent(entry.path) or self.storage.is_pinned(file_hash):
+                        continue
+                    freed = self.storage.remove(file_hash) + self.text_sidecars.remove_all(file_hash)
+                self.stats["orphans_reclaimed"] += 1
+                self.stats["bytes_reclaimed"] += freed
+                continue
+
+            sidecar_match = SIDECAR_NAME_RE.match(entry.name)
+            if sidecar_match and not self._is_recent(entry.path):
+                outdated = int(sidecar_match.group(2)) != self.text_sidecars.version
+                if outdated or not self.storage.exists(sidecar_match.group(1)):
+                    self._remove_file(entry.path, "sidecars_removed")
+
+    def run_once(self) -> dict:
+        """Один короткий проход; следующий продолжит обход каталогов с места остановки"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace_seconds)
+        self.reclaim_unreferenced(cutoff)
+
+        if not self._pending_shards:
+            self._pending_shards = list(self.storage.shard_dirs())
+            self.stats["sweep_cycles"] += 1
+            for temp_path in self.storage.temp_files():
+                if not self._is_recent(temp_path):
+                    self._remove_file(temp_path, "temp_files_removed")
+
+        for _ in range(min(self.shards_per_pass, len(self._pending_shards))):
+            self.sweep_shard(self._pending_shards.pop())
+
+        self.stats["passes"] += 1
+        return self.stats
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class OpStats:
+    """Счётчики одного вида операций: время ожидания в очереди и выполнения"""
+
+    __slots__ = ("count", "errors", "wait_total", "run_total", "run_max", "samples")
+
+    def __init__(self, sample_size: int):
+        self.count = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def record(self, wait: float, run: float, failed: bool) -> None:
+        self.count += 1
+        self.errors += failed
+        self.wait_total += wait
+        self.run_total += run
+        self.run_max = max(self.run_max, run)
+        self.samples.append(wait + run)
+
+    def to_dict(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_wait_ms": round(self.wait_total / self.count * 1000, 3) if self.count else 0.0,
+            "avg_run_ms": round(self.run_total / self.count * 1000, 3) if self.count else 0.0,
+            "max_run_ms": round(self.run_max * 1000, 3),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3)
+        }
+
+
+class IOExecutor:
+    """
+    Ограниченный пул потоков для файлового ввода-вывода и хэширования.
+
+    Блокирующие вызовы уходят из event loop в max_workers потоков, поэтому
+    медленная запись на диск не останавливает остальные запросы, а
+    параллельные загрузки выполняются одновременно. Число ожидающих
+    операций ограничено max_pending: при переполнении корутины ждут
+    свободного места, а не копят неограниченную очередь.
+    """
+
+    def __init__(self, max_workers: int = 8, max_pending: int = 64, sample_size: int = 1024):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.sample_size = sample_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-io")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._lock = threading.Lock()
+        self._ops: Dict[str, OpStats] = {}
+        self.submitted = 0
+        self.running = 0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Операции, отправленные в пул, но ещё не начатые"""
+        return self.submitted - self.running
+
+    async def run(self, fn: Callable[..., Any], *args, op: Optional[str] = None) -> Any:
+        """Выполняет fn(*args) в пуле и возвращает результат"""
+        name = op or getattr(fn, "__name__", "call")
+        # Место освобождается, когда операция завершилась в пуле, а не когда
+        # ожидающая корутина отменена: отменённые запросы не выводят число
+        # реально выполняемых операций за max_pending
+        await self._slots.acquire()
+        try:
+            enqueued = time.perf_counter()
+            with self._lock:
+                self.submitted += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+            def task():
+                started = time.perf_counter()
+                with self._lock:
+                    self.running += 1
+                failed = True
+                try:
+                    result = fn(*args)
+                    failed = False
+                    return result
+                finally:
+                    finished = time.perf_counter()
+                    with self._lock:
+                        self.running -= 1
+                        self.submitted -= 1
+                        stats = self._ops.get(name)
+                        if stats is None:
+                            stats = self._ops[name] = OpStats(self.sample_size)
+                        stats.record(started - enqueued, finished - started, failed)
+
+            future = asyncio.get_running_loop().run_in_executor(self._executor, task)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        # shield: отмена ожидающей корутины не снимает уже поставленную операцию,
+        # и счётчики очереди остаются согласованными
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.submitted,
+                "running": self.running,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "operations": {name: stats.to_dict() for name, stats in self._ops.items()}
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
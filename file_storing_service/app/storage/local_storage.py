@@ -1,41 +1,343 @@
 import os
 import hashlib
-from typing import Tuple
+import re
+import tempfile
+import threading
+from collections import Counter
+from typing import BinaryIO, Iterator, Optional, Tuple
+from fastapi import UploadFile
 from ..config import settings
+from .compression import IDENTITY, STORED_CODECS, Codec, get_codec
+from .io_executor import IOExecutor
+
+CHUNK_SIZE = 1024 * 1024  # Размер буфера при потоковой записи
+TEMP_PREFIX = ".upload-"
+SPOOL_LIMIT = CHUNK_SIZE  # Файлы до этого размера держатся в памяти до проверки хэша
+LOCK_STRIPES = 64
+BLOB_NAME_RE = re.compile(r"^([0-9a-f]{64})(\.gz|\.zst)?$")
+
+
+class FileTooLargeError(Exception):
+    """Файл превысил допустимый размер во время загрузки"""
+
+
+class HashMismatchError(Exception):
+    """Переданный клиентом хэш не совпал с хэшем содержимого"""
 
 
 class LocalStorage:
-    def __init__(self):
-        self.upload_dir = settings.upload_dir
+    """
+    Контентно-адресуемое хранилище: файл лежит по пути
+    upload_dir/ab/cd/<sha256>, где ab и cd — первые байты хэша.
+    Проверка существования и открытие по хэшу не требуют обхода каталога.
+
+    Сжимаемые файлы хранятся сжатыми (<sha256>.gz или .zst), уже сжатые
+    форматы (PDF, DOCX, архивы) — как есть. Хэш и размер всегда считаются
+    по исходному содержимому, open() распаковывает прозрачно.
+
+    Запись и удаление блоба идут под блокировкой его хэша; повторное
+    использование существующего блоба обновляет его mtime, поэтому
+    сборщик мусора не удалит только что загруженное содержимое.
+
+    Синхронные методы блокируют поток; из async-обработчиков их вызывают
+    через self.io (ограниченный пул потоков), async-методы делают это сами.
+    """
+
+    def __init__(self, upload_dir: Optional[str] = None, compression: Optional[str] = None,
+                 io: Optional[IOExecutor] = None):
+        self.upload_dir = upload_dir or settings.upload_dir
+        self.io = io or IOExecutor()
+        self.codec = get_codec(compression or settings.blob_compression)
+        self.incompressible = {ext.lower() for ext in settings.incompressible_extensions}
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._pins: Counter = Counter()
+        self._pins_lock = threading.Lock()
         os.makedirs(self.upload_dir, exist_ok=True)
 
+    def hash_lock(self, file_hash: str) -> threading.Lock:
+        """Блокировка блоба (общая для хэшей с одинаковым первым байтом)"""
+        return self._locks[int(file_hash[:2], 16) % LOCK_STRIPES]
+
+    def pin(self, file_hash: str) -> None:
+        """
+        Аренда блоба у сборщика мусора: пока она не снята, блоб не удаляется,
+        даже если ссылки в БД на него ещё нет (импорт регистрирует работы в конце).
+        """
+        with self._pins_lock:
+            self._pins[file_hash] += 1
+
+    def unpin(self, file_hash: str) -> None:
+        with self._pins_lock:
+            self._pins[file_hash] -= 1
+            if self._pins[file_hash] <= 0:
+                del self._pins[file_hash]
+
+    def is_pinned(self, file_hash: str) -> bool:
+        with self._pins_lock:
+            return file_hash in self._pins
+
+    def path_for(self, file_hash: str) -> str:
+        """Базовый путь блоба по его хэшу (без суффикса сжатия)"""
+        return os.path.join(self.upload_dir, file_hash[:2], file_hash[2:4], file_hash)
+
+    def codec_for(self, file_name: Optional[str]) -> Codec:
+        """Формат хранения по типу файла"""
+        extension = os.path.splitext(file_name or "")[1].lstrip(".").lower()
+        if extension in self.incompressible:
+            return IDENTITY
+        return self.codec
+
+    def locate(self, file_hash: str) -> Optional[Tuple[str, Codec]]:
+        """Фактический путь и формат блоба или None"""
+        base = self.path_for(file_hash)
+        for codec in STORED_CODECS:
+            if os.path.exists(base + codec.suffix):
+                return base + codec.suffix, codec
+        return None
+
+    def exists(self, file_hash: str) -> bool:
+        return self.locate(file_hash) is not None
+
+    async def alocate(self, file_hash: str) -> Optional[Tuple[str, Codec]]:
+        return await self.io.run(self.locate, file_hash, op="locate")
+
+    def open(self, file_hash: str) -> BinaryIO:
+        """Открывает блоб на чтение с распаковкой; FileNotFoundError, если его нет"""
+        located = self.locate(file_hash)
+        if located is None:
+            raise FileNotFoundError(f"File {file_hash} not found")
+        path, codec = located
+        return codec.open(path, "rb")
+
+    def reuse(self, file_hash: str) -> Optional[str]:
+        """Путь уже сохранённого блоба (с обновлённым mtime) или None"""
+        with self.hash_lock(file_hash):
+            located = self.locate(file_hash)
+            if located is None:
+                return None
+            os.utime(located[0])
+            return located[0]
+
+    def lease(self, file_hash: str) -> Optional[str]:
+        """Как reuse, но вдобавок арендует найденный блоб (pin); аренду снимает вызывающий"""
+        with self.hash_lock(file_hash):
+            located = self.locate(file_hash)
+            if located is None:
+                return None
+            os.utime(located[0])
+            self.pin(file_hash)
+            return located[0]
+
+    def _commit(self, temp_path: str, file_hash: str, codec: Codec) -> str:
+        """Атомарно перемещает временный файл на место блоба"""
+        with self.hash_lock(file_hash):
+            located = self.locate(file_hash)
+            if located is not None:
+                # Такое содержимое уже хранится
+                os.remove(temp_path)
+                os.utime(located[0])
+                return located[0]
+            file_path = self.path_for(file_hash) + codec.suffix
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(temp_path, file_path)
+            return file_path
+
+    def remove(self, file_hash: str) -> int:
+        """Удаляет блоб во всех форматах; возвращает освобождённые байты. Вызывать под hash_lock"""
+        freed = 0
+        base = self.path_for(file_hash)
+        for codec in STORED_CODECS:
+            try:
+                freed += os.path.getsize(base + codec.suffix)
+                os.remove(base + codec.suffix)
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def shard_dirs(self) -> Iterator[str]:
+        """Каталоги второго уровня ab/cd"""
+        with os.scandir(self.upload_dir) as level1:
+            for first in level1:
+                if not first.is_dir(follow_symlinks=False) or first.name.startswith("."):
+                    continue
+                with os.scandir(first.path) as level2:
+                    for second in level2:
+                        if second.is_dir(follow_symlinks=False):
+                            yield second.path
+
+    def temp_files(self) -> Iterator[str]:
+        """Временные файлы незавершённых загрузок"""
+        with os.scandir(self.upload_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(TEMP_PREFIX) and entry.is_file(follow_symlinks=False):
+                    yield entry.path
+
+    def _temp_path(self) -> str:
+        fd, temp_path = tempfile.mkstemp(dir=self.upload_dir, prefix=TEMP_PREFIX)
+        os.close(fd)
+        return temp_path
+
     def save_file(self, file_content: bytes, file_name: str) -> Tuple[str, str]:
         """Сохраняет файл и возвращает путь и хэш"""
-        # Создаем уникальное имя файла
-        file_hash = hashlib.sha256(file_content).hexdigest()
-        extension = os.path.splitext(file_name)[1]
-        unique_name = f"{file_hash}{extension}"
+        with self._begin(file_name) as blob:
+            blob.write(file_content)
+            file_path, file_hash, _ = blob.commit()
+        return file_path, file_hash
 
-        # Сохраняем файл
-        file_path = os.path.join(self.upload_dir, unique_name)
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+    def _begin(self, file_name: Optional[str], max_size: Optional[int] = None,
+               expected_hash: Optional[str] = None, verify: bool = True) -> "PendingBlob":
+        return PendingBlob(self, self.codec_for(file_name), max_size,
+                           expected_hash=expected_hash, verify=verify)
 
-        return file_path, file_hash
+    async def save_upload(self, upload: UploadFile, file_name: str, max_size: Optional[int] = None,
+                          expected_hash: Optional[str] = None, verify: bool = True) -> Tuple[str, str, int]:
+        """
+        Потоково сохраняет загружаемый файл: чанки пишутся (со сжатием, если
+        тип файла сжимаемый) во временный файл с одновременным подсчётом
+        SHA-256 исходных байтов, затем файл атомарно переименовывается.
+        В памяти находится только один буфер; event loop не блокируется.
+        Возвращает путь, хэш и размер.
+
+        Starlette к этому моменту уже принял всё тело multipart, поэтому
+        max_size ограничивает размер сохраняемого файла, а не приём:
+        размер запроса целиком ограничивает BodySizeLimitMiddleware.
+
+        expected_hash — хэш, уже посчитанный отправителем (шлюзом). С verify
+        он сверяется с содержимым (HashMismatchError при расхождении), без
+        verify принимается на веру и содержимое не хэшируется повторно. Если
+        блоб с таким хэшем уже есть, тело только дочитывается, без записи на диск.
+        """
+        blob = await self.io.run(self._begin, file_name, max_size, expected_hash, verify, op="begin")
+        try:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                # Хэширование, сжатие и запись — в пуле ввода-вывода
+                await self.io.run(blob.write, chunk, op="write")
+            return await self.io.run(blob.commit, op="commit")
+        finally:
+            if not blob.committed:
+                await self.io.run(blob.discard, op="discard")
 
-    def get_file(self, file_name: str) -> bytes:
-        """Получает содержимое файла"""
-        file_path = os.path.join(self.upload_dir, file_name)
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File {file_name} not found")
+    def save_stream(self, stream: BinaryIO, file_name: str, max_size: Optional[int] = None,
+                    pin: bool = False) -> Tuple[str, str, int]:
+        """
+        Синхронный вариант save_upload для файловых объектов (например, записей
+        архива). С pin блоб арендуется (pin) под блокировкой его хэша сразу после
+        записи — вызывающий снимает аренду через unpin.
+        """
+        with self._begin(file_name, max_size) as blob:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                blob.write(chunk)
+            file_path, file_hash, size = blob.commit()
+        if pin:
+            with self.hash_lock(file_hash):
+                if self.locate(file_hash) is None:
+                    raise FileNotFoundError(f"Blob {file_hash} disappeared before it was pinned")
+                self.pin(file_hash)
+        return file_path, file_hash, size
 
-        with open(file_path, "rb") as f:
+    def get_file(self, file_hash: str) -> bytes:
+        """Получает содержимое файла по хэшу"""
+        with self.open(file_hash) as f:
             return f.read()
 
     def file_exists(self, file_hash: str) -> bool:
         """Проверяет существует ли файл с таким хэшем"""
-        # Ищем файл по хэшу в имени
-        for file in os.listdir(self.upload_dir):
-            if file_hash in file:
-                return True
-        return False
\ No newline at end of file
+        return self.exists(file_hash)
+
+
+class PendingBlob:
+    """
+    Блоб в процессе записи: хэш и размер исходных байтов. Небольшой файл
+    (до spool_limit) копится в памяти и при совпадении хэша с уже
+    хранимым блобом вообще не пишется на диск; больший сбрасывается во
+    временный файл. Если заранее известный хэш (expected_hash) совпадает с
+    уже хранимым блобом, тело только дочитывается (и с verify хэшируется)
+    без записи, какого бы размера оно ни было. Без commit() временный файл
+    удаляется при выходе.
+    """
+
+    def __init__(self, storage: LocalStorage, codec: Codec, max_size: Optional[int] = None,
+                 spool_limit: int = SPOOL_LIMIT, expected_hash: Optional[str] = None, verify: bool = True):
+        self.storage = storage
+        self.codec = codec
+        self.max_size = max_size
+        self.spool_limit = spool_limit
+        self.expected_hash = expected_hash
+        trusted = expected_hash is not None and not verify
+        self.hasher = None if trusted else hashlib.sha256()
+        # Блоб с объявленным хэшем уже хранится: арендуем его, чтобы сборщик
+        # мусора не удалил блоб, пока дочитывается тело запроса
+        self.known = expected_hash is not None and storage.lease(expected_hash) is not None
+        self.size = 0
+        self.temp_path: Optional[str] = None
+        self._buffer = bytearray()
+        self._file: Optional[BinaryIO] = None
+        self.committed = False
+
+    def _spill(self) -> None:
+        """Переходит от буфера в памяти к временному файлу"""
+        self.temp_path = self.storage._temp_path()
+        self._file = self.codec.open(self.temp_path, "wb")
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise FileTooLargeError(f"File size exceeds {self.max_size} bytes")
+        if self.hasher is not None:
+            self.hasher.update(chunk)
+        if self.known:
+            return
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+        self._buffer += chunk
+        if len(self._buffer) > self.spool_limit:
+            self._spill()
+
+    def commit(self) -> Tuple[str, str, int]:
+        """Переносит содержимое на место блоба; возвращает путь, хэш и размер"""
+        if self.hasher is None:
+            file_hash = self.expected_hash
+        else:
+            file_hash = self.hasher.hexdigest()
+            if self.expected_hash is not None and file_hash != self.expected_hash:
+                raise HashMismatchError(f"Content hash {file_hash} does not match {self.expected_hash}")
+        if self.known:
+            # Блоб арендован с начала записи, так что он на месте; дальше его,
+            # как и любой переиспользованный блоб, защищает свежий mtime
+            existing = self.storage.locate(file_hash)[0]
+            self.discard()
+            self.committed = True
+            return existing, file_hash, self.size
+        if self._file is None:
+            # Дубликат небольшого файла стоит только обновления mtime
+            existing = self.storage.reuse(file_hash)
+            if existing is not None:
+                self.committed = True
+                return existing, file_hash, self.size
+            self._spill()
+        self._file.close()
+        file_path = self.storage._commit(self.temp_path, file_hash, self.codec)
+        self.committed = True
+        return file_path, file_hash, self.size
+
+    def discard(self) -> None:
+        """Снимает аренду известного блоба, закрывает и удаляет временный файл незавершённой записи"""
+        if self.known:
+            self.storage.unpin(self.expected_hash)
+            self.known = False
+        if self._file is not None:
+            self._file.close()
+        if self.temp_path is not None and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __enter__(self) -> "PendingBlob":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.discard()
@@ -0,0 +1,131 @@
+"""
+Перенос файлов из плоского каталога uploads/ ({hash}{ext} или
+{hash}_{filename}) в шардированную раскладку upload_dir/ab/cd/<sha256>.
+Работы в БД переводятся на новые пути в том же проходе. Запускать при
+остановленном сервисе: его индексы в памяти читаются из БД при старте.
+
+Запуск из каталога file_storing_service:
+    python -m app.storage.migrate
+    python -m app.storage.migrate --upload-dir ./uploads --dry-run
+"""
+import argparse
+import hashlib
+import os
+from typing import Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, sessionmaker
+
+from .local_storage import CHUNK_SIZE, TEMP_PREFIX, LocalStorage
+from ..database.connection import SessionLocal, engine
+from ..database.migrations import upgrade_schema
+from ..models.work import Work
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def relink_works(db: Session, flat_name: str, file_hash: str, new_path: str) -> int:
+    """
+    Переводит на new_path работы, ссылавшиеся на плоский файл flat_name
+    или на то же содержимое. Возвращает число изменённых записей.
+    """
+    works = db.query(Work).filter(or_(Work.file_hash == file_hash, Work.file_path.endswith(flat_name))).all()
+    relinked = 0
+    for work in works:
+        if work.file_hash != file_hash and os.path.basename(work.file_path) != flat_name:
+            continue  # Совпал только суффикс имени
+        if work.file_hash != file_hash:
+            print(f"⚠️  Работа {work.id}: file_hash {work.file_hash} не совпадает с содержимым {file_hash}")
+        if work.file_path != new_path:
+            work.file_path = new_path
+            relinked += 1
+    return relinked
+
+
+def repair_links(db: Session, storage: LocalStorage) -> int:
+    """Работы с несуществующим file_path, содержимое которых есть в хранилище (прерванный перенос)"""
+    relinked = 0
+    for work in db.query(Work).all():
+        if os.path.exists(work.file_path):
+            continue
+        located = storage.locate(work.file_hash)
+        if located is not None:
+            work.file_path = located[0]
+            relinked += 1
+    return relinked
+
+
+def move_flat_file(storage: LocalStorage, entry: os.DirEntry, summary: dict, dry_run: bool) -> Tuple[str, str]:
+    """Переносит один плоский файл; возвращает хэш содержимого и путь блоба"""
+    # Имя содержит хэш, но адрес определяется только содержимым
+    file_hash = file_sha256(entry.path)
+    if not entry.name.startswith(file_hash):
+        summary["renamed_by_content"] += 1
+        print(f"⚠️  {entry.name}: хэш в имени не совпадает с содержимым, используется {file_hash}")
+
+    located = storage.locate(file_hash)
+    if located is not None:
+        summary["duplicates"] += 1
+        if not dry_run:
+            os.remove(entry.path)
+        return file_hash, located[0]
+
+    # Плоские файлы переносятся без сжатия — хранилище читает оба формата
+    target = storage.path_for(file_hash)
+    summary["moved"] += 1
+    if not dry_run:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(entry.path, target)
+    return file_hash, target
+
+
+def migrate(storage: LocalStorage, dry_run: bool = False, session_factory: sessionmaker = SessionLocal) -> dict:
+    """Переносит все файлы верхнего уровня каталога в шардированные пути и обновляет file_path работ"""
+    summary = {"moved": 0, "duplicates": 0, "renamed_by_content": 0, "skipped": 0, "relinked": 0}
+
+    with os.scandir(storage.upload_dir) as entries:
+        flat_files = [entry for entry in entries if entry.is_file(follow_symlinks=False)]
+
+    with session_factory() as db:
+        for entry in flat_files:
+            if entry.name.startswith(TEMP_PREFIX) or entry.name.startswith("."):
+                summary["skipped"] += 1
+                continue
+
+            file_hash, blob_path = move_flat_file(storage, entry, summary, dry_run)
+            # Пути работ фиксируются сразу после переноса файла
+            summary["relinked"] += relink_works(db, entry.name, file_hash, blob_path)
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+
+        if not dry_run:
+            summary["relinked"] += repair_links(db, storage)
+            db.commit()
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upload-dir", default=None, help="каталог хранилища (по умолчанию из настроек)")
+    parser.add_argument("--dry-run", action="store_true", help="только показать, что будет сделано")
+    args = parser.parse_args()
+
+    # Запросы к works идут по текущей модели — старой БД сначала нужны новые столбцы
+    upgrade_schema(engine)
+    summary = migrate(LocalStorage(args.upload_dir), dry_run=args.dry_run)
+    print(f"Перенесено: {summary['moved']}, дубликатов удалено: {summary['duplicates']}, "
+          f"переименовано по содержимому: {summary['renamed_by_content']}, пропущено: {summary['skipped']}, "
+          f"путей работ обновлено: {summary['relinked']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import re
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from .compression import IDENTITY, Codec, client_accepts
+from .local_storage import CHUNK_SIZE, LocalStorage
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Блоб по хэшу никогда не меняется — его можно кэшировать без ревалидации
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Ответ по id работы кэшируется, но перепроверяется через If-None-Match
+REVALIDATE_CACHE = "private, no-cache"
+
+
+def etag_for(file_hash: str, codec: Codec = IDENTITY) -> str:
+    """
+    ETag блоба — его SHA-256, он уже известен без чтения файла.
+    Сжатое представление получает свой ETag с именем кодировки.
+    """
+    if codec is IDENTITY:
+        return f'"{file_hash}"'
+    return f'"{file_hash}-{codec.name}"'
+
+
+def etag_matches(if_none_match: Optional[str], *etags: str) -> bool:
+    """Проверка If-None-Match (слабое сравнение, список или *)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in etags:
+            return True
+    return False
+
+
+async def _iter_decompressed(storage: LocalStorage, file_hash: str) -> AsyncIterator[bytes]:
+    f = await storage.io.run(storage.open, file_hash, op="open")
+    try:
+        while True:
+            chunk = await storage.io.run(f.read, CHUNK_SIZE, op="read")
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await storage.io.run(f.close, op="close")
+
+
+def _content_disposition(file_name: str) -> str:
+    return f"attachment; filename*=utf-8''{quote(file_name)}"
+
+
+async def blob_response(request: Request, storage: LocalStorage, file_hash: str,
+                  file_name: Optional[str] = None, cache_control: str = REVALIDATE_CACHE) -> Response:
+    """
+    Отдаёт блоб с поддержкой условных запросов и Range.
+
+    If-None-Match с тем же хэшем даёт 304 без чтения файла. Несжатый блоб
+    отдаёт FileResponse: Range (в том числе несколько диапазонов и If-Range
+    по нашему ETag) обрабатывает Starlette, а если сервер поддерживает
+    расширение http.response.pathsend, тело передаётся без копирования
+    через процесс приложения.
+
+    Сжатый блоб отдаётся как есть с Content-Encoding, если клиент принимает
+    эту кодировку, иначе распаковывается потоково. Range для сжатых блобов
+    не поддерживается (Accept-Ranges: none) — в них хранится только текст,
+    который читают целиком.
+    """
+    located = await storage.alocate(file_hash) if SHA256_RE.match(file_hash) else None
+    if located is None:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    path, codec = located
+
+    etag = etag_for(file_hash)
+    encoded_etag = etag_for(file_hash, codec)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if codec is not IDENTITY:
+        headers["Vary"] = "Accept-Encoding"
+        headers["Accept-Ranges"] = "none"
+
+    if etag_matches(request.headers.get("if-none-match"), etag, encoded_etag):
+        return Response(status_code=304, headers=headers)
+
+    if codec is IDENTITY:
+        return FileResponse(path=path, filename=file_name,
+                            media_type="application/octet-stream", headers=headers)
+
+    if client_accepts(request.headers.get("accept-encoding"), codec) and "range" not in request.headers:
+        # Сжатые байты уходят с диска без распаковки и повторного сжатия
+        headers.update({"ETag": encoded_etag, "Content-Encoding": codec.name})
+        return FileResponse(path=path, filename=file_name,
+                            media_type="application/octet-stream", headers=headers)
+
+    if file_name:
+        headers["Content-Disposition"] = _content_disposition(file_name)
+    return StreamingResponse(_iter_decompressed(storage, file_hash),
+                             media_type="application/octet-stream", headers=headers)
@@ -0,0 +1,67 @@
+import re
+import unicodedata
+from typing import BinaryIO
+
+# Версия извлечения: при изменении парсеров или нормализации увеличивается,
+# и старые текстовые копии перестают использоваться
+EXTRACTOR_VERSION = 1
+
+CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+TRAILING_SPACES_RE = re.compile(r"[ \t]+\n")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class ExtractionError(Exception):
+    """Текст не удалось извлечь (повреждённый файл или нет парсера)"""
+
+
+def _extract_pdf(blob: BinaryIO) -> str:
+    # Пробуем PyPDF2, при пустом результате — pdfplumber
+    import PyPDF2
+    reader = PyPDF2.PdfReader(blob)
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    if text.strip():
+        return text
+
+    import pdfplumber
+    blob.seek(0)
+    with pdfplumber.open(blob) as pdf:
+        return "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+
+def _extract_docx(blob: BinaryIO) -> str:
+    import docx
+    document = docx.Document(blob)
+    return "\n".join(paragraph.text for paragraph in document.paragraphs if paragraph.text)
+
+
+def _extract_plain(blob: BinaryIO) -> str:
+    return blob.read().decode("utf-8", errors="ignore")
+
+
+def normalize_extracted(text: str) -> str:
+    """Приводит текст к единому виду: NFC, \\n, без управляющих символов и лишних пустых строк"""
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = CONTROL_CHARS_RE.sub("", text)
+    text = TRAILING_SPACES_RE.sub("\n", text)
+    text = BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def extract_text(blob: BinaryIO, file_name: str) -> str:
+    """
+    Извлекает и нормализует текст открытого файла по расширению имени.
+    Неизвестные форматы читаются как UTF-8. При ошибке — ExtractionError.
+    """
+    name = file_name.lower()
+    try:
+        if name.endswith(".pdf"):
+            text = _extract_pdf(blob)
+        elif name.endswith((".doc", ".docx")):
+            text = _extract_docx(blob)
+        else:
+            text = _extract_plain(blob)
+    except Exception as e:
+        raise ExtractionError(f"{file_name}: {e}") from e
+    return normalize_extracted(text)
@@ -0,0 +1,113 @@
+import os
+import re
+import tempfile
+from typing import Optional, Tuple
+
+from ..config import settings
+from .compression import STORED_CODECS, Codec, get_codec
+from .local_storage import TEMP_PREFIX, LocalStorage
+from .text_extraction import EXTRACTOR_VERSION, ExtractionError, extract_text, normalize_extracted
+
+SIDECAR_NAME_RE = re.compile(r"^([0-9a-f]{64})\.text-v(\d+)(\.gz|\.zst)?$")
+
+
+class TextSidecarStore:
+    """
+    Извлечённый текст хранится рядом с блобом: upload_dir/ab/cd/<sha256>.text-v<N>
+    с суффиксом сжатия (.gz, .zst), где N — версия извлечения. Текст
+    извлекается один раз на содержимое (дубликаты разделяют одну копию);
+    повторный анализ и массовая выдача текстов читают готовый файл и не
+    разбирают PDF/DOCX заново.
+    """
+
+    def __init__(self, storage: LocalStorage, version: int = EXTRACTOR_VERSION,
+                 compression: Optional[str] = None):
+        self.storage = storage
+        self.version = version
+        self.codec = get_codec(compression or settings.text_compression)
+
+    def path_for(self, file_hash: str) -> str:
+        """Базовый путь текстовой копии (без суффикса сжатия)"""
+        return f"{self.storage.path_for(file_hash)}.text-v{self.version}"
+
+    def locate(self, file_hash: str) -> Optional[Tuple[str, Codec]]:
+        """Фактический путь и формат копии или None"""
+        base = self.path_for(file_hash)
+        for codec in STORED_CODECS:
+            if os.path.exists(base + codec.suffix):
+                return base + codec.suffix, codec
+        return None
+
+    def exists(self, file_hash: str) -> bool:
+        return self.locate(file_hash) is not None
+
+    def read(self, file_hash: str) -> Optional[str]:
+        """Готовый текст или None, если копии текущей версии нет"""
+        located = self.locate(file_hash)
+        if located is None:
+            return None
+        path, codec = located
+        with codec.open(path, "rb") as f:
+            return f.read().decode("utf-8")
+
+    def write(self, file_hash: str, text: str) -> None:
+        """Атомарно записывает (сжатую) текстовую копию"""
+        path = self.path_for(file_hash) + self.codec.suffix
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TEMP_PREFIX)
+        os.close(fd)
+        try:
+            with self.codec.open(temp_path, "wb") as f:
+                f.write(text.encode("utf-8"))
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def remove_all(self, file_hash: str) -> int:
+        """Удаляет текстовые копии блоба всех версий; возвращает освобождённые байты"""
+        shard_dir = os.path.dirname(self.storage.path_for(file_hash))
+        freed = 0
+        try:
+            entries = list(os.scandir(shard_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            match = SIDECAR_NAME_RE.match(entry.name)
+            if match and match.group(1) == file_hash:
+                freed += entry.stat().st_size
+                os.remove(entry.path)
+        return freed
+
+    def ensure(self, file_hash: str, file_name: str) -> str:
+        """
+        Текст блоба: из готовой копии или извлечённый и сохранённый сейчас.
+        Если извлечь не удалось, возвращается пустая строка и копия не
+        записывается — следующая попытка (например, после установки
+        парсера) повторит извлечение.
+        """
+        text = self.read(file_hash)
+        if text is not None:
+            return text
+        if not self.storage.exists(file_hash):
+            return ""
+
+        try:
+            with self.storage.open(file_hash) as blob:
+                text = extract_text(blob, file_name)
+        except ExtractionError as e:
+            print(f"⚠️  Не удалось извлечь текст {e}")
+            return ""
+
+        self.write(file_hash, text)
+        return text
+
+    def adopt(self, file_hash: str, text: str) -> str:
+        """
+        Сохраняет текст, уже извлечённый отправителем (шлюзом), вместо
+        повторного разбора файла. Текст нормализуется так же, как свой.
+        """
+        text = normalize_extracted(text)
+        self.write(file_hash, text)
+        return text
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте app.config: отдельные БД и каталог хранилища на прогон тестов
+_root = tempfile.mkdtemp(prefix="file-storing-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_root, 'file_storage.db')}")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_root, "uploads"))
+os.environ.setdefault("GC_INTERVAL_SECONDS", "0")
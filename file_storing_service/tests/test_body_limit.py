@@ -0,0 +1,65 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.body_limit import MB, BodySizeLimitMiddleware
+
+
+def make_client(limit: int) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/upload": limit})
+    received = {}
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        received["size"] = len(await file.read())
+        return {"size": received["size"]}
+
+    @app.post("/other")
+    async def other(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    client = TestClient(app)
+    client.received = received
+    return client
+
+
+def test_declared_length_over_limit_is_rejected_before_handler():
+    client = make_client(MB)
+    response = client.post("/upload", files={"file": ("a.txt", b"x" * (2 * MB))})
+    assert response.status_code == 413
+    assert "size" not in client.received
+
+
+def test_streamed_body_without_length_is_cut_off():
+    client = make_client(MB)
+    boundary = "limit-test"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.txt\"\r\n"
+            f"Content-Type: text/plain\r\n\r\n").encode()
+
+    def body():
+        yield head
+        for _ in range(4):
+            yield b"x" * (MB // 2)
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = client.post("/upload", content=body(),
+                           headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 413
+    assert "size" not in client.received
+
+
+def test_small_bodies_and_other_paths_pass():
+    client = make_client(MB)
+    assert client.post("/upload", files={"file": ("a.txt", b"x" * 1000)}).json() == {"size": 1000}
+    assert client.post("/other", files={"file": ("a.txt", b"x" * (2 * MB))}).json() == {"size": 2 * MB}
+
+
+def test_rejection_carries_cors_headers():
+    from app.config import settings
+    from app.main import app
+
+    client = TestClient(app)
+    response = client.post("/upload", files={"file": ("a.txt", b"x" * ((settings.max_upload_request_mb + 1) * MB))},
+                           headers={"Origin": "http://localhost:8000"})
+    assert response.status_code == 413
+    assert "access-control-allow-origin" in response.headers
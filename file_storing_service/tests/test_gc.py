@@ -0,0 +1,125 @@
+import zipfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.connection import Base
+from app.database.registry import WorksRegistry
+from app.models.blob import Blob
+from app.storage.bulk_import import BulkImporter
+from app.storage.gc import BlobCollector
+from app.storage.local_storage import LocalStorage
+from app.storage.text_sidecars import TextSidecarStore
+
+
+@pytest.fixture
+def env(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'works.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    sidecars = TextSidecarStore(storage)
+    registry = WorksRegistry(session_factory)
+    # grace_seconds=0: всё, что не защищено ссылкой или арендой, собирается сразу
+    collector = BlobCollector(storage, sidecars, registry, grace_seconds=0)
+    return storage, sidecars, registry, collector, session_factory
+
+
+def store_work(storage, registry, content: bytes, student: str) -> dict:
+    file_path, file_hash = storage.save_file(content, "essay.txt")
+    return registry.create(student_name=student, assignment_id="hw_1", file_name="essay.txt",
+                           file_hash=file_hash, file_path=file_path, file_size=len(content))
+
+
+def ref_count(session_factory, file_hash: str):
+    with session_factory() as db:
+        blob = db.get(Blob, file_hash)
+        return None if blob is None else blob.ref_count
+
+
+def test_blob_is_reclaimed_only_after_last_reference_is_deleted(env):
+    storage, _, registry, collector, session_factory = env
+    first = store_work(storage, registry, b"shared essay", "a")
+    second = store_work(storage, registry, b"shared essay", "b")
+    file_hash = first["file_hash"]
+    assert ref_count(session_factory, file_hash) == 2
+
+    registry.delete(first["id"])
+    collector.run_once()
+    assert ref_count(session_factory, file_hash) == 1
+    assert storage.exists(file_hash)
+
+    registry.delete(second["id"])
+    collector.run_once()
+    assert ref_count(session_factory, file_hash) is None
+    assert not storage.exists(file_hash)
+    assert collector.stats["blobs_reclaimed"] == 1
+
+
+def test_reuploaded_content_is_referenced_again(env):
+    storage, _, registry, collector, session_factory = env
+    work = store_work(storage, registry, b"essay", "a")
+    registry.delete(work["id"])
+    again = store_work(storage, registry, b"essay", "b")
+
+    collector.run_once()
+    assert ref_count(session_factory, again["file_hash"]) == 1
+    assert storage.exists(again["file_hash"])
+
+
+def test_orphan_blob_is_swept_unless_pinned(env):
+    storage, _, _, collector, _ = env
+    _, file_hash = storage.save_file(b"orphan", "essay.txt")
+
+    storage.pin(file_hash)
+    collector.run_once()
+    assert storage.exists(file_hash)
+
+    storage.unpin(file_hash)
+    collector.run_once()
+    assert not storage.exists(file_hash)
+    assert collector.stats["orphans_reclaimed"] == 1
+
+
+def make_archive(path, files):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def test_import_keeps_blobs_through_gc_until_works_are_registered(env, tmp_path):
+    storage, sidecars, registry, collector, session_factory = env
+    archive = make_archive(tmp_path / "hw.zip", {"Иванов/essay.txt": "первое эссе", "Петров/essay.txt": "второе эссе",
+                                                 "Сидоров/essay.txt": "первое эссе"})
+    importer = BulkImporter(storage, sidecars, registry)
+
+    events = importer.run(archive, "hw_1")
+    stored = []
+    for event in events:
+        if event["event"] == "entry":
+            stored.append(event["file_hash"])
+            # Сборка мусора посреди импорта: ссылок в БД ещё нет
+            collector.run_once()
+            assert all(storage.exists(file_hash) for file_hash in stored)
+        if event["event"] == "done":
+            assert event["created"] == 3
+
+    assert not storage._pins
+    collector.run_once()
+    assert all(storage.exists(file_hash) for file_hash in stored)
+    assert ref_count(session_factory, stored[0]) == 2
+
+
+def test_abandoned_import_releases_its_leases(env, tmp_path):
+    storage, sidecars, registry, collector, _ = env
+    archive = make_archive(tmp_path / "hw.zip", {"Иванов/essay.txt": "эссе", "Петров/essay.txt": "другое"})
+    events = BulkImporter(storage, sidecars, registry).run(archive, "hw_1")
+    next(events)
+    file_hash = next(events)["file_hash"]
+    events.close()
+
+    assert not storage._pins
+    collector.run_once()
+    assert not storage.exists(file_hash)
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+from app.storage.io_executor import IOExecutor
+
+
+def test_cancelled_caller_keeps_slot_until_operation_finishes():
+    executor = IOExecutor(max_workers=2, max_pending=1)
+    release = threading.Event()
+    started = []
+
+    async def run():
+        first = asyncio.ensure_future(executor.run(release.wait, op="blocked"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)
+
+        second = asyncio.ensure_future(executor.run(started.append, "second", op="second"))
+        await asyncio.sleep(0.1)
+        # Первая операция ещё идёт в пуле — вторая ждёт места
+        assert started == []
+        assert executor.stats()["in_flight"] == 1
+
+        release.set()
+        await asyncio.wait_for(second, timeout=5)
+        assert started == ["second"]
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
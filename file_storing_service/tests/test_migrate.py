@@ -0,0 +1,81 @@
+import hashlib
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.connection import Base
+from app.models.work import Work
+from app.storage.local_storage import LocalStorage
+from app.storage.migrate import migrate
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'works.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def add_flat_work(db, upload_dir, content: bytes, name: str = None) -> Work:
+    file_hash = hashlib.sha256(content).hexdigest()
+    path = os.path.join(upload_dir, name or f"{file_hash}.txt")
+    with open(path, "wb") as f:
+        f.write(content)
+    work = Work(student_name="Иванов", assignment_id="hw_1", file_name="essay.txt",
+                file_hash=file_hash, file_path=path, file_size=len(content))
+    db.add(work)
+    db.commit()
+    return work
+
+
+def test_migrate_moves_files_and_updates_work_paths(tmp_path, session_factory):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    with session_factory() as db:
+        first = add_flat_work(db, storage.upload_dir, b"first essay")
+        # Тот же текст вторым плоским файлом со старым форматом имени
+        duplicate = add_flat_work(db, storage.upload_dir, b"first essay",
+                                  name=f"{hashlib.sha256(b'first essay').hexdigest()}_copy.txt")
+        first_id, duplicate_id, file_hash = first.id, duplicate.id, first.file_hash
+
+    summary = migrate(storage, session_factory=session_factory)
+
+    assert summary["moved"] == 1
+    assert summary["duplicates"] == 1
+    assert summary["relinked"] == 2
+    assert not [name for name in os.listdir(storage.upload_dir) if name.endswith(".txt")]
+    with session_factory() as db:
+        for work_id in (first_id, duplicate_id):
+            work = db.get(Work, work_id)
+            assert work.file_path == storage.path_for(file_hash)
+            assert os.path.exists(work.file_path)
+
+
+def test_dry_run_changes_nothing(tmp_path, session_factory):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    with session_factory() as db:
+        work = add_flat_work(db, storage.upload_dir, b"essay")
+        work_id, old_path = work.id, work.file_path
+
+    summary = migrate(storage, dry_run=True, session_factory=session_factory)
+
+    assert summary["moved"] == 1
+    assert summary["relinked"] == 1
+    assert os.path.exists(old_path)
+    with session_factory() as db:
+        assert db.get(Work, work_id).file_path == old_path
+
+
+def test_interrupted_migration_is_repaired(tmp_path, session_factory):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    with session_factory() as db:
+        work = add_flat_work(db, storage.upload_dir, b"essay")
+        work_id, file_hash, old_path = work.id, work.file_hash, work.file_path
+    # Файл перенесён, а запись в БД не успела обновиться
+    os.makedirs(os.path.dirname(storage.path_for(file_hash)))
+    os.replace(old_path, storage.path_for(file_hash))
+
+    assert migrate(storage, session_factory=session_factory)["relinked"] == 1
+    with session_factory() as db:
+        assert db.get(Work, work_id).file_path == storage.path_for(file_hash)
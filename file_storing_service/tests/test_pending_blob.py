@@ -0,0 +1,55 @@
+import hashlib
+import os
+
+import pytest
+
+from app.storage.local_storage import HashMismatchError, LocalStorage, PendingBlob
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path / "uploads"))
+
+
+def write_all(blob: PendingBlob, content: bytes, chunk: int = 1000) -> None:
+    for start in range(0, len(content), chunk):
+        blob.write(content[start:start + chunk])
+
+
+@pytest.mark.parametrize("verify", [True, False])
+def test_known_duplicate_over_spool_limit_is_not_written(storage, verify, monkeypatch):
+    content = os.urandom(10_000)
+    file_path, file_hash = storage.save_file(content, "data.bin")
+    monkeypatch.setattr(storage, "_temp_path", lambda: pytest.fail("duplicate spilled to a temp file"))
+
+    with PendingBlob(storage, storage.codec_for("data.bin"), spool_limit=1000,
+                     expected_hash=file_hash, verify=verify) as blob:
+        assert storage.is_pinned(file_hash)
+        write_all(blob, content)
+        assert blob.commit() == (file_path, file_hash, len(content))
+    assert not storage.is_pinned(file_hash)
+
+
+def test_known_hash_is_still_verified(storage):
+    content = os.urandom(10_000)
+    _, file_hash = storage.save_file(content, "data.bin")
+
+    with PendingBlob(storage, storage.codec_for("data.bin"), spool_limit=1000,
+                     expected_hash=file_hash, verify=True) as blob:
+        write_all(blob, content[::-1])
+        with pytest.raises(HashMismatchError):
+            blob.commit()
+    assert not storage.is_pinned(file_hash)
+
+
+def test_unknown_hash_spills_and_commits(storage):
+    content = os.urandom(10_000)
+    file_hash = hashlib.sha256(content).hexdigest()
+
+    with PendingBlob(storage, storage.codec_for("data.bin"), spool_limit=1000,
+                     expected_hash=file_hash, verify=True) as blob:
+        write_all(blob, content)
+        assert blob.temp_path is not None
+        _, committed_hash, size = blob.commit()
+    assert (committed_hash, size) == (file_hash, len(content))
+    assert storage.get_file(file_hash) == content
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.connection import Base
+from app.database.registry import WorksRegistry
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'works.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def add_work(registry: WorksRegistry, number: int, file_hash: str = None) -> dict:
+    return registry.create(student_name=f"student{number}", assignment_id="hw_1", file_name=f"{number}.txt",
+                           file_hash=file_hash or f"{number:064x}", file_path=f"/tmp/{number}", file_size=10)
+
+
+def collect_pages(registry: WorksRegistry, limit: int) -> list:
+    ids, after = [], 0
+    while True:
+        works, has_more = registry.page(after, limit)
+        ids.extend(work["id"] for work in works)
+        if not has_more:
+            return ids
+        after = works[-1]["id"]
+
+
+def test_keyset_pages_cover_every_live_work_once(session_factory):
+    registry = WorksRegistry(session_factory)
+    created = [add_work(registry, number)["id"] for number in range(1, 12)]
+    registry.delete(created[4])
+
+    expected = [work_id for work_id in created if work_id != created[4]]
+    for limit in (1, 3, 10, 100):
+        assert collect_pages(registry, limit) == expected
+    assert registry.page(created[-1], 5) == ([], False)
+
+
+def test_change_feed_reports_updates_and_tombstones_in_order(session_factory):
+    registry = WorksRegistry(session_factory)
+    first, second, third = (add_work(registry, number) for number in (1, 2, 3))
+    cursor = registry.last_seq
+
+    tombstone = registry.delete(second["id"])
+    fourth = add_work(registry, 4)
+
+    changes, has_more = registry.changes_since(cursor, limit=10)
+    assert not has_more
+    assert [(work["id"], work.get("deleted", False)) for work in changes] == [
+        (second["id"], True), (fourth["id"], False)
+    ]
+    assert tombstone["change_seq"] < fourth["change_seq"]
+
+    # Лента с начала постранично: удалённая работа — одна запись на своей новой позиции
+    seen, cursor = [], 0
+    while True:
+        changes, has_more = registry.changes_since(cursor, limit=2)
+        seen.extend(work["id"] for work in changes)
+        cursor = changes[-1]["change_seq"] if changes else cursor
+        if not has_more:
+            break
+    assert seen == [first["id"], third["id"], second["id"], fourth["id"]]
+
+
+def test_reload_restores_indexes_and_feed(session_factory, monkeypatch):
+    registry = WorksRegistry(session_factory)
+    works = [add_work(registry, number) for number in range(1, 5)]
+    registry.delete(works[0]["id"])
+
+    reloaded = WorksRegistry(session_factory)
+    monkeypatch.setattr("app.database.registry.engine", session_factory.kw["bind"])
+    reloaded.load()
+    assert reloaded.last_seq == registry.last_seq
+    assert collect_pages(reloaded, 2) == [work["id"] for work in works[1:]]
+    assert reloaded.changes_since(0, 10) == registry.changes_since(0, 10)
@@ -0,0 +1,53 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.migrations import upgrade_schema
+from app.database.registry import WorksRegistry
+from app.models.work import Work
+
+
+def test_upgrade_adds_feed_columns_to_old_works_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # Таблица works в том виде, в каком она была до ленты изменений
+        connection.execute(text(
+            "CREATE TABLE works (id INTEGER PRIMARY KEY, student_name VARCHAR(100) NOT NULL, "
+            "assignment_id VARCHAR(50) NOT NULL, file_name VARCHAR(255) NOT NULL, "
+            "file_hash VARCHAR(64) NOT NULL, file_path VARCHAR(500) NOT NULL, "
+            "file_size INTEGER NOT NULL, uploaded_at DATETIME)"
+        ))
+        for work_id in (1, 2, 5):
+            connection.execute(text(
+                f"INSERT INTO works VALUES ({work_id}, 'student{work_id}', 'hw_1', 'a.txt', "
+                f"'{work_id:064x}', '/tmp/a', 10, NULL)"
+            ))
+
+    assert upgrade_schema(engine) == ["works.change_seq", "works.deleted_at"]
+    assert upgrade_schema(engine) == []
+    assert "ix_works_change_seq" in {index["name"] for index in inspect(engine).get_indexes("works")}
+
+    with sessionmaker(bind=engine)() as db:
+        works = db.query(Work).order_by(Work.id).all()
+        assert [(work.id, work.change_seq, work.deleted_at) for work in works] == [
+            (1, 1, None), (2, 2, None), (5, 5, None)
+        ]
+
+
+def test_registry_lookups_read_misses_from_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'works.db'}")
+    Work.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add_all([
+            Work(id=1, student_name="a", assignment_id="hw_1", file_name="a.txt", file_hash="a" * 64,
+                 file_path="/tmp/a", file_size=1, change_seq=1),
+            Work(id=2, student_name="b", assignment_id="hw_1", file_name="b.txt", file_hash="b" * 64,
+                 file_path="/tmp/b", file_size=1, change_seq=2),
+        ])
+        db.commit()
+
+    registry = WorksRegistry(session_factory)
+    assert registry.cached(1) is None
+    assert [work["id"] for work in registry.get_many([2, 7, 1])] == [2, 1]
+    assert registry.cached(1)["student_name"] == "a"
+    assert registry.get(7) is None